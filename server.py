@@ -1,6 +1,181 @@
 import os
+import sys
+import time
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import functools
+import threading
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+SourceDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+LiveReloadPath = "/__livereload"
+SearchPath = "/search"
+LiveReloadScript = (
+    b"<script>new EventSource('/__livereload')"
+    b".onmessage = () => location.reload();</script>"
+)
+KeepAliveInterval = 15
+
+
+class LiveReload:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+def inject_reload_script(body):
+    index = body.rfind(b"</body>")
+    if index == -1:
+        return body + LiveReloadScript
+    return body[:index] + LiveReloadScript + body[index:]
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    live_reload = None
+    search = None
+
+    def do_GET(self):
+        if self.path == LiveReloadPath:
+            self.stream_reloads()
+            return
+        if self.search is not None and self.path.split("?", 1)[0] == SearchPath:
+            self.serve_search()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if path.endswith(".html") and os.path.isfile(path):
+            with open(path, "rb") as file:
+                body = inject_reload_script(file.read())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            super().do_GET()
+
+    def serve_search(self):
+        from search import search_response
+
+        body = search_response(self.search, self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        # Server-sent events: one "reload" message per rebuild, with comment
+        # lines in between so proxies keep the connection open.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        generation = self.live_reload.generation
+        try:
+            while True:
+                current = self.live_reload.wait(generation, KeepAliveInterval)
+                if current != generation:
+                    self.wfile.write(b"data: reload\n\n")
+                    generation = current
+                else:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def watch_and_rebuild(watcher, rebuilder, live_reload):
+    while True:
+        changed = watcher.wait()
+        if not changed:
+            continue
+        start = time.perf_counter()
+        written = rebuilder.rebuild(changed)
+        if written:
+            elapsed = (time.perf_counter() - start) * 1e3
+            print(f"rebuilt {len(written)} output(s) in {elapsed:.1f} ms")
+            live_reload.notify()
+
+
+def run_watch(port=8888, directory="public"):
+    sys.path.insert(0, SourceDir)
+    from links import LinkIndex
+    from main import (
+        LinkIndexPath,
+        ManifestPath,
+        SearchIndexPath,
+        SiteIndexPath,
+        main as build,
+    )
+    from manifest import BuildManifest
+    from search import SearchDir, SearchIndex, SearchReader
+    from siteindex import SiteIndex
+    from watch import SiteRebuilder, create_watcher
+
+    build()
+    rebuilder = SiteRebuilder(
+        BuildManifest.load(ManifestPath),
+        links=LinkIndex.load(LinkIndexPath),
+        site=SiteIndex.load(SiteIndexPath),
+        search=SearchIndex.load(SearchIndexPath),
+    )
+    watcher = create_watcher(
+        rebuilder.watched_directories(), rebuilder.watched_files()
+    )
+    live_reload = LiveReload()
+    threading.Thread(
+        target=watch_and_rebuild,
+        args=(watcher, rebuilder, live_reload),
+        daemon=True,
+    ).start()
+
+    handler_class = type(
+        "WatchHandler",
+        (LiveReloadHandler,),
+        {
+            "live_reload": live_reload,
+            "search": SearchReader(os.path.join(directory, SearchDir)),
+        },
+    )
+    httpd = ThreadingHTTPServer(
+        ("", port), functools.partial(handler_class, directory=directory)
+    )
+    print(f"Watching for changes, serving http://localhost:{port} from '{directory}'")
+    try:
+        httpd.serve_forever()
+    finally:
+        rebuilder.save()
+
+
+def run_production(port=8888, directory="."):
+    sys.path.insert(0, SourceDir)
+    from serving import create_production_server
+
+    httpd = create_production_server(port, directory)
+    print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
+    httpd.serve_forever()
+
+
+def run_archive(port=8888, path="site.pack"):
+    sys.path.insert(0, SourceDir)
+    from serving import create_archive_server
+
+    httpd = create_archive_server(port, path)
+    print(f"Serving HTTP on http://localhost:{port} from archive '{path}'...")
+    httpd.serve_forever()
 
 
 def run(
@@ -23,6 +198,28 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Rebuild changed pages and live-reload browsers (run from the repo root)",
+    )
+    parser.add_argument(
+        "--prod",
+        action="store_true",
+        help="Threaded keep-alive server with an in-memory cache and ETags",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="Serve a site archive written by main.py --archive, memory-mapped",
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    if args.archive:
+        run_archive(port=args.port, path=args.archive)
+    elif args.watch:
+        run_watch(port=args.port, directory=args.dir)
+    elif args.prod:
+        run_production(port=args.port, directory=args.dir)
+    else:
+        run(port=args.port, directory=args.dir)
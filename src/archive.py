@@ -0,0 +1,175 @@
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import struct
+import threading
+import time
+from email.utils import formatdate
+
+from manifest import replacing
+from search import SearchDir, SearchReader
+
+ArchiveMagic = b"SITEPK1\0"
+# Magic, then the offset and length of the JSON index at the end.
+ArchiveHeader = struct.Struct("<8sQQ")
+RevalidateInterval = 1.0
+VariantSuffixes = (("gzip", ".gz"), ("br", ".br"))
+
+
+def archive_files(public_dir):
+    # (URL path, file path) of every output, sorted so that packing the
+    # same tree twice gives the same archive. Precompressed siblings are
+    # stored with the file they belong to, not on their own.
+    files = []
+    for directory, directories, names in os.walk(public_dir):
+        directories.sort()
+        present = set(names)
+        for name in sorted(names):
+            stem, suffix = os.path.splitext(name)
+            if suffix in (".gz", ".br") and stem in present:
+                continue
+            path = os.path.join(directory, name)
+            url = "/" + os.path.relpath(path, public_dir).replace(os.sep, "/")
+            files.append((url, path))
+    return files
+
+
+def pack_site(public_dir, archive_path):
+    # Writes every file in public_dir, and any up-to-date .gz or .br
+    # sibling, into one archive. Identical bodies are stored once. The
+    # archive is written beside its destination and renamed over it, so a
+    # deploy, or a server reading it, only ever sees a complete archive.
+    directory = os.path.dirname(archive_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    bodies = {}
+    index = {}
+    with replacing(archive_path) as file:
+        file.write(ArchiveHeader.pack(ArchiveMagic, 0, 0))
+
+        def store(data):
+            digest = hashlib.sha256(data).digest()
+            if digest not in bodies:
+                bodies[digest] = (file.tell(), len(data))
+                file.write(data)
+            return bodies[digest], digest
+
+        for url, path in archive_files(public_dir):
+            stat = os.stat(path)
+            with open(path, "rb") as source:
+                (offset, length), digest = store(source.read())
+            variants = {}
+            for encoding, suffix in VariantSuffixes:
+                try:
+                    if os.stat(path + suffix).st_mtime_ns != stat.st_mtime_ns:
+                        continue
+                    with open(path + suffix, "rb") as source:
+                        variants[encoding] = list(store(source.read())[0])
+                except FileNotFoundError:
+                    pass
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            index[url] = [
+                offset,
+                length,
+                stat.st_mtime_ns,
+                content_type,
+                f'"{digest[:8].hex()}"',
+                variants,
+            ]
+        index_offset = file.tell()
+        data = json.dumps(index, sort_keys=True, separators=(",", ":")).encode()
+        file.write(data)
+        file.seek(0)
+        file.write(ArchiveHeader.pack(ArchiveMagic, index_offset, len(data)))
+    return len(index), len(bodies)
+
+
+class ArchiveEntry:
+    # Shaped like serving.CachedFile; body is a view into the mapping, so
+    # responses are written straight from the page cache.
+    def __init__(self, path, body, mtime, etag, content_type, variants):
+        self.path = path
+        self.body = body
+        self.size = len(body)
+        self.mtime = mtime
+        self.etag = etag
+        self.last_modified = formatdate(mtime / 1e9, usegmt=True)
+        self.content_type = content_type
+        self.variants = variants
+
+
+class ArchiveReader:
+    # A mapped archive and its index, held in a dict for O(1) lookups.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = ArchiveHeader.unpack_from(self.data, 0)
+        if magic != ArchiveMagic:
+            raise ValueError(f"{path} is not a site archive")
+        index = self.data[index_offset : index_offset + index_length]
+        self.index = json.loads(index)
+        self.view = memoryview(self.data)
+
+    def get(self, url_path):
+        item = self.index.get(url_path)
+        if item is None:
+            return None
+        offset, length, mtime, content_type, etag, variants = item
+        encoded = {}
+        for encoding, (variant_offset, variant_length) in variants.items():
+            encoded[encoding] = ArchiveEntry(
+                url_path,
+                self.view[variant_offset : variant_offset + variant_length],
+                mtime,
+                etag[:-1] + "-" + encoding + '"',
+                content_type,
+                {},
+            )
+        body = self.view[offset : offset + length]
+        return ArchiveEntry(url_path, body, mtime, etag, content_type, encoded)
+
+    def has(self, url_path):
+        return url_path in self.index
+
+
+class Archive:
+    # The archive being served. At most once per RevalidateInterval a stat
+    # checks whether a deploy swapped in a new file, which is then mapped;
+    # requests still holding views of the old mapping keep it alive.
+    def __init__(self, path):
+        self.path = path
+        self.reader = ArchiveReader(path)
+        self.checked = time.monotonic()
+        self.lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if now - self.checked < RevalidateInterval:
+            return self.reader
+        with self.lock:
+            if now - self.checked >= RevalidateInterval:
+                self.checked = now
+                try:
+                    stat = os.stat(self.path)
+                    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                    if key != self.reader.key:
+                        self.reader = ArchiveReader(self.path)
+                except (OSError, ValueError):
+                    pass
+        return self.reader
+
+
+class ArchiveSearchReader(SearchReader):
+    # Serves /search from the index files packed into the archive.
+    def __init__(self, archive):
+        super().__init__(SearchDir)
+        self.archive = archive
+
+    def mapped(self, name):
+        entry = self.archive.current().get(f"/{SearchDir}/{name}")
+        return entry.body if entry is not None else None
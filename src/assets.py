@@ -0,0 +1,142 @@
+import html
+import json
+import os
+import posixpath
+import re
+import urllib.parse
+
+from htmlnode import escape_attribute
+from manifest import hash_bytes, save_json
+
+AssetManifestFormat = 1
+FingerprintLength = 10
+FingerprintSuffixes = (
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".webp",
+    ".avif",
+    ".woff",
+    ".woff2",
+)
+# Also matches the .gz and .br siblings written by --precompress.
+FingerprintPattern = re.compile(
+    r"\.[0-9a-f]{%d}\.[^./]+(\.gz|\.br)?$" % FingerprintLength
+)
+ReferencePattern = re.compile(r'(\b(?:href|src)=")([^"]*)(")')
+ReferenceProps = ("href", "src")
+ImmutableCacheControl = "public, max-age=31536000, immutable"
+
+
+def should_fingerprint(path):
+    return path.lower().endswith(FingerprintSuffixes)
+
+
+def fingerprinted_name(file_name, source_hash):
+    # "index.css" with a hash of 3f9a1c... becomes "index.3f9a1c....css".
+    stem, suffix = os.path.splitext(file_name)
+    return f"{stem}.{source_hash[:FingerprintLength]}{suffix}"
+
+
+def is_fingerprinted(url_path):
+    return FingerprintPattern.search(url_path) is not None
+
+
+def is_page_relative(url):
+    parts = urllib.parse.urlsplit(url)
+    return not (parts.scheme or parts.netloc) and not parts.path.startswith("/")
+
+
+def has_relative_references(text):
+    # Whether any href or src in text resolves differently from page to page.
+    return any(
+        is_page_relative(html.unescape(match.group(2)))
+        for match in ReferencePattern.finditer(text)
+        if match.group(2) and not match.group(2).startswith("#")
+    )
+
+
+class AssetMap:
+    # Site paths of static assets mapped to their fingerprinted paths, and
+    # the rewriting of href and src values in rendered HTML that uses it.
+    def __init__(self, urls=None):
+        self.urls = dict(urls or {})
+
+    def digest(self):
+        return hash_bytes(json.dumps(sorted(self.urls.items())).encode())
+
+    def rewrite_url(self, page_url, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme or parts.netloc or not parts.path:
+            return url
+        path = urllib.parse.urljoin(page_url or "/", parts.path)
+        target = self.urls.get(posixpath.normpath(urllib.parse.unquote(path)))
+        if target is None:
+            return url
+        return urllib.parse.urlunsplit(("", "", target, parts.query, parts.fragment))
+
+    def rewrite_props(self, props, page_url="/"):
+        # Node props hold raw URLs; the same dict comes back when no href
+        # or src names a fingerprinted asset.
+        rewritten = None
+        for name in ReferenceProps:
+            url = props.get(name)
+            if not url:
+                continue
+            target = self.rewrite_url(page_url, url)
+            if target != url:
+                if rewritten is None:
+                    rewritten = dict(props)
+                rewritten[name] = target
+        return props if rewritten is None else rewritten
+
+    def rewrite_html(self, text, page_url="/"):
+        # For template markup, not rendered content: only values that name
+        # a fingerprinted asset are touched; attribute values are stored
+        # escaped, so they are unescaped to look up.
+        if not self.urls:
+            return text
+
+        def replace(match):
+            url = html.unescape(match.group(2))
+            rewritten = self.rewrite_url(page_url, url)
+            if rewritten == url:
+                return match.group(0)
+            return match.group(1) + escape_attribute(rewritten) + match.group(3)
+
+        return ReferencePattern.sub(replace, text)
+
+    def save(self, path):
+        save_json(path, AssetManifestFormat, {"assets": self.urls})
+
+
+# The map pages are rewritten with. Empty unless the build fingerprints.
+asset_map = AssetMap()
+
+
+def configure_assets(urls=None):
+    global asset_map
+    asset_map = AssetMap(urls)
+    return asset_map
+
+
+def asset_config():
+    return asset_map.urls
+
+
+def rewrite_html(text, page_url="/"):
+    return asset_map.rewrite_html(text, page_url)
+
+
+def rewrite_props(props, page_url="/"):
+    if not asset_map.urls:
+        return props
+    return asset_map.rewrite_props(props, page_url)
+
+
+def asset_digest():
+    return asset_map.digest() if asset_map.urls else ""
@@ -0,0 +1,63 @@
+import re
+import time
+
+from main import block_to_block_type, markdown_to_blocks, markdown_to_html_node
+
+Paragraph = " ".join(["The quick brown fox jumps over the lazy dog."] * 40)
+Sections = [
+    "## Heading",
+    Paragraph,
+    "\n".join(f"* unordered item {i}" for i in range(50)),
+    "\n".join(f"{i % 10}. ordered item {i}" for i in range(50)),
+    "\n".join(f"> quoted line {i}" for i in range(20)),
+    "```\n" + "\n".join(f"print({i})" for i in range(30)) + "\n```",
+    "\n".join([Paragraph] * 10),
+]
+Repeats = [100, 1000]
+
+
+def legacy_block_to_block_type(block):
+    # The classifier as it was before patterns were precompiled: every check
+    # re-splits the block and matches pattern strings line by line.
+    def all_lines(pattern):
+        return all(re.match(pattern, line) for line in block.split("\n"))
+
+    if re.match(r"^#{1,6}\s", block):
+        return "heading"
+    elif re.match(r"^```.+```$", block, re.DOTALL):
+        return "code"
+    elif all_lines(r"^>"):
+        return "quote"
+    elif all_lines(r"^(\*|-)\s"):
+        return "unordered_list"
+    elif all_lines(r"^\d\.\s"):
+        return "ordered_list"
+    return "paragraph"
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'blocks':>7} {'MB':>6} {'legacy ms':>10} {'classify ms':>12} {'render ms':>10}")
+    for repeat in Repeats:
+        markdown = "\n\n".join(Sections * repeat)
+        blocks = markdown_to_blocks(markdown)
+        legacy = best_of(lambda: [legacy_block_to_block_type(b) for b in blocks])
+        current = best_of(lambda: [block_to_block_type(b) for b in blocks])
+        render = best_of(lambda: markdown_to_html_node(markdown), repeat=1)
+        print(
+            f"{len(blocks):>7} {len(markdown) / 1e6:>6.1f} {legacy * 1e3:>10.1f}"
+            f" {current * 1e3:>12.1f} {render * 1e3:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import random
+import time
+
+from corpus import CorpusOptions, generate_markdown
+from htmlnode import AttributeCache, LeafNode, ParentNode
+from main import markdown_to_html_node
+
+Pages = 50
+Repeat = 5
+Rounds = 10
+
+
+def unescaped_props(node):
+    # props_to_html as it was before escaping: a new list per node.
+    if node.props is not None and bool(node.props):
+        return " " + " ".join([f'{key}="{value}"' for key, value in node.props.items()])
+    return ""
+
+
+def unescaped_leaf(node):
+    if node.tag is None:
+        return node.value
+    open_tag = f"<{node.tag}{unescaped_props(node)}>"
+    close_tag = f"</{node.tag}>"
+    return f"{open_tag}{node.value}{close_tag}"
+
+
+def unescaped_to_html(node):
+    # The previous serializer, values written raw, for comparison.
+    parts = []
+    stack = [iter((node,))]
+    close_tags = [""]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            parts.append(close_tags.pop())
+        elif isinstance(child, ParentNode):
+            parts.append(f"<{child.tag}{unescaped_props(child)}>")
+            stack.append(iter(child.children))
+            close_tags.append(f"</{child.tag}>")
+        else:
+            parts.append(unescaped_leaf(child))
+    return "".join(parts)
+
+
+def best_of(function):
+    best = None
+    for _ in range(Repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def corpus_trees():
+    rng = random.Random(0)
+    options = CorpusOptions(link_density=0.1, image_density=0.02)
+    pages = [generate_markdown(rng, options) for _ in range(Pages)]
+    return [markdown_to_html_node(markdown) for markdown in pages]
+
+
+def markup_trees():
+    # Prose full of characters that must be escaped, and quoted URLs.
+    text = 'if a < b && c > d then "quote" '
+    return [
+        ParentNode(
+            "div",
+            [
+                ParentNode(
+                    "p",
+                    [
+                        LeafNode(None, text * 3),
+                        LeafNode("a", "x & y", {"href": f'/q?a=1&b="{i % 20}"'}),
+                        LeafNode("code", "<br>"),
+                    ],
+                )
+                for i in range(1000)
+            ],
+        )
+        for _ in range(Pages // 5)
+    ]
+
+
+def main():
+    print(f"{'corpus':<8} {'unescaped ms':>13} {'escaped ms':>11} {'change':>8}")
+    for name, trees in (("plain", corpus_trees()), ("markup", markup_trees())):
+        # Interleaved runs so drift on a busy machine hits both sides.
+        before = after = None
+        for _ in range(Rounds):
+            AttributeCache.clear()
+            elapsed = best_of(lambda: [unescaped_to_html(tree) for tree in trees])
+            before = elapsed if before is None else min(before, elapsed)
+            elapsed = best_of(lambda: [tree.to_html() for tree in trees])
+            after = elapsed if after is None else min(after, elapsed)
+        change = (after / before - 1) * 100
+        print(
+            f"{name:<8} {before * 1e3:>13.1f} {after * 1e3:>11.1f} {change:>+7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
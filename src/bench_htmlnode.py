@@ -0,0 +1,40 @@
+import time
+
+from htmlnode import LeafNode, ParentNode
+
+Sizes = [1000, 10000, 100000]
+
+
+def wide_tree(size):
+    return ParentNode("ul", [LeafNode("li", f"item {i}") for i in range(size)])
+
+
+def deep_tree(size):
+    node = LeafNode("b", "core")
+    for _ in range(size):
+        node = ParentNode("div", [node])
+    return node
+
+
+def time_to_html(node, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        node.to_html()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'shape':<6} {'nodes':>8} {'total ms':>10} {'ns/node':>9}")
+    for name, build in (("wide", wide_tree), ("deep", deep_tree)):
+        for size in Sizes:
+            elapsed = time_to_html(build(size))
+            print(
+                f"{name:<6} {size:>8} {elapsed * 1e3:>10.2f} {elapsed / size * 1e9:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
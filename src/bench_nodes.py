@@ -0,0 +1,47 @@
+import gc
+import time
+import tracemalloc
+
+from main import markdown_to_html_node, text_node_to_html_node, text_to_textnodes
+
+Fragment = "plain words, **bold**, *italic*, `code`, a [link](/somewhere) and "
+Sizes = [1000, 10000, 100000]
+
+
+def measure(build):
+    # Bytes still allocated once the nodes exist, i.e. what the nodes cost
+    # to keep around, then the build time untraced with the collector on.
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    return nodes, size, elapsed
+
+
+def report(name, count, bytes_used, elapsed):
+    print(f"{name:<10} {count:>8} {bytes_used / count:>11.0f} {elapsed * 1e3:>9.1f}")
+
+
+def main():
+    print(f"{'nodes':<10} {'count':>8} {'bytes/node':>11} {'build ms':>9}")
+    for size in Sizes:
+        text = Fragment * (size // 10)
+        text_nodes, bytes_used, elapsed = measure(lambda: text_to_textnodes(text))
+        count = len(text_nodes)
+        report("text", count, bytes_used, elapsed)
+        _, bytes_used, elapsed = measure(
+            lambda: [text_node_to_html_node(node) for node in text_nodes]
+        )
+        report("html", count, bytes_used, elapsed)
+        del text_nodes
+        page, bytes_used, elapsed = measure(lambda: markdown_to_html_node(text))
+        report("page", len(page.children[0].children), bytes_used, elapsed)
+
+
+if __name__ == "__main__":
+    main()
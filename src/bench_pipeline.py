@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import main as site
+from blockcache import configure_block_cache
+from corpus import CorpusOptions, write_site
+from template import load_template
+
+DefaultThreshold = 0.25
+
+
+def best_of(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def stage_benchmarks(root, pages):
+    # Each stage gets its own input prepared up front, so a stage's time
+    # covers only its own work. The block cache is off so that repeats
+    # measure rendering rather than cache hits.
+    template = load_template(os.path.join(root, "template.html"))
+    blocks = [
+        block for markdown in pages for block in site.markdown_to_blocks(markdown)
+    ]
+    paragraphs = [
+        block
+        for block in blocks
+        if site.block_to_block_type(block) == site.BlockType.Paragraph
+    ]
+    trees = [site.markdown_to_html_node(markdown) for markdown in pages]
+    return {
+        "blocks": lambda: [site.markdown_to_blocks(markdown) for markdown in pages],
+        "classify": lambda: [site.block_to_block_type(block) for block in blocks],
+        "inline": lambda: [site.text_to_textnodes(text) for text in paragraphs],
+        "nodes": lambda: [site.markdown_to_html_node(markdown) for markdown in pages],
+        "to_html": lambda: [tree.to_html() for tree in trees],
+        "render_page": lambda: [
+            site.render_page(markdown, template) for markdown in pages
+        ],
+    }
+
+
+def build_benchmarks(root):
+    def build(force):
+        with working_directory(root), contextlib.redirect_stdout(io.StringIO()):
+            site.main(force=force)
+
+    return {
+        "build": lambda: build(True),
+        "noop_build": lambda: build(False),
+    }
+
+
+def run(options, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        paths = write_site(root, options)
+        pages = []
+        for path in paths:
+            with open(path) as file:
+                pages.append(file.read())
+        megabytes = sum(len(markdown.encode()) for markdown in pages) / 1e6
+        configure_block_cache(0)
+        benchmarks = stage_benchmarks(root, pages)
+        benchmarks.update(build_benchmarks(root))
+        for name, function in benchmarks.items():
+            # The first build also warms the output tree for noop_build.
+            seconds = best_of(function, repeat)
+            peak = peak_memory(function)
+            results[name] = {
+                "seconds": seconds,
+                "pagesPerSecond": len(pages) / seconds,
+                "megabytesPerSecond": megabytes / seconds,
+                "peakMegabytes": peak / 1e6,
+            }
+    return results
+
+
+def report(results, baseline=None):
+    lines = [
+        f"{'stage':<12} {'ms':>9} {'pages/s':>10} {'MB/s':>8} {'peak MB':>8}"
+        f" {'vs base':>8}"
+    ]
+    for name, result in results.items():
+        change = ""
+        if baseline and name in baseline:
+            ratio = result["seconds"] / baseline[name]["seconds"] - 1
+            change = f"{ratio * 100:+.1f}%"
+        lines.append(
+            f"{name:<12} {result['seconds'] * 1e3:>9.1f}"
+            f" {result['pagesPerSecond']:>10.0f}"
+            f" {result['megabytesPerSecond']:>8.2f}"
+            f" {result['peakMegabytes']:>8.1f} {change:>8}"
+        )
+    return "\n".join(lines)
+
+
+def regressions(results, baseline, threshold):
+    slower = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["seconds"] / baseline[name]["seconds"] - 1
+            if ratio > threshold:
+                slower.append((name, ratio))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark each build stage on a synthetic site"
+    )
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=30, help="Blocks per page")
+    parser.add_argument("--list-items", type=int, default=10)
+    parser.add_argument("--code-lines", type=int, default=15)
+    parser.add_argument("--link-density", type=float, default=0.05)
+    parser.add_argument("--image-density", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="Write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Baseline to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DefaultThreshold,
+        help="Fail when a stage is this much slower than the baseline",
+    )
+    args = parser.parse_args()
+
+    options = CorpusOptions(
+        pages=args.pages,
+        blocks_per_page=args.blocks,
+        list_items=args.list_items,
+        code_lines=args.code_lines,
+        link_density=args.link_density,
+        image_density=args.image_density,
+        seed=args.seed,
+    )
+    results = run(options, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print(report(results, baseline))
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if baseline:
+        slower = regressions(results, baseline, args.threshold)
+        for name, ratio in slower:
+            print(f"regression: {name} is {ratio * 100:.1f}% slower than baseline")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
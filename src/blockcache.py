@@ -0,0 +1,147 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+
+from manifest import RendererVersion
+
+BlockCacheSize = 4096
+DiskCommitInterval = 256
+
+
+def block_key(block):
+    data = f"{RendererVersion}\0{block}".encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class BlockCache:
+    # Rendered block trees keyed by a hash of the block text and the
+    # renderer version. Cached trees are shared between pages, so nothing
+    # downstream may mutate a node once it has been rendered.
+    def __init__(self, max_size=BlockCacheSize, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        self.pid = None
+        self.pending = []
+
+    def get_or_render(self, block, render):
+        key = block_key(block)
+        node = self.entries.get(key)
+        if node is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return node
+        node = self.load(key)
+        if node is None:
+            self.misses += 1
+            node = render(block)
+            self.store(key, node)
+        else:
+            self.hits += 1
+        self.remember(key, node)
+        return node
+
+    def remember(self, key, node):
+        self.entries[key] = node
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def connect(self):
+        # Connections must not cross a fork, so a worker process that
+        # inherited this cache opens its own.
+        if self.path is None:
+            return None
+        if self.connection is None or self.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.pid = os.getpid()
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, node BLOB)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE name = 'renderer'"
+            ).fetchone()
+            if row is None or row[0] != str(RendererVersion):
+                self.connection.execute("DELETE FROM blocks")
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('renderer', ?)",
+                    (str(RendererVersion),),
+                )
+            self.connection.commit()
+        return self.connection
+
+    def load(self, key):
+        connection = self.connect()
+        if connection is None:
+            return None
+        row = connection.execute(
+            "SELECT node FROM blocks WHERE key = ?", (key,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def store(self, key, node):
+        # Writes are buffered and committed in one short transaction so that
+        # parallel workers sharing the database rarely wait on its lock.
+        if self.path is None:
+            return
+        self.pending.append((key, pickle.dumps(node, pickle.HIGHEST_PROTOCOL)))
+        if len(self.pending) >= DiskCommitInterval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO blocks VALUES (?, ?)", self.pending
+            )
+        self.pending = []
+
+    def close(self):
+        if self.pid != os.getpid():
+            self.connection = None
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# The cache consulted by markdown_to_html_node. None disables caching.
+block_cache = None
+
+
+def configure_block_cache(max_size=BlockCacheSize, path=None):
+    global block_cache
+    if block_cache is not None:
+        block_cache.close()
+    block_cache = BlockCache(max_size, path) if max_size > 0 else None
+    return block_cache
+
+
+def block_cache_config():
+    if block_cache is None:
+        return 0, None
+    return block_cache.max_size, block_cache.path
+
+
+def cached_render(block, render):
+    if block_cache is None:
+        return render(block)
+    return block_cache.get_or_render(block, render)
+
+
+def flush_block_cache():
+    if block_cache is not None:
+        block_cache.flush()
@@ -0,0 +1,105 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import replacing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CompressibleSuffixes = (".html", ".css", ".js", ".svg", ".json", ".xml", ".txt")
+CompressMinSize = 1024
+
+
+def gzip_compress(data):
+    # mtime=0 keeps the output byte-identical between builds.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=11)
+
+
+def encoders():
+    available = [(".gz", gzip_compress)]
+    if brotli is not None:
+        available.append((".br", brotli_compress))
+    return available
+
+
+def is_compressible(path):
+    return path.endswith(CompressibleSuffixes)
+
+
+def precompress_file(path, min_size=CompressMinSize):
+    # Variants are stamped with the source's mtime: a variant whose mtime
+    # matches is up to date and is skipped, and the server uses the same
+    # check to refuse a variant older than its source.
+    stat = os.stat(path)
+    written = []
+    for suffix, compress in encoders():
+        target = path + suffix
+        if stat.st_size < min_size:
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        try:
+            if os.stat(target).st_mtime_ns == stat.st_mtime_ns:
+                continue
+        except FileNotFoundError:
+            pass
+        with open(path, "rb") as file:
+            data = compress(file.read())
+        with replacing(target) as file:
+            file.write(data)
+            file.flush()
+            os.utime(file.fileno(), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written.append(target)
+    return written
+
+
+def remove_orphan_variant(path):
+    # Only a file precompress_file could have written counts as a variant;
+    # a static download such as data.tar.gz is left alone.
+    for suffix, _ in encoders():
+        if not path.endswith(suffix):
+            continue
+        source = path[: -len(suffix)]
+        if is_compressible(source) and not os.path.exists(source):
+            os.remove(path)
+            return True
+    return False
+
+
+def precompress_tree(root, jobs=None, min_size=CompressMinSize):
+    sources = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if is_compressible(path):
+                sources.append(path)
+            else:
+                remove_orphan_variant(path)
+    # zlib and brotli release the GIL while compressing, so threads scale.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda path: precompress_file(path, min_size), sources)
+        return [target for written in results for target in written]
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
@@ -0,0 +1,118 @@
+import os
+import random
+
+Words = (
+    "the quick brown fox jumps over lazy dog elves dwarves hobbits ring "
+    "mountain river forest shadow light road journey council king tower"
+).split()
+DefaultMix = {
+    "paragraph": 6,
+    "heading": 2,
+    "unordered_list": 1,
+    "ordered_list": 1,
+    "quote": 1,
+    "code": 1,
+}
+CorpusTemplate = (
+    "<!DOCTYPE html>\n<html>\n<head>\n<title>{{ Title }}</title>\n"
+    '<link href="/index.css" rel="stylesheet">\n</head>\n'
+    "<body>\n<article>\n{{ Content }}\n</article>\n</body>\n</html>\n"
+)
+
+
+class CorpusOptions:
+    def __init__(
+        self,
+        pages=100,
+        blocks_per_page=30,
+        block_mix=None,
+        link_density=0.05,
+        image_density=0.01,
+        words_per_paragraph=60,
+        list_items=10,
+        code_lines=15,
+        pages_per_section=20,
+        seed=0,
+    ):
+        self.pages = pages
+        self.blocks_per_page = blocks_per_page
+        self.block_mix = block_mix or DefaultMix
+        self.link_density = link_density
+        self.image_density = image_density
+        self.words_per_paragraph = words_per_paragraph
+        self.list_items = list_items
+        self.code_lines = code_lines
+        self.pages_per_section = pages_per_section
+        self.seed = seed
+
+
+def inline_text(rng, options, count):
+    # Words, sprinkled with the inline markup the tokenizer has to find.
+    parts = []
+    for _ in range(count):
+        word = rng.choice(Words)
+        roll = rng.random()
+        if roll < options.link_density:
+            word = f"[{word}](/{rng.choice(Words)})"
+        elif roll < options.link_density + options.image_density:
+            word = f"![{word}](/images/{rng.choice(Words)}.png)"
+        elif roll < options.link_density + options.image_density + 0.03:
+            word = rng.choice((f"**{word}**", f"*{word}*", f"`{word}`"))
+        parts.append(word)
+    return " ".join(parts)
+
+
+def generate_block(rng, options, kind):
+    if kind == "heading":
+        return "#" * rng.randint(2, 4) + " " + inline_text(rng, options, 5)
+    if kind == "unordered_list":
+        return "\n".join(
+            "* " + inline_text(rng, options, 8) for _ in range(options.list_items)
+        )
+    if kind == "ordered_list":
+        return "\n".join(
+            f"{i % 9 + 1}. " + inline_text(rng, options, 8)
+            for i in range(options.list_items)
+        )
+    if kind == "quote":
+        return "\n".join("> " + inline_text(rng, options, 12) for _ in range(3))
+    if kind == "code":
+        lines = [
+            f"{rng.choice(Words)} = {rng.randint(0, 999)}"
+            for _ in range(options.code_lines)
+        ]
+        return "```\n" + "\n".join(lines) + "\n```"
+    return inline_text(rng, options, options.words_per_paragraph)
+
+
+def generate_markdown(rng, options):
+    kinds = list(options.block_mix)
+    weights = [options.block_mix[kind] for kind in kinds]
+    blocks = ["# " + inline_text(rng, options, 4)]
+    for kind in rng.choices(kinds, weights, k=options.blocks_per_page):
+        blocks.append(generate_block(rng, options, kind))
+    return "\n\n".join(blocks) + "\n"
+
+
+def write_site(root, options=None):
+    # Lays out content/, static/ and template.html under root the way the
+    # repo does, so main() can build it with root as the working directory.
+    # The same options and seed always produce the same bytes.
+    options = options or CorpusOptions()
+    rng = random.Random(options.seed)
+    os.makedirs(os.path.join(root, "static", "images"), exist_ok=True)
+    with open(os.path.join(root, "static", "index.css"), "w") as file:
+        file.write("body { font-family: sans-serif; }\n")
+    with open(os.path.join(root, "static", "images", "pixel.png"), "wb") as file:
+        file.write(bytes(range(256)) * 4)
+    with open(os.path.join(root, "template.html"), "w") as file:
+        file.write(CorpusTemplate)
+    paths = []
+    for page in range(options.pages):
+        section = f"section{page // options.pages_per_section}"
+        path = os.path.join(root, "content", section, f"page{page}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(generate_markdown(rng, options))
+        paths.append(path)
+    return paths
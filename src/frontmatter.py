@@ -0,0 +1,112 @@
+import re
+
+FrontMatterFence = "---"
+KeyPattern = re.compile(r"^([A-Za-z_][\w-]*)\s*:\s*(.*)$")
+TitlePattern = re.compile(r"#\s+(.+)")
+
+
+def parse_scalar(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    return text
+
+
+def parse_value(text):
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        return [parse_scalar(item) for item in text[1:-1].split(",") if item.strip()]
+    return parse_scalar(text)
+
+
+def parse_front_matter(lines):
+    # The YAML subset pages use: "key: value", "key: [a, b]", and a key
+    # followed by "- item" lines. Anything else is ignored.
+    metadata = {}
+    key = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key is not None:
+            if not isinstance(metadata[key], list):
+                metadata[key] = []
+            metadata[key].append(parse_scalar(stripped[2:]))
+            continue
+        match = KeyPattern.match(stripped)
+        if match is None:
+            continue
+        key = match.group(1).lower()
+        metadata[key] = parse_value(match.group(2))
+    if isinstance(metadata.get("tags"), str):
+        metadata["tags"] = [tag.strip() for tag in metadata["tags"].split(",")]
+    if "tags" in metadata:
+        metadata["tags"] = [tag for tag in metadata["tags"] if tag]
+    return metadata
+
+
+def split_front_matter(markdown):
+    # Returns (metadata, body). A page without a leading "---" fence, or
+    # with one that is never closed, has no front matter.
+    if not markdown.startswith(FrontMatterFence):
+        return {}, markdown
+    lines = markdown.split("\n")
+    if lines[0].rstrip() != FrontMatterFence:
+        return {}, markdown
+    for index in range(1, len(lines)):
+        if lines[index].rstrip() == FrontMatterFence:
+            return parse_front_matter(lines[1:index]), "\n".join(lines[index + 1 :])
+    return {}, markdown
+
+
+def read_front_matter(file):
+    # Reads the front matter from an open file, leaving it positioned at
+    # the start of the body. Returns the metadata and the body's first
+    # non-blank line, which is all extract_title needs.
+    start = file.tell()
+    first = file.readline()
+    metadata = {}
+    if first.rstrip() == FrontMatterFence:
+        lines = []
+        for line in iter(file.readline, ""):
+            if line.rstrip() == FrontMatterFence:
+                metadata = parse_front_matter(lines)
+                break
+            lines.append(line)
+        else:
+            file.seek(start)
+    else:
+        file.seek(start)
+    body = file.tell()
+    heading = ""
+    for line in iter(file.readline, ""):
+        if line.strip():
+            heading = line
+            break
+    file.seek(body)
+    return metadata, heading
+
+
+def first_line(markdown):
+    return markdown.lstrip().split("\n", 1)[0]
+
+
+def title_from_url(url):
+    # "/blog/my-first-post.html" gives "My First Post"; the root is "Home".
+    name = (url or "").rstrip("/").rsplit("/", 1)[-1]
+    if name.endswith(".html"):
+        name = name[: -len(".html")]
+    if not name:
+        return "Home"
+    return name.replace("-", " ").replace("_", " ").title()
+
+
+def page_title(metadata, heading, url=None):
+    # The front matter's title, else a "# " heading opening the body, else
+    # one made from the page's URL.
+    if metadata.get("title"):
+        return str(metadata["title"])
+    match = TitlePattern.match(heading)
+    if match is not None:
+        return match.group(1).strip()
+    return title_from_url(url)
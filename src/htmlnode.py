@@ -1,72 +1,127 @@
+import sys
+
+# Rendered attribute strings by props items; links and images repeat the
+# same few URLs, so most nodes reuse a string built once.
+AttributeCache = {}
+AttributeCacheSize = 4096
+
+
+def escape_text(text):
+    # Most runs contain none of &, < and >: three memchr scans and the
+    # text itself is returned. Only runs that need it are rebuilt.
+    if "&" in text or "<" in text or ">" in text:
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+
+def escape_attribute(value):
+    value = escape_text(str(value))
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    return value
+
+
+def render_attributes(props):
+    key = tuple(props.items())
+    attributes = AttributeCache.get(key)
+    if attributes is None:
+        if len(AttributeCache) >= AttributeCacheSize:
+            AttributeCache.clear()
+        attributes = "".join(
+            [f' {name}="{escape_attribute(value)}"' for name, value in key]
+        )
+        AttributeCache[key] = attributes
+    return attributes
+
+
 class HTMLNode:
+    # Pages hold tens of thousands of nodes, so they carry no per-instance
+    # __dict__. Tags are interned and empty props are stored as None, which
+    # keeps one shared object per tag name and none per attribute-less node.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag
+        self.tag = sys.intern(tag) if tag is not None else None
         self.value = value
         self.children = children
-        self.props = props
+        self.props = props or None
 
     def __repr__(self):
-        print(
-            f"HTMLNode - Tag: {self.tag} - Value: {self.value} - Children: {self.children} - Props: {self.props}"
-        )
+        return f"HTMLNode - Tag: {self.tag} - Value: {self.value} - Children: {self.children} - Props: {self.props}"
 
     def to_html(self):
         raise NotImplementedError
 
     def props_to_html(self):
-        if self.props is not None and bool(self.props):
-            return " " + " ".join(
-                [f'{key}="{value}"' for key, value in self.props.items()]
-            )
-        else:
+        if self.props is None:
             return ""
+        return render_attributes(self.props)
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
 
     def __init__(self, tag=None, value=None, props=None):
         super().__init__(tag, value, None, props)
 
-    def to_html(self):
-        if self.value is None:
+    def to_html(self, rewrite=None):
+        # Text is escaped here, once, as it is serialized; node values hold
+        # the raw text. rewrite, when given, maps (tag, props) to the props
+        # to write, so shared nodes are never mutated.
+        value = self.value
+        if value is None:
             raise ValueError("value is required")
-        elif self.tag is None:
-            return self.value
-        else:
-            attrs = self.props_to_html()
-            open_tag = f"<{self.tag}{attrs}>"
-            close_tag = f"</{self.tag}>"
-            return f"{open_tag}{self.value}{close_tag}"
+        if "&" in value or "<" in value or ">" in value:
+            value = escape_text(value)
+        tag = self.tag
+        if tag is None:
+            return value
+        props = self.props
+        if props is None:
+            return f"<{tag}>{value}</{tag}>"
+        if rewrite is not None:
+            props = rewrite(tag, props)
+        return f"<{tag}{render_attributes(props)}>{value}</{tag}>"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
 
     def __init__(self, tag=None, children=None, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
-        # print(self)
+    def open_tag(self, rewrite=None):
         if self.tag is None:
             raise ValueError("tag is required")
         elif self.children is None:
             raise ValueError("children is required")
-        else:
+        props = self.props
+        if props is None:
+            return f"<{self.tag}>"
+        if rewrite is not None:
+            props = rewrite(self.tag, props)
+        return f"<{self.tag}{render_attributes(props)}>"
 
-            def to_html_rec(children, acc):
-                acc += children[0].to_html()
-                rest = children[1:]
-                if len(rest) == 0:
-                    return acc
-                else:
-                    return to_html_rec(rest, acc)
-
-            attrs = self.props_to_html()
-            open_tag = f"<{self.tag}{attrs}>"
-            close_tag = f"</{self.tag}>"
-            inner_html = ""
-            if self.children is None:
-                inner_html = f"{open_tag}{close_tag}"
-            else:
-                inner_html = to_html_rec(self.children, inner_html)
-            return f"{open_tag}{inner_html}{close_tag}"
+    def to_html(self, rewrite=None):
+        parts = []
+        write_html(self, parts.append, rewrite)
+        return "".join(parts)
 
+
+def write_html(node, write, rewrite=None):
+    # Walks the tree with an explicit stack of child iterators so that
+    # neither the number of siblings nor the nesting depth touches the
+    # Python recursion limit, and every fragment goes straight to write.
+    stack = [iter((node,))]
+    close_tags = [""]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            write(close_tags.pop())
+        elif isinstance(child, ParentNode):
+            write(child.open_tag(rewrite))
+            stack.append(iter(child.children))
+            close_tags.append(f"</{child.tag}>")
+        else:
+            write(child.to_html(rewrite))
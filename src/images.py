@@ -0,0 +1,290 @@
+import html
+import json
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from assets import FingerprintLength
+from htmlnode import render_attributes
+from links import resolve_reference
+from manifest import (
+    hash_bytes,
+    load_json,
+    normalize_path,
+    remove_outputs,
+    replacing,
+    save_json,
+)
+from sync import copy_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ImageIndexFormat = 1
+ImageSuffixes = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+ResizableSuffixes = (".png", ".jpg", ".jpeg", ".webp")
+ImageQuality = 82
+ImagePattern = re.compile(r"<img\b[^>]*>")
+SourcePattern = re.compile(r'\bsrc="([^"]*)"')
+FingerprintStemPattern = re.compile(r"\.[0-9a-f]{%d}$" % FingerprintLength)
+PngSignature = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers, which carry the image size; C4, C8 and CC
+# share the range but are not frames.
+JpegFrameMarkers = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def is_image(path):
+    return path.lower().endswith(ImageSuffixes)
+
+
+def read_jpeg_size(file):
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        (length,) = struct.unpack(">H", file.read(2))
+        if marker[1] in JpegFrameMarkers:
+            height, width = struct.unpack(">xHH", file.read(5))
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+    # Width and height from the file header, so sizes are known even
+    # without Pillow. None for formats the header is not parsed for.
+    with open(path, "rb") as file:
+        header = file.read(26)
+        if header.startswith(PngSignature) and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+        if header[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", header[6:10])
+        if header[:2] == b"\xff\xd8":
+            return read_jpeg_size(file)
+    if Image is not None:
+        with Image.open(path) as image:
+            return image.size
+    return None
+
+
+def derivative_name(path, width):
+    # "rivendell.png" at 480 pixels is published as "rivendell-480w.png".
+    # The width goes before a fingerprint, so "rivendell.72945f7ef8.png"
+    # gives "rivendell-480w.72945f7ef8.png" and is served as immutable.
+    stem, suffix = os.path.splitext(path)
+    fingerprint = FingerprintStemPattern.search(stem)
+    if fingerprint is not None:
+        suffix = fingerprint.group(0) + suffix
+        stem = stem[: fingerprint.start()]
+    return f"{stem}-{width}w{suffix}"
+
+
+def site_path(output, public_dir):
+    return "/" + os.path.relpath(output, public_dir).replace(os.sep, "/")
+
+
+def cache_name(source_hash, width, suffix, quality=ImageQuality):
+    # Everything that changes the derivative's bytes is in its name.
+    return f"{source_hash[:32]}-{width}w-q{quality}{suffix.lower()}"
+
+
+def render_derivative(job):
+    # Runs in a worker process: resize one image and write it to the cache
+    # through a temporary file, so an interrupted build leaves no partial
+    # derivative behind.
+    source, cache_path, width, height, quality = job
+    with Image.open(source) as image:
+        resized = image.resize((width, height), Image.LANCZOS)
+        options = {"optimize": True}
+        if cache_path.endswith((".jpg", ".jpeg", ".webp")):
+            options["quality"] = quality
+        with replacing(cache_path) as file:
+            resized.save(file, format=image.format, **options)
+    return cache_path
+
+
+class ImageSet:
+    # Intrinsic size and derivatives of every image, by site path, and the
+    # pass that adds width, height, srcset and lazy loading to <img> tags.
+    def __init__(self, images=None):
+        self.images = dict(images or {})
+
+    def digest(self):
+        return hash_bytes(json.dumps(self.images, sort_keys=True).encode())
+
+    def attributes(self, source, page_url, lazy):
+        # The attributes added to an <img> of source, or None when it is
+        # not a known image.
+        image = self.images.get(resolve_reference(page_url or "/", source))
+        if image is None:
+            return None
+        attributes = {"width": image["width"], "height": image["height"]}
+        if image["srcset"]:
+            attributes["srcset"] = ", ".join(
+                f"{url} {width}w" for url, width in image["srcset"]
+            )
+            attributes["sizes"] = (
+                f"(max-width: {image['width']}px) 100vw, {image['width']}px"
+            )
+        if lazy:
+            attributes["loading"] = "lazy"
+        return attributes
+
+    def rewrite_props(self, tag, props, page_url="/"):
+        if tag != "img" or "srcset" in props or not props.get("src"):
+            return props
+        attributes = self.attributes(props["src"], page_url, "loading" not in props)
+        if attributes is None:
+            return props
+        attributes.update(props)
+        return attributes
+
+    def rewrite_html(self, text, page_url="/"):
+        # For template markup; rendered content goes through rewrite_props.
+        if not self.images:
+            return text
+
+        def replace(match):
+            tag = match.group(0)
+            if "srcset=" in tag:
+                return tag
+            source = SourcePattern.search(tag)
+            if source is None:
+                return tag
+            # Attribute values are stored escaped, so unescape to look up.
+            attributes = self.attributes(
+                html.unescape(source.group(1)), page_url, "loading=" not in tag
+            )
+            if attributes is None:
+                return tag
+            return f"<img{render_attributes(attributes)}{tag[len('<img') :]}"
+
+        return ImagePattern.sub(replace, text)
+
+
+class ImageCache:
+    # Derivatives live in .build/images, named by source hash and
+    # parameters, and the sizes of sources are kept by hash in an index
+    # next to them: a repeat build opens no image and resizes nothing.
+    def __init__(self, directory, widths, quality=ImageQuality):
+        self.directory = directory
+        self.widths = sorted(set(widths))
+        self.quality = quality
+        self.index_path = os.path.join(directory, "index.json")
+        self.sizes = {}
+        self.outputs = {}
+        data = load_json(self.index_path, ImageIndexFormat)
+        if data is not None:
+            self.sizes = data.get("sizes", {})
+            self.outputs = data.get("outputs", {})
+
+    def save(self):
+        data = {"sizes": self.sizes, "outputs": self.outputs}
+        save_json(self.index_path, ImageIndexFormat, data)
+
+    def size_of(self, source, source_hash):
+        if source_hash not in self.sizes:
+            self.sizes[source_hash] = image_size(source)
+        return self.sizes[source_hash]
+
+    def build(self, images, public_dir, jobs=1):
+        # images is a list of (source, source_hash, url, output) for every
+        # static image, url being the path pages refer to it by. Returns
+        # the ImageSet for the pages and the outputs written or removed.
+        os.makedirs(self.directory, exist_ok=True)
+        found = {}
+        pending = []
+        copies = []
+        for source, source_hash, url, output in images:
+            size = self.size_of(source, source_hash)
+            if size is None:
+                continue
+            width, height = size
+            srcset = []
+            if Image is not None and source.lower().endswith(ResizableSuffixes):
+                suffix = os.path.splitext(source)[1]
+                for target in self.widths:
+                    if target >= width:
+                        continue
+                    target_height = max(1, round(height * target / width))
+                    cache_path = os.path.join(
+                        self.directory,
+                        cache_name(source_hash, target, suffix, self.quality),
+                    )
+                    if not os.path.exists(cache_path):
+                        pending.append(
+                            (source, cache_path, target, target_height, self.quality)
+                        )
+                    derivative = derivative_name(output, target)
+                    copies.append((cache_path, derivative))
+                    srcset.append([site_path(derivative, public_dir), target])
+                srcset.append([site_path(output, public_dir), width])
+            found[url] = {"width": width, "height": height, "srcset": srcset}
+        self.render(pending, jobs)
+        # Derivatives are hardlinked into public/ where possible; an output
+        # is copied again only when it now comes from another cache file.
+        written = []
+        outputs = {}
+        for cache_path, output in copies:
+            output = normalize_path(output)
+            outputs[output] = os.path.basename(cache_path)
+            if self.outputs.get(output) != outputs[output] or not os.path.isfile(
+                output
+            ):
+                copy_file(cache_path, output, link=True)
+                written.append(output)
+        stale = [output for output in self.outputs if output not in outputs]
+        remove_outputs(stale)
+        self.outputs = outputs
+        return ImageSet(found), written + stale
+
+    def clear(self):
+        # For a build that no longer makes derivatives: removes those it
+        # published and returns them.
+        stale = list(self.outputs)
+        remove_outputs(stale)
+        self.outputs = {}
+        return stale
+
+    def render(self, pending, jobs):
+        if not pending:
+            return
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(render_derivative, pending))
+        else:
+            for job in pending:
+                render_derivative(job)
+
+
+# The set pages are rewritten with. Empty unless the build sizes images.
+image_set = ImageSet()
+
+
+def configure_images(images=None):
+    global image_set
+    image_set = ImageSet(images)
+    return image_set
+
+
+def image_config():
+    return image_set.images
+
+
+def image_digest():
+    return image_set.digest() if image_set.images else ""
+
+
+def rewrite_images(text, page_url="/"):
+    return image_set.rewrite_html(text, page_url)
+
+
+def rewrite_image_props(tag, props, page_url="/"):
+    if not image_set.images:
+        return props
+    return image_set.rewrite_props(tag, props, page_url)
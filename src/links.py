@@ -0,0 +1,151 @@
+import os
+import posixpath
+import urllib.parse
+
+from manifest import load_json, normalize_path, save_json
+
+LinkIndexFormat = 1
+ReferenceAttributes = ("href", "src")
+
+
+def collect_references(node):
+    # Every href and src in a rendered tree, in document order.
+    references = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.props:
+            for attribute in ReferenceAttributes:
+                url = node.props.get(attribute)
+                if url is not None:
+                    references.append(url)
+        if node.children:
+            stack.extend(reversed(node.children))
+    return references
+
+
+def resolve_reference(page_url, url):
+    # The site path a reference points at, or None when it leaves the site
+    # (a scheme or host) or stays on the page (only a fragment or query).
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = urllib.parse.urljoin(page_url, parts.path)
+    return posixpath.normpath(urllib.parse.unquote(path))
+
+
+def output_paths(manifest, public_dir, extra_outputs=()):
+    # Site paths that something in public/ answers to: each output, plus
+    # the directory of an index.html and a page's extensionless URL.
+    public_dir = normalize_path(public_dir)
+    paths = set()
+    outputs = [entry["output"] for entry in manifest.pages.values()]
+    outputs.extend(entry["output"] for entry in manifest.static.values())
+    outputs.extend(extra_outputs)
+    for output in outputs:
+        relative_path = os.path.relpath(output, public_dir)
+        path = "/" + relative_path.replace(os.sep, "/")
+        paths.add(path)
+        if path.endswith("/index.html"):
+            paths.add(posixpath.dirname(path))
+        elif path.endswith(".html"):
+            paths.add(path[: -len(".html")])
+    return paths
+
+
+class LinkIndex:
+    # Outgoing links of every page, resolved to site paths, and which of
+    # them are broken. check() only re-examines pages that were rendered
+    # since the last check or that point at an output that appeared or
+    # disappeared since then; linked_from maps each target to the pages
+    # linking to it, so those pages are found without scanning every link.
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = {}
+        self.targets = set()
+        self.dirty = set()
+        self.linked_from = {}
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        data = load_json(path, LinkIndexFormat)
+        if data is None:
+            return index
+        index.pages = data.get("pages", {})
+        index.targets = set(data.get("targets", []))
+        for source, entry in index.pages.items():
+            index.link_targets(source, entry, True)
+        return index
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {"pages": self.pages, "targets": sorted(self.targets)}
+        save_json(self.path, LinkIndexFormat, data)
+
+    def has_page(self, source):
+        return normalize_path(source) in self.pages
+
+    def record_page(self, source, page_url, references):
+        source = normalize_path(source)
+        self.remove_page(source)
+        entry = {
+            "links": [
+                [url, resolve_reference(page_url, url)]
+                for url in dict.fromkeys(references)
+            ],
+            "broken": [],
+        }
+        self.pages[source] = entry
+        self.link_targets(source, entry, True)
+        self.dirty.add(source)
+
+    def remove_page(self, source):
+        source = normalize_path(source)
+        entry = self.pages.pop(source, None)
+        if entry is not None:
+            self.link_targets(source, entry, False)
+        self.dirty.discard(source)
+
+    def link_targets(self, source, entry, linked):
+        for _, target in entry["links"]:
+            if target is None:
+                continue
+            sources = self.linked_from.setdefault(target, set())
+            if linked:
+                sources.add(source)
+            else:
+                sources.discard(source)
+                if not sources:
+                    del self.linked_from[target]
+
+    def prune_pages(self, sources):
+        keep = {normalize_path(source) for source in sources}
+        for source in [source for source in self.pages if source not in keep]:
+            self.remove_page(source)
+
+    def check(self, manifest, public_dir, extra_outputs=()):
+        targets = output_paths(manifest, public_dir, extra_outputs)
+        changed = targets ^ self.targets
+        dirty = set(self.dirty)
+        for target in changed:
+            dirty.update(self.linked_from.get(target, ()))
+        for source in dirty:
+            entry = self.pages.get(source)
+            if entry is not None:
+                entry["broken"] = [
+                    url
+                    for url, target in entry["links"]
+                    if target is not None and target not in targets
+                ]
+        self.targets = targets
+        self.dirty = set()
+        return self.broken()
+
+    def broken(self):
+        return [
+            (source, url)
+            for source, entry in sorted(self.pages.items())
+            for url in entry["broken"]
+        ]
@@ -1,21 +1,111 @@
 from textnode import TextNode, TextType
-from htmlnode import ParentNode, LeafNode
+from htmlnode import ParentNode, LeafNode, escape_text, write_html
+from archive import pack_site
+from assets import (
+    AssetMap,
+    asset_config,
+    asset_digest,
+    configure_assets,
+    fingerprinted_name,
+    has_relative_references,
+    rewrite_html,
+    rewrite_props,
+    should_fingerprint,
+)
+from images import (
+    Image,
+    ImageCache,
+    configure_images,
+    image_config,
+    image_digest,
+    is_image,
+    rewrite_image_props,
+    rewrite_images,
+)
+from frontmatter import first_line, page_title, read_front_matter, split_front_matter
+from links import LinkIndex, collect_references
+from manifest import (
+    BuildManifest,
+    hash_bytes,
+    hash_file,
+    normalize_path,
+    remove_outputs,
+    replacing,
+)
+from blockcache import (
+    BlockCacheSize,
+    block_cache_config,
+    cached_render,
+    configure_block_cache,
+    flush_block_cache,
+)
+from compress import precompress_tree
+from pageio import PageIO, write_error
+from profiler import BuildProfiler
+from scan import glob_root, scan_tree
+from search import SearchIndex, collect_text, tokenize
+from siteindex import ListingPageSize, SiteIndex
+from sync import sync_file
+from template import Template, load_template, section_of, section_template_path
 from typing import List
 import re
 from enum import Enum
 import os
-import glob
+import posixpath
 import shutil
-
-HeadingPattern = r"^#{1,6}\s"
-CodePattern = r"^```.+```$"
-QuotePattern = r"^>"
-UnorderedListPattern = r"^(\*|-)\s"
-OrderedListPattern = r"^\d\.\s"
+import sys
+import argparse
+import multiprocessing
+import weakref
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+HeadingPattern = re.compile(r"#{1,6}\s")
+CodePattern = re.compile(r"```.+```$", re.DOTALL)
+QuotePattern = re.compile(r">")
+UnorderedListPattern = re.compile(r"(\*|-)\s")
+OrderedListPattern = re.compile(r"\d\.\s")
+QuotePrefixPattern = re.compile(r"^>\s*")
+ListMarkerPattern = re.compile(r"^(\*|-|\d\.)\s")
+HeadingPrefixPattern = re.compile(r"^#+\s*")
+CodeFence = "```"
+# Link text and targets match lazily, as when links were split out with
+# their own regex; that ran after images, so a link never spans an image.
+LinkText = r"(?:(?!!\[.*?\]\(.*?\)).)*?"
+InlinePattern = re.compile(
+    r"!\[(?P<alt>.*?)\]\((?P<image>.*?)\)"
+    rf"|\[(?P<anchor>{LinkText})\]\((?P<link>{LinkText})\)"
+    r"|`(?P<code>[^`]*)`"
+    r"|\*\*(?P<bold>.*?)\*\*"
+    r"|\*(?P<italic>[^*]+?)\*"
+)
 PublicDir = "./public"
 StaticDir = "./static/**/*"
 PublicDirStr = "/public"
 StaticDirStr = "/static"
+ManifestPath = "./.build/manifest.json"
+LinkIndexPath = "./.build/links.json"
+SiteIndexPath = "./.build/site.json"
+SearchIndexPath = "./.build/search.json"
+AssetManifestPath = "./.build/assets.json"
+ImageCacheDir = "./.build/images"
+ShardsPerJob = 4
+StreamThreshold = 16 * 1024 * 1024
+BlockCachePath = "./.build/blocks.sqlite"
+ContentDir = "./content"
+TemplatePath = "template.html"
+PageSuffixes = (".md",)
+ProfiledStages = (
+    "copy_dir",
+    "hash_file",
+    "read_source",
+    "markdown_to_blocks",
+    "block_to_html_node",
+    "text_to_textnodes",
+    "render_page",
+    "write_output",
+    "precompress_tree",
+)
 
 
 class BlockType(Enum):
@@ -27,6 +117,13 @@ class BlockType(Enum):
     OrderedList = 6
 
 
+InlineTextTypes = {
+    "code": TextType.text_type_code,
+    "bold": TextType.text_type_bold,
+    "italic": TextType.text_type_italic,
+}
+
+
 def text_node_to_html_node(text_node: TextNode):
     text_type = text_node.text_type
     if text_type == TextType.text_type_text:
@@ -48,17 +145,24 @@ def text_node_to_html_node(text_node: TextNode):
 def split_nodes_delimiter(old_nodes: List[TextNode], delimiter, text_type: TextType):
     rslt = []
     for old_node in old_nodes:
-        if old_node.text_type == TextType.text_type_text:
-            arr = old_node.text.split(delimiter, 2)
-            if len(arr) == 1:
-                rslt.append(old_node)
-            else:
-                rslt.append(TextNode(arr[0], TextType.text_type_text))
-                rslt.append(TextNode(arr[1], text_type))
-                text_node = TextNode(arr[2], TextType.text_type_text)
-                rslt.extend(split_nodes_delimiter([text_node], delimiter, text_type))
-        else:
+        if old_node.text_type != TextType.text_type_text:
             rslt.append(old_node)
+            continue
+        text = old_node.text
+        start = text.find(delimiter)
+        if start == -1:
+            rslt.append(old_node)
+            continue
+        position = 0
+        while start != -1:
+            end = text.find(delimiter, start + len(delimiter))
+            if end == -1:
+                raise ValueError(f"unmatched delimiter {delimiter} in {text!r}")
+            rslt.append(TextNode(text[position:start], TextType.text_type_text))
+            rslt.append(TextNode(text[start + len(delimiter) : end], text_type))
+            position = end + len(delimiter)
+            start = text.find(delimiter, position)
+        rslt.append(TextNode(text[position:], TextType.text_type_text))
     return rslt
 
 
@@ -73,21 +177,17 @@ def extract_markdown_links(text):
 
 
 def parse_images_links(text, images_links, formatter, text_type, acc):
-    # print(f"parsing {text}")
-    img_link = images_links[0]
-    arr = text.split(formatter(img_link), 1)
-    if arr[0] != "":
-        txt_node = TextNode(arr[0], TextType.text_type_text)
-        acc.append(txt_node)
-    img_link_node = TextNode(img_link[0], text_type, img_link[1])
-    acc.append(img_link_node)
-    if not images_links[1:]:
-        if arr[1] != "":
-            txt_node = TextNode(arr[1], TextType.text_type_text)
-            acc.append(txt_node)
-        return acc
-    else:
-        return parse_images_links(arr[1], images_links[1:], formatter, text_type, acc)
+    position = 0
+    for img_link in images_links:
+        marker = formatter(img_link)
+        index = text.find(marker, position)
+        if index > position:
+            acc.append(TextNode(text[position:index], TextType.text_type_text))
+        acc.append(TextNode(img_link[0], text_type, img_link[1]))
+        position = index + len(marker)
+    if position < len(text):
+        acc.append(TextNode(text[position:], TextType.text_type_text))
+    return acc
 
 
 def split_nodes(old_nodes: List[TextNode], extractor, formatter, text_type):
@@ -127,32 +227,98 @@ def split_nodes_link(old_nodes: List[TextNode]):
 
 
 def text_to_textnodes(text):
-    text_node = TextNode(text, TextType.text_type_text)
-    rslt = split_nodes_image([text_node])
-    rslt = split_nodes_link(rslt)
-    rslt = split_nodes_delimiter(rslt, "**", TextType.text_type_bold)
-    rslt = split_nodes_delimiter(rslt, "*", TextType.text_type_italic)
-    rslt = split_nodes_delimiter(rslt, "`", TextType.text_type_code)
+    # One left-to-right scan over the text: every inline construct is an
+    # alternative of InlinePattern, so the contents of a code span or of an
+    # emphasis run are never re-scanned for other delimiters.
+    rslt = []
+    position = 0
+    for match in InlinePattern.finditer(text):
+        start = match.start()
+        if start > position:
+            rslt.append(TextNode(text[position:start], TextType.text_type_text))
+        kind = match.lastgroup
+        if kind == "image":
+            rslt.append(
+                TextNode(
+                    match.group("alt"), TextType.text_type_image, match.group("image")
+                )
+            )
+        elif kind == "link":
+            rslt.append(
+                TextNode(
+                    match.group("anchor"), TextType.text_type_link, match.group("link")
+                )
+            )
+        else:
+            rslt.append(TextNode(match.group(kind), InlineTextTypes[kind]))
+        position = match.end()
+    if position < len(text):
+        rslt.append(TextNode(text[position:], TextType.text_type_text))
     return rslt
 
 
+def iter_blocks(lines):
+    # Blocks are separated by blank (or whitespace-only) lines. Accepts any
+    # iterable of lines, including an open file, and only ever holds the
+    # lines of the current block. A block that opens with a code fence runs
+    # to its closing fence and is yielded whole, blank lines included.
+    block = []
+    fenced = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if fenced:
+            block.append(line)
+            if line.rstrip().endswith(CodeFence):
+                yield "\n".join(block).strip()
+                block = []
+                fenced = False
+        elif line.isspace() or line == "":
+            if block:
+                yield "\n".join(block).strip()
+                block = []
+        else:
+            block.append(line)
+            if len(block) == 1 and line.lstrip().startswith(CodeFence):
+                fenced = not is_code(line.strip())
+    if fenced:
+        # An unclosed fence is not code; its lines split like plain text.
+        yield from split_on_blank_lines(block)
+    elif block:
+        yield "\n".join(block).strip()
+
+
+def split_on_blank_lines(lines):
+    block = []
+    for line in lines:
+        if line.isspace() or line == "":
+            if block:
+                yield "\n".join(block).strip()
+                block = []
+        else:
+            block.append(line)
+    if block:
+        yield "\n".join(block).strip()
+
+
 def markdown_to_blocks(markdown):
-    blocks = re.split(r"\n\s*\n", markdown, flags=re.MULTILINE)
-    blocks = [block.strip() for block in blocks]
-    return list(filter(lambda str: str != "", blocks))
+    return list(iter_blocks(markdown.split("\n")))
 
 
 def is_heading(block):
-    return re.match(HeadingPattern, block)
+    return HeadingPattern.match(block)
 
 
 def is_code(block):
-    return re.match(CodePattern, block, re.DOTALL)
+    return (
+        len(block) > 2 * len(CodeFence)
+        and block.startswith(CodeFence)
+        and block.endswith(CodeFence)
+    )
 
 
 def all_lines_match_pattern(block, pattern):
     lines = block.split("\n")
-    return all(re.match(pattern, line) for line in lines)
+    return all(pattern.match(line) for line in lines)
 
 
 def is_quote(block):
@@ -167,19 +333,34 @@ def is_ordered_list(block):
     return all_lines_match_pattern(block, OrderedListPattern)
 
 
+def classify_block(block):
+    # Dispatches on the first character so that each block is checked
+    # against at most one pattern, and splits it into lines at most once.
+    # The lines are returned for the renderers that work line by line.
+    first = block[:1]
+    if first == "#":
+        if is_heading(block):
+            return BlockType.Heading, None
+    elif first == "`":
+        if is_code(block):
+            return BlockType.Code, None
+    elif first == ">":
+        lines = block.split("\n")
+        if all(QuotePattern.match(line) for line in lines):
+            return BlockType.Quote, lines
+    elif first == "*" or first == "-":
+        lines = block.split("\n")
+        if all(UnorderedListPattern.match(line) for line in lines):
+            return BlockType.UnorderedList, lines
+    elif first.isdigit():
+        lines = block.split("\n")
+        if all(OrderedListPattern.match(line) for line in lines):
+            return BlockType.OrderedList, lines
+    return BlockType.Paragraph, None
+
+
 def block_to_block_type(block: str) -> BlockType:
-    if is_heading(block):
-        return BlockType.Heading
-    elif is_code(block):
-        return BlockType.Code
-    elif is_quote(block):
-        return BlockType.Quote
-    elif is_unordered_list(block):
-        return BlockType.UnorderedList
-    elif is_ordered_list(block):
-        return BlockType.OrderedList
-    else:
-        return BlockType.Paragraph
+    return classify_block(block)[0]
 
 
 def render_paragraph(block):
@@ -187,21 +368,25 @@ def render_paragraph(block):
     return ParentNode("p", [text_node_to_html_node(child) for child in children])
 
 
-def render_quote(block):
+def render_quote(block, lines=None):
     parent = ParentNode("blockquote")
     children = []
-    lines = block.split("\n")
+    if lines is None:
+        lines = block.split("\n")
     for line in lines:
-        inner_text = re.sub(r"^>\s*", "", line)
+        inner_text = QuotePrefixPattern.sub("", line)
         children.append(LeafNode("p", inner_text))
     parent.children = children
     return parent
 
-def render_list(block, parent_tag):
+
+def render_list(block, parent_tag, lines=None):
     parent = ParentNode(parent_tag)
     children = []
-    for line in block.split("\n"):
-        inner_text = re.sub(r"^(\*|-|\d\.)\s", "", line)
+    if lines is None:
+        lines = block.split("\n")
+    for line in lines:
+        inner_text = ListMarkerPattern.sub("", line)
         li_children = [text_node_to_html_node(child) for child in text_to_textnodes(inner_text)]
         children.append(ParentNode("li", li_children))
     parent.children = children
@@ -209,11 +394,10 @@ def render_list(block, parent_tag):
 
 
 def render_code(block):
-    inner_text = block.replace("```", "").strip()
-    parent = ParentNode("pre")
-    child = LeafNode("code", inner_text)
-    parent.children = [child]
-    return parent
+    # Code is verbatim: no inline parsing, just the fences sliced off. The
+    # leaf escapes it when the page is serialized.
+    inner_text = block[len(CodeFence) : -len(CodeFence)].strip()
+    return ParentNode("pre", [LeafNode("code", inner_text)])
 
 
 def count_leading_characters(s, char):
@@ -228,87 +412,808 @@ def count_leading_characters(s, char):
 
 def render_heading(block):
     level = count_leading_characters(block, "#")
-    inner_text = re.sub(r"^#+\s*", "", block)
+    inner_text = HeadingPrefixPattern.sub("", block)
     children = [text_node_to_html_node(child) for child in text_to_textnodes(inner_text)]
     return ParentNode(f"h{level}", children)
 
 
+def block_to_html_node(block):
+    block_type, lines = classify_block(block)
+    if block_type == BlockType.Quote:
+        return render_quote(block, lines)
+    elif block_type == BlockType.UnorderedList:
+        return render_list(block, "ul", lines)
+    elif block_type == BlockType.OrderedList:
+        return render_list(block, "ol", lines)
+    elif block_type == BlockType.Code:
+        return render_code(block)
+    elif block_type == BlockType.Heading:
+        return render_heading(block)
+    else:
+        return render_paragraph(block)
+
+
 def markdown_to_html_node(markdown):
     blocks = markdown_to_blocks(markdown)
     parent = ParentNode("div")
-    children = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.Quote:
-            children.append(render_quote(block))
-        elif block_type == BlockType.UnorderedList:
-            children.append(render_list(block, "ul"))
-        elif block_type == BlockType.OrderedList:
-            children.append(render_list(block, "ol"))
-        elif block_type == BlockType.Code:
-            children.append(render_code(block))
-        elif block_type == BlockType.Heading:
-            children.append(render_heading(block))
-        else:
-            children.append(render_paragraph(block))
-    parent.children = children
+    parent.children = [cached_render(block, block_to_html_node) for block in blocks]
     return parent
 
 
-def copy_dir(source_dir, dest_dir, source_dir_str, dest_dir_str):
-    shutil.rmtree(dest_dir)
-    os.makedirs(dest_dir)
+def copy_dir(
+    source_dir,
+    dest_dir,
+    source_dir_str,
+    dest_dir_str,
+    manifest=None,
+    link=False,
+    checksum=False,
+    names=None,
+):
+    # names maps sources to the fingerprinted file names they are copied to.
+    if manifest is None:
+        shutil.rmtree(dest_dir)
+        os.makedirs(dest_dir)
+    else:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    seen = []
+    for found in scan_tree(glob_root(source_dir)):
+        source = found.path
+        directory, file_name = os.path.split(source)
+        if names is not None:
+            file_name = names.get(normalize_path(source), file_name)
+        destination_directory = directory.replace(source_dir_str, dest_dir_str, 1)
+        destination_file = os.path.join(destination_directory, file_name)
+        if manifest is None:
+            os.makedirs(destination_directory, exist_ok=True)
+            shutil.copy(source, destination_file)
+            continue
+
+        seen.append(source)
+        # The scanner's DirEntry caches the stat for the sync and manifest.
+        stat = found.stat()
+        entry = manifest.static_entry(source, destination_file)
+        previous = manifest.static.get(normalize_path(source))
+        if entry is None and previous is not None:
+            # Fingerprinted under another name, or no longer fingerprinted.
+            remove_outputs([previous["output"]])
+        source_hash, copied = sync_file(
+            source, destination_file, entry, stat, link, checksum
+        )
+        manifest.record_static(source, source_hash, destination_file, stat)
+
+    if manifest is not None:
+        remove_outputs(manifest.prune_static(seen))
+
+
+def recorded_hash(source, stat, entry):
+    # A file whose size and mtime match its manifest entry reuses the hash
+    # recorded there instead of being read again.
+    if (
+        entry is not None
+        and entry.get("size") == stat.st_size
+        and entry.get("mtime") == stat.st_mtime_ns
+    ):
+        return entry["hash"]
+    return hash_file(source)
+
+
+def static_hash(source, stat, manifest=None):
+    entry = None
+    if manifest is not None:
+        entry = manifest.static.get(normalize_path(source))
+    return recorded_hash(source, stat, entry)
+
+
+def fingerprint_static(source_dir, manifest=None):
+    # Returns the asset map's URLs and the fingerprinted file name of each
+    # source.
+    root = glob_root(source_dir)
+    urls = {}
+    names = {}
+    for found in scan_tree(root):
+        source = found.path
+        if not should_fingerprint(source):
+            continue
+        source_hash = static_hash(source, found.stat(), manifest)
+        name = fingerprinted_name(os.path.basename(source), source_hash)
+        url = "/" + os.path.relpath(source, root).replace(os.sep, "/")
+        urls[url] = posixpath.join(posixpath.dirname(url), name)
+        names[normalize_path(source)] = name
+    return urls, names
+
+
+def static_images(source_dir, dest_dir, manifest=None, names=None):
+    # (source, hash, URL pages use, output in dest_dir) for each image.
+    root = glob_root(source_dir)
+    images = []
+    for found in scan_tree(root):
+        source = found.path
+        if not is_image(source):
+            continue
+        relative_path = os.path.relpath(source, root)
+        url = "/" + relative_path.replace(os.sep, "/")
+        if names is not None:
+            file_name = names.get(normalize_path(source), found.name)
+            relative_path = os.path.join(os.path.dirname(relative_path), file_name)
+        output = os.path.join(dest_dir, relative_path)
+        source_hash = static_hash(source, found.stat(), manifest)
+        images.append((source, source_hash, url, output))
+    return images
+
+
+def write_images(image_cache, source_dir, dest_dir, manifest, names, jobs):
+    image_set, written = image_cache.build(
+        static_images(source_dir, dest_dir, manifest, names), dest_dir, jobs
+    )
+    image_cache.save()
+    for output in written:
+        if os.path.exists(output):
+            print(f"writing {output}")
+    configure_images(image_set.images)
+
+
+# Templates with their markup rewritten for the asset map and image set in
+# force, or None for templates that must be rewritten per page.
+finished_templates = weakref.WeakKeyDictionary()
+
+
+def finish_page(text, page_url):
+    # Rewrites template markup. Image sizes are looked up by the paths pages
+    # use, so they are added before those paths are rewritten to
+    # fingerprinted ones.
+    return rewrite_html(rewrite_images(text, page_url), page_url)
+
+
+def rewrite_page_props(page_url):
+    # The same passes for rendered content, applied to node props as they
+    # are serialized: text that merely looks like markup is never touched.
+    if not asset_config() and not image_config():
+        return None
+
+    def rewrite(tag, props):
+        return rewrite_props(rewrite_image_props(tag, props, page_url), page_url)
+
+    return rewrite
+
+
+def finish_template(template, page_url):
+    # A template's literals are rewritten once per asset map and image set;
+    # only one naming assets by relative paths is rewritten for every page.
+    assets = asset_config()
+    images = image_config()
+    if not assets and not images:
+        return template
+    cached = finished_templates.get(template)
+    if cached is None or cached[0] is not assets or cached[1] is not images:
+        finished = None
+        if not any(has_relative_references(text) for text in template.literals):
+            finished = template.map_literals(lambda text: finish_page(text, "/"))
+        cached = (assets, images, finished)
+        finished_templates[template] = cached
+    if cached[2] is not None:
+        return cached[2]
+    return template.map_literals(lambda text: finish_page(text, page_url))
+
+
+def hash_page_template(path):
+    # Pages embed fingerprinted URLs and image sizes, so a different asset
+    # map or image set makes every page stale just as a template edit would.
+    template_hash = hash_file(path)
+    digests = asset_digest() + image_digest()
+    if not digests:
+        return template_hash
+    return hash_bytes(f"{template_hash}\0{digests}".encode())
+
+
+def extract_title(markdown, url=None):
+    metadata, body = split_front_matter(markdown)
+    return page_title(metadata, first_line(body), url)
+
+
+def metadata_values(metadata):
+    # Front matter keys are lower case, so they never shadow Title,
+    # Content, Path or Section; list values are joined for templates.
+    return {
+        key: escape_text(", ".join(value) if isinstance(value, list) else str(value))
+        for key, value in metadata.items()
+    }
+
+
+def render_page(markdown, template, values=None, details=None):
+    # details, when given, collects the page's title, front matter, search
+    # term counts and the href and src values it links to.
+    if isinstance(template, str):
+        template = Template(template)
+    metadata, markdown = split_front_matter(markdown)
+    values = dict(values or {})
+    values.update(metadata_values(metadata))
+    title = page_title(metadata, first_line(markdown), values.get("Path"))
+    values["Title"] = escape_text(title)
+    node = markdown_to_html_node(markdown)
+    if details is not None:
+        details["title"] = title
+        details["metadata"] = metadata
+        details["references"] = collect_references(node)
+        tokens = tokenize(collect_text(node))
+        details["terms"] = Counter(tokens)
+        details["length"] = len(tokens)
+    values["Content"] = node.to_html(rewrite_page_props(values.get("Path")))
+    return finish_template(template, values.get("Path")).render(values)
+
+
+def write_page(from_path, template, dest_path, values=None, io=None, details=None):
+    # With an io, the source comes from its read-ahead and the output is
+    # handed to its write-behind; the returned Future reports the write.
+    directory = os.path.dirname(dest_path)
+    if io is None:
+        os.makedirs(directory, exist_ok=True)
+    else:
+        io.makedirs(directory)
+    if os.path.getsize(from_path) >= StreamThreshold:
+        if io is not None:
+            io.discard(from_path)
+        write_page_streaming(from_path, template, dest_path, values, details)
+        return None
+    if io is None:
+        markdown = read_source(from_path)
+        write_output(dest_path, render_page(markdown, template, values, details))
+        return None
+    page = render_page(io.read(from_path), template, values, details)
+    return io.write(dest_path, page)
+
+
+def read_source(path):
+    with open(path, "r") as file:
+        return file.read()
+
+
+def write_output(path, text):
+    # Leaves the file, and so its mtime, alone when the bytes are unchanged.
+    data = text.encode()
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as file:
+                if file.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    with replacing(path) as file:
+        file.write(data)
+    return True
+
+
+def write_page_streaming(from_path, template, dest_path, values=None, details=None):
+    # Renders one block at a time straight into the output file, so memory
+    # stays bounded by the largest block instead of the whole document.
+    if isinstance(template, str):
+        template = Template(template)
+    values = dict(values or {})
+    with open(from_path, "r") as source:
+        metadata, heading = read_front_matter(source)
+        values.update(metadata_values(metadata))
+        title = page_title(metadata, heading, values.get("Path"))
+        values["Title"] = escape_text(title)
+        if details is not None:
+            details["title"] = title
+            details["metadata"] = metadata
+            # Only running totals are kept: distinct references and term
+            # counts, never the page's full text.
+            details["references"] = {}
+            details["terms"] = Counter()
+            details["length"] = 0
+        template = finish_template(template, values.get("Path"))
+        head, tail = template.render_around(values, "Content")
+        rewrite = rewrite_page_props(values.get("Path"))
+        with replacing(dest_path, "w", keep_identical=True) as file:
+            file.write(head)
+            file.write("<div>")
+            for block in iter_blocks(source):
+                node = cached_render(block, block_to_html_node)
+                if details is not None:
+                    references = collect_references(node)
+                    details["references"].update(dict.fromkeys(references))
+                    tokens = tokenize(collect_text(node))
+                    details["terms"].update(tokens)
+                    details["length"] += len(tokens)
+                write_html(node, file.write, rewrite)
+            file.write("</div>")
+            file.write(tail)
+
+
+def generate_page(from_path, template_path, dest_path, values=None):
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    write_page(from_path, load_template(template_path), dest_path, values)
+
+
+def page_url(relative_path):
+    url = "/" + relative_path.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        url = url[: -len("index.html")]
+    return url
+
+
+def page_source(page):
+    return page[0]
+
+
+def render_shard(pages):
+    # Runs in a worker process; load_template keeps a per-process cache, so
+    # each worker reads a given template once however many pages use it.
+    results = []
+    with PageIO(read_source, write_output) as io:
+        for source, destination, template_path, values in io.read_ahead(
+            pages, page_source, StreamThreshold
+        ):
+            details = {}
+            try:
+                template = load_template(template_path)
+                result = write_page(source, template, destination, values, io, details)
+            except Exception as e:
+                result = e
+            results.append((result, details))
+    flush_block_cache()
+    return [(write_error(result), details) for result, details in results]
+
+
+def shard_pages(pages, jobs):
+    size = max(1, len(pages) // (jobs * ShardsPerJob))
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+def configure_worker(cache_size, cache_path, asset_urls, images):
+    configure_block_cache(cache_size, cache_path)
+    configure_assets(asset_urls)
+    configure_images(images)
+
+
+def worker_context():
+    # Pages render while the static sync runs on a thread. A forked worker
+    # inherits any lock that thread holds at that moment, such as the
+    # stdout lock, and can block on it forever, so workers are started from
+    # a clean process instead.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
 
-    source_files = glob.glob(source_dir, recursive=True)
-    for source in source_files:
-        if os.path.isfile(source):
-            directory, file_name = os.path.split(source)
 
-            destination_directory = directory.replace(source_dir_str, dest_dir_str, 1)
-            os.makedirs(destination_directory, exist_ok=True)
+def render_pages_parallel(pages, jobs):
+    shards = shard_pages(pages, jobs)
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=worker_context(),
+        initializer=configure_worker,
+        initargs=(*block_cache_config(), asset_config(), image_config()),
+    ) as executor:
+        # map yields shards in submission order, which keeps the console
+        # output and error report identical from run to run.
+        for shard, results in zip(shards, executor.map(render_shard, shards)):
+            for page, (error, details) in zip(shard, results):
+                yield page, error, details
+
+
+def plan_page(source, dir_path_content, template_path, dest_dir_path):
+    relative_path = os.path.relpath(source, dir_path_content)
+    destination_path = os.path.join(dest_dir_path, relative_path)
+    destination_file = os.path.join(destination_path.replace(".md", ".html"))
+    page_template = section_template_path(template_path, relative_path)
+    values = {
+        "Path": page_url(relative_path.replace(".md", ".html")),
+        "Section": section_of(relative_path),
+    }
+    return destination_file, page_template, values
+
+
+def generate_pages(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    manifest=None,
+    jobs=1,
+    include=None,
+    exclude=None,
+    links=None,
+    site=None,
+    search=None,
+):
+    template_hashes = {}
+    seen = []
+    hashes = {}
+
+    def discover():
+        for entry in scan_tree(dir_path_content, include, exclude, PageSuffixes):
+            source = entry.path
+            destination_file, page_template, values = plan_page(
+                source, dir_path_content, template_path, dest_dir_path
+            )
+            if manifest is not None:
+                if page_template not in template_hashes:
+                    template_hashes[page_template] = hash_page_template(page_template)
+                seen.append(source)
+                # The scanner's DirEntry caches the stat; unchanged sources
+                # are not read at all.
+                stat = entry.stat()
+                source_hash = recorded_hash(
+                    source, stat, manifest.pages.get(normalize_path(source))
+                )
+                # A page missing from the link or search index is rendered
+                # again to learn its links and text.
+                if (
+                    manifest.is_page_fresh(
+                        source,
+                        source_hash,
+                        template_hashes[page_template],
+                        destination_file,
+                    )
+                    and (links is None or links.has_page(source))
+                    and (search is None or search.has_page(source))
+                ):
+                    if site is not None and not site.has_page(source):
+                        index_page_header(site, source, destination_file, values)
+                    continue
+                hashes[source] = (source_hash, stat)
+            yield source, destination_file, page_template, values
+
+    def record(source, destination_file, page_template, values, details):
+        if manifest is not None:
+            source_hash, stat = hashes[source]
+            manifest.record_page(
+                source,
+                source_hash,
+                template_hashes[page_template],
+                destination_file,
+                page_template,
+                stat,
+            )
+            if links is not None:
+                links.record_page(source, values["Path"], details["references"])
+            if site is not None:
+                site.record_page(
+                    source,
+                    details["title"],
+                    details["metadata"],
+                    values["Section"],
+                    values["Path"],
+                    destination_file,
+                )
+            if search is not None:
+                search.record_terms(
+                    source,
+                    values["Path"],
+                    details["title"],
+                    details["terms"],
+                    details["length"],
+                )
 
-            destination_file = os.path.join(destination_directory, file_name)
-            shutil.copy(source, destination_file)
+    # Serial builds render each page as soon as the scan reaches it; shards
+    # for the worker pool are cut from the full list.
+    pending = discover()
+    if jobs > 1:
+        pending = list(pending)
+    if jobs > 1 and len(pending) > 1:
+        failures = []
+        for page, error, details in render_pages_parallel(pending, jobs):
+            source, destination_file, page_template, values = page
+            if error is not None:
+                failures.append((source, error))
+                continue
+            print(f"writing {destination_file}")
+            record(source, destination_file, page_template, values, details)
+        if failures:
+            for source, error in failures:
+                print(f"error generating {source}: {error}")
+            raise Exception(f"{len(failures)} of {len(pending)} pages failed")
+    else:
+        written = []
+        with PageIO(read_source, write_output) as io:
+            for page in io.read_ahead(pending, page_source, StreamThreshold):
+                source, destination_file, page_template, values = page
+                print(f"writing {destination_file}")
+                template = load_template(page_template)
+                details = {}
+                result = write_page(
+                    source, template, destination_file, values, io, details
+                )
+                written.append((page, result, details))
+        failures = []
+        for page, result, details in written:
+            source, destination_file, page_template, values = page
+            error = write_error(result)
+            if error is not None:
+                failures.append((source, error))
+            else:
+                record(source, destination_file, page_template, values, details)
+        if failures:
+            for source, error in failures:
+                print(f"error writing {source}: {error}")
+            raise Exception(f"{len(failures)} of {len(written)} pages failed")
+
+    if manifest is not None:
+        filtered = bool(include or exclude)
+        remove_outputs(manifest.prune_pages(seen, filtered))
+        if links is not None:
+            links.prune_pages(manifest.pages)
+        if site is not None:
+            site.prune_pages(manifest.pages)
+        if search is not None:
+            search.prune_pages(manifest.pages)
+
+
+def index_page_header(site, source, destination_file, values):
+    # Fills in the site index for a page that is already built by reading
+    # only its front matter and first line.
+    with open(source, "r") as file:
+        metadata, heading = read_front_matter(file)
+    title = page_title(metadata, heading, values["Path"])
+    site.record_page(
+        source, title, metadata, values["Section"], values["Path"], destination_file
+    )
 
 
-def extract_title(markdown):
-    return re.match(r"#\s([^\n]+)", markdown).group(1)
+def listing_template_path(template_path):
+    # Listings use templates/listing.html when there is one.
+    directory = os.path.join(os.path.dirname(template_path), "templates")
+    candidate = os.path.join(directory, "listing.html")
+    return candidate if os.path.isfile(candidate) else template_path
 
 
-def generate_page(from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    markdown = None
-    template = None
-    with open(from_path, "r") as file:
-        markdown = file.read()
-    with open(template_path, "r") as file:
-        template = file.read()
-    html = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
-    directory, file_name = os.path.split(dest_path)
-    os.makedirs(directory, exist_ok=True)
-    with open(dest_path, "w") as file:
-        file.write(template)
-
-def generate_pages(dir_path_content, template_path, dest_dir_path):
-    source_files = glob.glob(dir_path_content + "/**/*", recursive=True)
-    print(source_files)
-    for source in source_files:
-        if os.path.isfile(source):
-            relative_path = os.path.relpath(source, dir_path_content)
-            destination_path = os.path.join(dest_dir_path, relative_path)
-            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-            destination_file = os.path.join(destination_path.replace(".md", ".html"))
-            print(f"writing {destination_file}")
-            generate_page(source, template_path, destination_file)
+def write_site_listings(site, template_path, public_dir, page_size=ListingPageSize):
+    path = listing_template_path(template_path)
+    template = load_template(path)
 
+    def render(values):
+        return finish_template(template, values["Path"]).render(values)
 
-def main():
-    copy_dir(StaticDir, PublicDir, StaticDirStr, PublicDirStr)
-    generate_pages("./content", "template.html", "./public")
+    written = site.write_listings(
+        public_dir, render, hash_page_template(path), write_output, page_size
+    )
+    for output in written:
+        if os.path.exists(output):
+            print(f"writing {output}")
+    return written
+
+
+def write_search_index(search, public_dir):
+    written = search.write(public_dir)
+    for output in written:
+        if os.path.exists(output):
+            print(f"writing {output}")
+        else:
+            print(f"removing stale {output}")
+    return written
+
+
+def report_broken_links(broken):
+    for source, url in broken:
+        print(f"broken link in {source}: {url}")
+    if broken:
+        print(f"{len(broken)} broken link(s)")
+
+
+def parse_widths(text):
+    return tuple(int(width) for width in text.split(",") if width.strip())
+
+
+def main(
+    force=False,
+    jobs=1,
+    cache_size=BlockCacheSize,
+    disk_cache=False,
+    link_static=False,
+    checksum=False,
+    precompress=False,
+    profile=False,
+    profile_output=None,
+    include=None,
+    exclude=None,
+    listing_page_size=ListingPageSize,
+    fingerprint=False,
+    image_widths=(),
+    archive=None,
+):
+    profiler = None
+    if profile:
+        # Stages are timed in this process only, so render serially.
+        jobs = 1
+        profiler = BuildProfiler()
+        profiler.instrument(sys.modules[__name__], ProfiledStages)
+        profiler.instrument(sys.modules[__name__], ["write_page"], page=True)
+        profiler.instrument(ParentNode, ["to_html"])
+    configure_block_cache(cache_size, BlockCachePath if disk_cache else None)
+    if force:
+        shutil.rmtree(PublicDir, ignore_errors=True)
+        manifest = BuildManifest(ManifestPath)
+        links = LinkIndex(LinkIndexPath)
+        site = SiteIndex(SiteIndexPath)
+        search = SearchIndex(SearchIndexPath)
+    else:
+        manifest = BuildManifest.load(ManifestPath)
+        links = LinkIndex.load(LinkIndexPath)
+        site = SiteIndex.load(SiteIndexPath)
+        search = SearchIndex.load(SearchIndexPath)
+    names = None
+    if fingerprint:
+        asset_urls, names = fingerprint_static(StaticDir, manifest)
+        configure_assets(asset_urls)
+    try:
+        if image_widths:
+            if Image is None:
+                print("Pillow is not installed: images get sizes but no variants")
+            write_images(
+                ImageCache(ImageCacheDir, image_widths),
+                StaticDir,
+                PublicDir,
+                manifest,
+                names,
+                jobs,
+            )
+        else:
+            image_cache = ImageCache(ImageCacheDir, ())
+            if image_cache.clear():
+                image_cache.save()
+        # Static files and pages touch disjoint parts of the manifest and of
+        # public/, so the asset sync runs alongside page generation.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            static_sync = executor.submit(
+                copy_dir,
+                StaticDir,
+                PublicDir,
+                StaticDirStr,
+                PublicDirStr,
+                manifest,
+                link_static,
+                checksum,
+                names,
+            )
+            try:
+                generate_pages(
+                    ContentDir,
+                    TemplatePath,
+                    PublicDir,
+                    manifest,
+                    jobs,
+                    include,
+                    exclude,
+                    links,
+                    site,
+                    search,
+                )
+            finally:
+                static_sync.result()
+        write_site_listings(site, TemplatePath, PublicDir, listing_page_size)
+        write_search_index(search, PublicDir)
+        # Pages link to assets by their original paths.
+        extra_outputs = list(site.listings)
+        extra_outputs.extend(
+            os.path.join(PublicDir, url.lstrip("/")) for url in asset_config()
+        )
+        report_broken_links(links.check(manifest, PublicDir, extra_outputs))
+        if fingerprint:
+            AssetMap(asset_config()).save(AssetManifestPath)
+        elif os.path.exists(AssetManifestPath):
+            os.remove(AssetManifestPath)
+        if precompress:
+            precompress_tree(PublicDir, jobs)
+        if archive:
+            files, bodies = pack_site(PublicDir, archive)
+            print(f"packed {files} file(s), {bodies} distinct, into {archive}")
+    finally:
+        manifest.save()
+        links.save()
+        site.save()
+        search.save()
+        configure_block_cache(0)
+        configure_assets()
+        configure_images()
+        if profiler is not None:
+            profiler.restore()
+            print(profiler.report())
+            if profile_output:
+                profiler.dump(profile_output)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the build manifest and rebuild everything",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes rendering pages (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=BlockCacheSize,
+        help="Rendered blocks kept in memory for reuse (0 disables the cache)",
+    )
+    parser.add_argument(
+        "--disk-cache",
+        action="store_true",
+        help=f"Persist rendered blocks between builds in {BlockCachePath}",
+    )
+    parser.add_argument(
+        "--link-static",
+        action="store_true",
+        help="Hardlink static files into public/ when on the same filesystem",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="Compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write .gz (and .br, with the brotli module) siblings of text outputs",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each build stage and print the slowest pages (renders serially)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="PATH",
+        help="With --profile, also write stats and a Chrome trace as JSON",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="Only build pages whose path under content/ matches (repeatable)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="PATTERN",
+        help="Skip content files and directories that match (repeatable)",
+    )
+    parser.add_argument(
+        "--listing-page-size",
+        type=int,
+        default=ListingPageSize,
+        help="Pages listed per page of a section or tag listing",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="Copy assets under content-hashed names and rewrite references to them",
+    )
+    parser.add_argument(
+        "--image-widths",
+        type=parse_widths,
+        default=(),
+        metavar="WIDTHS",
+        help="Resize images to these comma-separated widths and add srcset (Pillow)",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="PATH",
+        help="Also pack public/ into one indexed file for server.py --archive",
+    )
+    args = parser.parse_args()
+
+    main(
+        force=args.force,
+        jobs=args.jobs or os.cpu_count(),
+        cache_size=args.cache_size,
+        disk_cache=args.disk_cache,
+        link_static=args.link_static,
+        checksum=args.checksum,
+        precompress=args.precompress,
+        profile=args.profile or bool(args.profile_output),
+        profile_output=args.profile_output,
+        include=args.include,
+        exclude=args.exclude,
+        listing_page_size=args.listing_page_size,
+        fingerprint=args.fingerprint,
+        image_widths=args.image_widths,
+        archive=args.archive,
+    )
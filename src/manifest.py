@@ -0,0 +1,188 @@
+import contextlib
+import hashlib
+import json
+import os
+
+# Bump whenever a change to the renderer alters the generated HTML, so that
+# outputs recorded by an older build are not mistaken for fresh ones.
+RendererVersion = 6
+ManifestFormat = 3
+HashChunkSize = 1 << 16
+ReplaceSuffix = ".tmp"
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HashChunkSize), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_json(path, data_format):
+    # What save_json wrote at path, or None for a missing or unreadable file
+    # or one in another format.
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != data_format:
+        return None
+    return data
+
+
+def save_json(path, data_format, data, indent=1):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with replacing(path, "w") as file:
+        json.dump({"format": data_format, **data}, file, indent=indent, sort_keys=True)
+
+
+@contextlib.contextmanager
+def replacing(path, mode="wb", keep_identical=False):
+    # Yields a file open on a sibling of path that is renamed over path when
+    # the block ends, so a server reading public/ during a build, or the
+    # next build, never sees a partial file. With keep_identical, an output
+    # whose bytes did not change is left alone, mtime included. The
+    # directory must already exist.
+    tmp_path = path + ReplaceSuffix
+    try:
+        with open(tmp_path, mode) as file:
+            yield file
+        if keep_identical and same_contents(tmp_path, path):
+            os.remove(tmp_path)
+            return
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def same_contents(path, other):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+        with open(path, "rb") as file, open(other, "rb") as other_file:
+            while True:
+                chunk = file.read(HashChunkSize)
+                if chunk != other_file.read(HashChunkSize):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+def normalize_path(path):
+    return os.path.normpath(path)
+
+
+class BuildManifest:
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = {}
+        self.static = {}
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        data = load_json(path, ManifestFormat)
+        if data is None or data.get("renderer") != RendererVersion:
+            return manifest
+        manifest.pages = data.get("pages", {})
+        manifest.static = data.get("static", {})
+        return manifest
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "renderer": RendererVersion,
+            "pages": self.pages,
+            "static": self.static,
+        }
+        save_json(self.path, ManifestFormat, data)
+
+    def is_page_fresh(self, source, source_hash, template_hash, output):
+        entry = self.pages.get(normalize_path(source))
+        return (
+            entry is not None
+            and entry["hash"] == source_hash
+            and entry["template_hash"] == template_hash
+            and entry["output"] == normalize_path(output)
+            and os.path.isfile(output)
+        )
+
+    def record_page(
+        self, source, source_hash, template_hash, output, template=None, stat=None
+    ):
+        # stat is the source's, taken before it was read for rendering.
+        entry = {
+            "hash": source_hash,
+            "template": normalize_path(template) if template else None,
+            "template_hash": template_hash,
+            "output": normalize_path(output),
+        }
+        if stat is not None:
+            entry["size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime_ns
+        self.pages[normalize_path(source)] = entry
+
+    def remove_page(self, source):
+        entry = self.pages.pop(normalize_path(source), None)
+        return [entry["output"]] if entry is not None else []
+
+    def remove_static(self, source):
+        entry = self.static.pop(normalize_path(source), None)
+        return [entry["output"]] if entry is not None else []
+
+    def static_entry(self, source, output):
+        entry = self.static.get(normalize_path(source))
+        if entry is None or entry["output"] != normalize_path(output):
+            return None
+        return entry
+
+    def record_static(self, source, source_hash, output, stat):
+        self.static[normalize_path(source)] = {
+            "hash": source_hash,
+            "output": normalize_path(output),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+        }
+
+    def prune_pages(self, seen, filtered=False):
+        return prune_entries(self.pages, seen, filtered)
+
+    def prune_static(self, seen):
+        return prune_entries(self.static, seen)
+
+
+def prune_entries(entries, seen, filtered=False):
+    # After a filtered scan, an entry that was not seen may only have been
+    # left out by the filter; it is pruned only if its source is gone.
+    seen = {normalize_path(path) for path in seen}
+    removed = [
+        source
+        for source in entries
+        if source not in seen and not (filtered and os.path.exists(source))
+    ]
+    outputs = []
+    for source in removed:
+        outputs.append(entries.pop(source)["output"])
+    return outputs
+
+
+def remove_outputs(outputs):
+    for output in outputs:
+        print(f"removing stale {output}")
+        try:
+            os.remove(output)
+        except FileNotFoundError:
+            pass
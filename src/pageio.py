@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IOWorkers = 4
+ReadAhead = 8
+MaxPendingWrites = 32
+
+
+class PageIO:
+    # Moves file I/O off the rendering thread: sources are read a few pages
+    # ahead, outputs are written behind, and each output directory is
+    # created once. At most max_pending writes are queued, so a slow disk
+    # holds back rendering instead of piling rendered pages up in memory.
+    def __init__(
+        self, read, write, workers=IOWorkers, max_pending=MaxPendingWrites
+    ):
+        self.read_file = read
+        self.write_file = write
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.directories = set()
+        self.reads = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def makedirs(self, directory):
+        if directory not in self.directories:
+            os.makedirs(directory, exist_ok=True)
+            self.directories.add(directory)
+
+    def read_sized(self, path, max_size):
+        if max_size is not None and os.path.getsize(path) >= max_size:
+            return None
+        return self.read_file(path)
+
+    def prefetch(self, path, max_size=None):
+        # Files of max_size or more are left for the caller to stream.
+        self.reads[path] = self.executor.submit(self.read_sized, path, max_size)
+
+    def read(self, path):
+        future = self.reads.pop(path, None)
+        text = future.result() if future is not None else None
+        return self.read_file(path) if text is None else text
+
+    def discard(self, path):
+        self.reads.pop(path, None)
+
+    def read_ahead(self, items, path_of, max_size=None, depth=ReadAhead):
+        # Yields items in order, having started the reads for the next
+        # depth items before handing each one over.
+        window = deque()
+        for item in items:
+            self.prefetch(path_of(item), max_size)
+            window.append(item)
+            if len(window) > depth:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+    def write(self, path, text):
+        self.makedirs(os.path.dirname(path))
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.write_file, path, text)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+def write_error(result):
+    # result is what a page write produced: None when it finished inline,
+    # the Future of a write-behind, or the exception rendering raised.
+    if result is None:
+        return None
+    error = result if isinstance(result, Exception) else result.exception()
+    if error is None:
+        return None
+    return f"{type(error).__name__}: {error}"
@@ -0,0 +1,136 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+MaxTraceEvents = 1_000_000
+SlowestPages = 10
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.blocks = 0
+
+
+class BuildProfiler:
+    # Times functions by temporarily replacing them with wrappers, so an
+    # unprofiled build pays nothing. Times are inclusive: a stage that calls
+    # another stage counts the callee's time too. Allocation figures are the
+    # net change in live memory blocks (sys.getallocatedblocks).
+    def __init__(self):
+        self.stages = {}
+        self.pages = []
+        self.events = []
+        self.patched = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, start, end, blocks, args=None):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.calls += 1
+            stats.seconds += end - start
+            stats.blocks += blocks
+            if len(self.events) < MaxTraceEvents:
+                event = {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+                if args:
+                    event["args"] = args
+                self.events.append(event)
+
+    def wrap(self, name, function, page=False):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            blocks = sys.getallocatedblocks()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                blocks = sys.getallocatedblocks() - blocks
+                if page:
+                    source = str(args[0])
+                    self.record(name, start, end, blocks, {"source": source})
+                    with self.lock:
+                        self.pages.append((source, end - start, blocks))
+                else:
+                    self.record(name, start, end, blocks)
+
+        return timed
+
+    def instrument(self, owner, names, page=False):
+        for name in names:
+            original = getattr(owner, name)
+            self.patched.append((owner, name, original))
+            setattr(owner, name, self.wrap(name, original, page))
+
+    def restore(self):
+        while self.patched:
+            owner, name, original = self.patched.pop()
+            setattr(owner, name, original)
+        self.finished = time.perf_counter()
+
+    def wall_seconds(self):
+        return (self.finished or time.perf_counter()) - self.origin
+
+    def report(self, slowest=SlowestPages):
+        wall = self.wall_seconds()
+        lines = [
+            f"build took {wall * 1e3:.1f} ms",
+            "",
+            f"{'stage':<22} {'calls':>8} {'total ms':>10} {'mean us':>9}"
+            f" {'% wall':>7} {'net blocks':>11}",
+        ]
+        ordered = sorted(self.stages.items(), key=lambda item: -item[1].seconds)
+        for name, stats in ordered:
+            lines.append(
+                f"{name:<22} {stats.calls:>8} {stats.seconds * 1e3:>10.1f}"
+                f" {stats.seconds / stats.calls * 1e6:>9.1f}"
+                f" {stats.seconds / wall * 100:>6.1f}% {stats.blocks:>11}"
+            )
+        if self.pages:
+            lines.extend(["", f"{'slowest pages':<50} {'ms':>8} {'net blocks':>11}"])
+            slow = sorted(self.pages, key=lambda page: -page[1])[:slowest]
+            for source, seconds, blocks in slow:
+                lines.append(f"{source:<50} {seconds * 1e3:>8.1f} {blocks:>11}")
+        return "\n".join(lines)
+
+    def to_json(self):
+        # Chrome's trace viewer and Perfetto read "traceEvents" and ignore
+        # the summary keys, so one file serves both diffing and tracing.
+        return {
+            "wallSeconds": self.wall_seconds(),
+            "stages": {
+                name: {
+                    "calls": stats.calls,
+                    "seconds": stats.seconds,
+                    "netBlocks": stats.blocks,
+                }
+                for name, stats in sorted(self.stages.items())
+            },
+            "pages": [
+                {"source": source, "seconds": seconds, "netBlocks": blocks}
+                for source, seconds, blocks in self.pages
+            ],
+            "traceEvents": self.events,
+        }
+
+    def dump(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file)
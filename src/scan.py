@@ -0,0 +1,49 @@
+import fnmatch
+import os
+
+RecursiveSuffix = "/**/*"
+
+
+def glob_root(pattern):
+    # copy_dir has always taken a "dir/**/*" pattern; the scanner wants the
+    # directory itself.
+    if pattern.endswith(RecursiveSuffix):
+        return pattern[: -len(RecursiveSuffix)]
+    return pattern
+
+
+def matches(relative_path, patterns):
+    return any(fnmatch.fnmatch(relative_path, pattern) for pattern in patterns)
+
+
+def scan_tree(root, include=None, exclude=None, suffixes=None, hidden=False):
+    # Yields a DirEntry for each regular file under root, depth first and in
+    # name order, while the walk is still going. Only the directories still
+    # to visit are held in memory. Patterns are fnmatch patterns matched
+    # against the path relative to root, with "/" separators. An excluded
+    # directory is not descended into. Dotfiles are skipped unless hidden
+    # is set, as glob skipped them.
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        subdirectories = []
+        for entry in entries:
+            if not hidden and entry.name.startswith("."):
+                continue
+            relative_path = prefix + entry.name
+            if exclude and matches(relative_path, exclude):
+                continue
+            if entry.is_dir():
+                subdirectories.append((entry.path, relative_path + "/"))
+            elif entry.is_file():
+                if suffixes and not entry.name.endswith(suffixes):
+                    continue
+                if include and not matches(relative_path, include):
+                    continue
+                yield entry
+        stack.extend(reversed(subdirectories))
@@ -0,0 +1,504 @@
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import urllib.parse
+import zlib
+from collections import Counter
+
+from manifest import load_json, normalize_path, replacing, save_json
+
+SearchIndexFormat = 2
+SearchDir = "search"
+SearchShards = 16
+SearchResults = 10
+TokenPattern = re.compile(r"\w+")
+MaxTermBytes = 255
+# Terms this short fit in MaxTermBytes whatever they encode to.
+ShortTermLength = MaxTermBytes // 4
+# Posting lists given more changes than this are merged, not patched.
+PatchLimit = 32
+# BM25 term-frequency saturation and document-length normalisation.
+BM25K1 = 1.2
+BM25B = 0.75
+ShardHeader = struct.Struct("<4sI")
+ShardMagic = b"SRS1"
+DocsHeader = struct.Struct("<4sIId")
+DocsMagic = b"SRD1"
+DocHeader = struct.Struct("<IHH")
+Offset = struct.Struct("<I")
+TermLength = struct.Struct("<B")
+Posting = struct.Struct("<II")
+
+
+def collect_text(node):
+    # The words of a rendered tree in document order, alt text included.
+    parts = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.value:
+            parts.append(node.value)
+        if node.props and node.props.get("alt"):
+            parts.append(node.props["alt"])
+        if node.children:
+            stack.extend(reversed(node.children))
+    return " ".join(parts)
+
+
+def tokenize(text):
+    return [
+        term
+        for term in TokenPattern.findall(text.lower())
+        if len(term) <= ShortTermLength or len(term.encode()) <= MaxTermBytes
+    ]
+
+
+def shard_of(term):
+    return zlib.crc32(term.encode()) % SearchShards
+
+
+def shard_name(shard):
+    return f"{shard:02x}.bin"
+
+
+def encode_record(encoded, pairs):
+    # The term, its document count and (document id, term frequency) pairs.
+    flat = [value for pair in pairs for value in pair]
+    return b"".join(
+        [
+            TermLength.pack(len(encoded)),
+            encoded,
+            Offset.pack(len(pairs)),
+            struct.pack(f"<{len(flat)}I", *flat),
+        ]
+    )
+
+
+def decode_record(record):
+    (length,) = TermLength.unpack_from(record, 0)
+    position = TermLength.size + length
+    return list(Posting.iter_unpack(record[position + Offset.size :]))
+
+
+def patch_postings(pairs, docs):
+    # Applies {document id: count} to pairs sorted by document id; a count
+    # of 0 removes the document.
+    if len(docs) > PatchLimit:
+        merged = dict(pairs)
+        merged.update(docs)
+        return sorted(pair for pair in merged.items() if pair[1])
+    for doc, count in sorted(docs.items()):
+        index = bisect.bisect_left(pairs, (doc,))
+        found = index < len(pairs) and pairs[index][0] == doc
+        if not count:
+            if found:
+                del pairs[index]
+        elif found:
+            pairs[index] = (doc, count)
+        else:
+            pairs.insert(index, (doc, count))
+    return pairs
+
+
+def pack_shard(records):
+    # A table of offsets to records sorted by term bytes, so a reader can
+    # binary search the mapped file. records maps encoded terms to records.
+    terms = sorted(records)
+    offsets = []
+    position = ShardHeader.size + Offset.size * len(terms)
+    for encoded in terms:
+        offsets.append(Offset.pack(position))
+        position += len(records[encoded])
+    return b"".join(
+        [ShardHeader.pack(ShardMagic, len(terms))]
+        + offsets
+        + [records[encoded] for encoded in terms]
+    )
+
+
+def encode_shard(postings):
+    records = {}
+    for term, pairs in postings.items():
+        encoded = term.encode()
+        records[encoded] = encode_record(encoded, pairs)
+    return pack_shard(records)
+
+
+def shard_records(data):
+    # The records of a shard by encoded term, copied out whole, or None
+    # for a file encode_shard did not write.
+    if len(data) < ShardHeader.size:
+        return None
+    magic, count = ShardHeader.unpack_from(data, 0)
+    if magic != ShardMagic:
+        return None
+    records = {}
+    position = ShardHeader.size + Offset.size * count
+    for _ in range(count):
+        (length,) = TermLength.unpack_from(data, position)
+        start = position + TermLength.size
+        encoded = data[start : start + length]
+        (df,) = Offset.unpack_from(data, start + length)
+        end = start + length + Offset.size + Posting.size * df
+        records[encoded] = data[position:end]
+        position = end
+    return records
+
+
+def encode_doc(length, url, title):
+    url = url.encode()[:0xFFFF]
+    title = title.encode()[:0xFFFF]
+    return DocHeader.pack(length, len(url), len(title)) + url + title
+
+
+def encode_docs(records, live, average_length):
+    # Slot i holds the record of document i; freed slots have offset 0.
+    offsets = []
+    position = DocsHeader.size + Offset.size * len(records)
+    for record in records:
+        if record is None:
+            offsets.append(Offset.pack(0))
+            continue
+        offsets.append(Offset.pack(position))
+        position += len(record)
+    header = DocsHeader.pack(DocsMagic, len(records), live, average_length)
+    return b"".join([header] + offsets + [record for record in records if record])
+
+
+def write_bytes(path, data):
+    # Readers map these files, so a changed file is replaced rather than
+    # rewritten in place; an identical one is left alone.
+    try:
+        with open(path, "rb") as file:
+            if file.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with replacing(path) as file:
+        file.write(data)
+    return True
+
+
+class SearchIndex:
+    # Term frequencies of every page, kept in .build so the index in
+    # public/search/ is updated per changed page: each shard holding a term
+    # whose frequency changed is read back, only those terms' records are
+    # decoded and patched, and every other record is copied as it was.
+    # updates maps a term to {document id: new count}, 0 meaning the
+    # document no longer has it.
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = {}
+        self.shards = set()
+        self.next_id = 0
+        self.free_ids = []
+        self.updates = {}
+        self.docs_changed = False
+        # Encoded docs records by id, so a long-lived index encodes only the
+        # pages that changed.
+        self.doc_records = {}
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        data = load_json(path, SearchIndexFormat)
+        if data is None:
+            return index
+        index.pages = data.get("pages", {})
+        index.shards = set(data.get("shards", []))
+        index.next_id = data.get("next_id", 0)
+        index.free_ids = data.get("free_ids", [])
+        heapq.heapify(index.free_ids)
+        # Updates not yet written when the index was saved.
+        index.updates = {
+            term: {int(doc): count for doc, count in docs.items()}
+            for term, docs in data.get("updates", {}).items()
+        }
+        return index
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "pages": self.pages,
+            "shards": sorted(self.shards),
+            "next_id": self.next_id,
+            "free_ids": sorted(self.free_ids),
+            "updates": self.updates,
+        }
+        # Unindented: this index holds every term of every page.
+        save_json(self.path, SearchIndexFormat, data, indent=None)
+
+    def has_page(self, source):
+        return normalize_path(source) in self.pages
+
+    def record_page(self, source, url, title, text):
+        tokens = tokenize(text)
+        self.record_terms(source, url, title, Counter(tokens), len(tokens))
+
+    def record_terms(self, source, url, title, counts, length):
+        # For pages whose text is counted as it streams past instead of
+        # being held whole; counts maps each token to its occurrences.
+        source = normalize_path(source)
+        terms = dict(counts)
+        old = self.pages.get(source)
+        if old is None:
+            doc = self.free_id()
+            old_terms = {}
+        else:
+            doc = old["id"]
+            old_terms = old["terms"]
+        entry = {
+            "id": doc,
+            "url": url,
+            "title": title,
+            "length": length,
+            "terms": terms,
+        }
+        if old == entry:
+            return
+        for term in old_terms.keys() - terms.keys():
+            self.updates.setdefault(term, {})[doc] = 0
+        for term, count in terms.items():
+            if old_terms.get(term) != count:
+                self.updates.setdefault(term, {})[doc] = count
+        self.pages[source] = entry
+        self.doc_records.pop(doc, None)
+        self.docs_changed = True
+
+    def free_id(self):
+        # The lowest freed id, so the docs table stays dense.
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        self.next_id += 1
+        return self.next_id - 1
+
+    def remove_page(self, source):
+        entry = self.pages.pop(normalize_path(source), None)
+        if entry is not None:
+            for term in entry["terms"]:
+                self.updates.setdefault(term, {})[entry["id"]] = 0
+            heapq.heappush(self.free_ids, entry["id"])
+            self.doc_records.pop(entry["id"], None)
+            self.docs_changed = True
+
+    def prune_pages(self, sources):
+        keep = {normalize_path(source) for source in sources}
+        for source in [source for source in self.pages if source not in keep]:
+            self.remove_page(source)
+
+    def write(self, public_dir):
+        # Returns the files written or removed under public_dir/search.
+        directory = os.path.join(public_dir, SearchDir)
+        changed = []
+        docs_path = normalize_path(os.path.join(directory, "docs.bin"))
+        if self.docs_changed or not os.path.isfile(docs_path):
+            if write_bytes(docs_path, self.encode_docs()):
+                changed.append(docs_path)
+        updates = {}
+        for term, docs in self.updates.items():
+            updates.setdefault(shard_of(term), {})[term] = docs
+        shards = {}
+        for shard in self.shards:
+            path = os.path.join(directory, shard_name(shard))
+            if shard in updates or not os.path.isfile(path):
+                shards[shard] = self.read_shard(path)
+        for shard in updates:
+            shards.setdefault(shard, {})
+        missing = [shard for shard, found in shards.items() if found is None]
+        if missing:
+            shards.update(self.collect_records(missing))
+        for shard in sorted(shards):
+            records = shards[shard]
+            for term, docs in updates.get(shard, {}).items():
+                encoded = term.encode()
+                record = records.get(encoded)
+                pairs = decode_record(record) if record is not None else []
+                pairs = patch_postings(pairs, docs)
+                if pairs:
+                    records[encoded] = encode_record(encoded, pairs)
+                else:
+                    records.pop(encoded, None)
+            path = normalize_path(os.path.join(directory, shard_name(shard)))
+            if records:
+                if write_bytes(path, pack_shard(records)):
+                    changed.append(path)
+                self.shards.add(shard)
+            elif shard in self.shards:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                changed.append(path)
+                self.shards.discard(shard)
+        self.updates = {}
+        self.docs_changed = False
+        return changed
+
+    def read_shard(self, path):
+        try:
+            with open(path, "rb") as file:
+                return shard_records(file.read())
+        except (OSError, struct.error):
+            return None
+
+    def collect_records(self, shards):
+        # Rebuilds shards whose file is missing or unreadable from the term
+        # frequencies of every page. Those already include self.updates, and
+        # applying the updates again leaves them unchanged.
+        postings = {shard: {} for shard in shards}
+        for entry in self.pages.values():
+            for term, count in entry["terms"].items():
+                shard = shard_of(term)
+                if shard in postings:
+                    postings[shard].setdefault(term, []).append((entry["id"], count))
+        records = {}
+        for shard, shard_postings in postings.items():
+            records[shard] = {
+                term.encode(): encode_record(term.encode(), sorted(pairs))
+                for term, pairs in shard_postings.items()
+            }
+        return records
+
+    def encode_docs(self):
+        count = 1 + max((entry["id"] for entry in self.pages.values()), default=-1)
+        records = [None] * count
+        total = 0
+        for entry in self.pages.values():
+            doc = entry["id"]
+            record = self.doc_records.get(doc)
+            if record is None:
+                record = encode_doc(entry["length"], entry["url"], entry["title"])
+                self.doc_records[doc] = record
+            records[doc] = record
+            total += entry["length"]
+        live = len(self.pages)
+        return encode_docs(records, live, total / live if live else 0.0)
+
+
+class MappedFile:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SearchReader:
+    # Answers queries straight from the memory-mapped files in
+    # public/search/. Files are replaced, never rewritten, by the build, so
+    # a mapping stays valid until a stat shows a newer file to map.
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def mapped(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            mapped = self.files.get(name)
+            if mapped is not None and mapped.key == key:
+                return mapped.data
+        try:
+            mapped = MappedFile(path)
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            self.files[name] = mapped
+        return mapped.data
+
+    def postings(self, term):
+        data = self.mapped(shard_name(shard_of(term)))
+        if data is None:
+            return []
+        magic, count = ShardHeader.unpack_from(data, 0)
+        if magic != ShardMagic:
+            return []
+        encoded = term.encode()
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = Offset.unpack_from(
+                data, ShardHeader.size + Offset.size * middle
+            )[0]
+            (length,) = TermLength.unpack_from(data, position)
+            start = position + TermLength.size
+            found = bytes(data[start : start + length])
+            if found == encoded:
+                position = start + length
+                (df,) = Offset.unpack_from(data, position)
+                position += Offset.size
+                return [
+                    Posting.unpack_from(data, position + Posting.size * index)
+                    for index in range(df)
+                ]
+            if found < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return []
+
+    def search(self, query, limit=SearchResults):
+        docs = self.mapped("docs.bin")
+        if docs is None:
+            return []
+        magic, slots, live, average_length = DocsHeader.unpack_from(docs, 0)
+        if magic != DocsMagic or not live:
+            return []
+        scores = {}
+        found = {}
+        for term in set(tokenize(query)):
+            postings = self.postings(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (live - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, count in postings:
+                if doc >= slots:
+                    continue
+                if doc not in found:
+                    found[doc] = self.doc(docs, doc)
+                if found[doc] is None:
+                    continue
+                norm = 1 - BM25B + BM25B * found[doc][0] / (average_length or 1)
+                score = idf * count * (BM25K1 + 1) / (count + BM25K1 * norm)
+                scores[doc] = scores.get(doc, 0.0) + score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {"url": found[doc][1], "title": found[doc][2], "score": round(score, 4)}
+            for doc, score in ranked[:limit]
+        ]
+
+    def doc(self, docs, doc):
+        position = Offset.unpack_from(docs, DocsHeader.size + Offset.size * doc)[0]
+        if position == 0:
+            return None
+        length, url_length, title_length = DocHeader.unpack_from(docs, position)
+        start = position + DocHeader.size
+        url = bytes(docs[start : start + url_length]).decode(errors="ignore")
+        start += url_length
+        title = bytes(docs[start : start + title_length]).decode(errors="ignore")
+        return length, url, title
+
+
+def search_response(reader, path):
+    # The JSON body answering "/search?q=...".
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+    text = " ".join(query.get("q", []))
+    try:
+        limit = min(int(query.get("limit", [SearchResults])[0]), 100)
+    except ValueError:
+        limit = SearchResults
+    results = reader.search(text, max(limit, 0)) if text else []
+    return json.dumps({"query": text, "results": results}).encode()
@@ -0,0 +1,309 @@
+import functools
+import mimetypes
+import os
+import stat as stat_module
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from archive import Archive, ArchiveSearchReader
+from assets import ImmutableCacheControl, is_fingerprinted
+from compress import accepted_encodings, is_compressible
+from search import SearchDir, SearchReader, search_response
+
+CacheMaxBytes = 64 * 1024 * 1024
+CacheMaxFileSize = 256 * 1024
+RevalidateInterval = 1.0
+ListenBacklog = 1024
+MissingCacheSize = 4096
+ContentEncodings = (("br", ".br"), ("gzip", ".gz"))
+SearchPath = "/search"
+
+
+class CachedFile:
+    def __init__(self, path, stat, checked):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.body = None
+        self.checked = checked
+
+
+class FileCache:
+    # Metadata for every file served, plus the bytes of small files, in LRU
+    # order. An entry is trusted for RevalidateInterval seconds before the
+    # file is stat'ed again, so hot files cost no syscalls per request.
+    # Missing paths and directories are remembered for as long, so a
+    # directory URL resolves to its index.html without a syscall either.
+    def __init__(self, max_bytes=CacheMaxBytes, max_file_size=CacheMaxFileSize):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.entries = OrderedDict()
+        self.missing = {}
+        self.directories = {}
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+                if now - entry.checked < RevalidateInterval:
+                    return entry
+            elif now - self.missing.get(path, -RevalidateInterval) < RevalidateInterval:
+                return None
+            elif (
+                now - self.directories.get(path, -RevalidateInterval)
+                < RevalidateInterval
+            ):
+                return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.discard(path)
+            self.remember(self.missing, path, now)
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            if stat_module.S_ISDIR(stat.st_mode):
+                self.discard(path)
+                self.remember(self.directories, path, now)
+            return None
+        if entry is not None and (entry.mtime, entry.size) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            entry.checked = now
+            return entry
+        entry = CachedFile(path, stat, now)
+        if stat.st_size <= self.max_file_size:
+            with open(path, "rb") as file:
+                entry.body = file.read()
+            entry.size = len(entry.body)
+        self.insert(path, entry)
+        return entry
+
+    def remember(self, paths, path, now):
+        with self.lock:
+            if len(paths) >= MissingCacheSize:
+                paths.clear()
+            paths[path] = now
+            if paths is self.directories:
+                self.missing.pop(path, None)
+            else:
+                self.directories.pop(path, None)
+
+    def is_directory(self, path):
+        # Answered from what get() saw of path while that is fresh.
+        now = time.monotonic()
+        with self.lock:
+            checked = self.directories.get(path)
+            if checked is not None and now - checked < RevalidateInterval:
+                return True
+            if now - self.missing.get(path, -RevalidateInterval) < RevalidateInterval:
+                return False
+        if os.path.isdir(path):
+            self.remember(self.directories, path, now)
+            return True
+        return False
+
+    def insert(self, path, entry):
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None and old.body is not None:
+                self.size -= len(old.body)
+            self.entries[path] = entry
+            if entry.body is not None:
+                self.size += len(entry.body)
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                if evicted.body is not None:
+                    self.size -= len(evicted.body)
+
+    def discard(self, path):
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None and old.body is not None:
+                self.size -= len(old.body)
+
+
+class ProductionHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 keep-alive, conditional requests answered from the cache,
+    # small files from memory and large ones with sendfile. Fingerprinted
+    # assets are marked immutable.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response stalls on delayed ACKs.
+    disable_nagle_algorithm = True
+    file_cache = None
+    search = None
+
+    def do_GET(self):
+        self.serve(head=False)
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def log_request(self, code="-", size="-"):
+        pass
+
+    def resolve(self):
+        url_path = urllib.parse.urlsplit(self.path).path
+        path = self.translate_path(self.path)
+        entry = self.file_cache.get(path)
+        if entry is not None:
+            return entry
+        if self.file_cache.is_directory(path):
+            if not url_path.endswith("/"):
+                self.send_response(301)
+                self.send_header("Location", url_path + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return False
+            return self.file_cache.get(os.path.join(path, "index.html"))
+        return None
+
+    def is_not_modified(self, entry):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return entry.mtime // 1_000_000_000 <= since
+        return False
+
+    def serve(self, head):
+        if self.search is not None:
+            if urllib.parse.urlsplit(self.path).path == SearchPath:
+                self.serve_search(head)
+                return
+        entry = self.resolve()
+        if entry is False:
+            return
+        if entry is None:
+            self.send_error(404, "File not found")
+            return
+        content_type = entry.content_type
+        compressible = is_compressible(entry.path)
+        encoding = None
+        if compressible:
+            encoding, entry = self.negotiate(entry)
+        if self.is_not_modified(entry):
+            self.send_response(304)
+            self.send_validators(entry)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(entry.size))
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        if compressible:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_validators(entry)
+        self.end_headers()
+        if head:
+            return
+        if entry.body is not None:
+            self.wfile.write(entry.body)
+        else:
+            with open(entry.path, "rb") as file:
+                self.connection.sendfile(file, 0, entry.size)
+
+    def serve_search(self, head):
+        body = search_response(self.search, self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def negotiate(self, entry):
+        # Picks a precompressed sibling written by the build, but only one
+        # stamped with the same mtime as the file it was compressed from.
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        for encoding, suffix in ContentEncodings:
+            if encoding in accepted:
+                variant = self.file_cache.get(entry.path + suffix)
+                if variant is not None and variant.mtime == entry.mtime:
+                    return encoding, variant
+        return None, entry
+
+    def send_validators(self, entry):
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        # A fingerprinted name changes with the content, so browsers and
+        # CDNs may keep it forever without revalidating.
+        if is_fingerprinted(entry.path):
+            self.send_header("Cache-Control", ImmutableCacheControl)
+
+
+class ArchiveHandler(ProductionHandler):
+    # Serves a packed site: every lookup is a dict hit in the archive index
+    # and bodies are written from the mapping without being copied.
+    archive = None
+
+    def resolve(self):
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        reader = self.archive.current()
+        if url_path.endswith("/"):
+            return reader.get(url_path + "index.html")
+        entry = reader.get(url_path)
+        if entry is None and reader.has(url_path + "/index.html"):
+            self.send_response(301)
+            self.send_header("Location", url_path + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+        return entry
+
+    def negotiate(self, entry):
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        for encoding, _ in ContentEncodings:
+            if encoding in accepted and encoding in entry.variants:
+                return encoding, entry.variants[encoding]
+        return None, entry
+
+
+class ProductionServer(ThreadingHTTPServer):
+    request_queue_size = ListenBacklog
+
+
+def create_production_server(port, directory, file_cache=None):
+    handler_class = type(
+        "CachingHandler",
+        (ProductionHandler,),
+        {
+            "file_cache": file_cache or FileCache(),
+            "search": SearchReader(os.path.join(directory, SearchDir)),
+        },
+    )
+    return ProductionServer(
+        ("", port), functools.partial(handler_class, directory=directory)
+    )
+
+
+def create_archive_server(port, path):
+    archive = Archive(path)
+    handler_class = type(
+        "PackedHandler",
+        (ArchiveHandler,),
+        {"archive": archive, "search": ArchiveSearchReader(archive)},
+    )
+    return ProductionServer(("", port), handler_class)
@@ -0,0 +1,188 @@
+import os
+import re
+
+from htmlnode import escape_attribute, escape_text
+from manifest import hash_bytes, load_json, normalize_path, remove_outputs, save_json
+
+SiteIndexFormat = 1
+ListingPageSize = 20
+SlugPattern = re.compile(r"[^a-z0-9]+")
+
+
+def slugify(text):
+    return SlugPattern.sub("-", text.lower()).strip("-") or "untitled"
+
+
+def listing_pages(url, entries, page_size):
+    # Splits entries into pages, the first at url and the rest at
+    # url/page/N/. Newest first, undated pages last, ties by title.
+    entries = sorted(entries, key=lambda entry: entry["title"].lower())
+    entries.sort(key=lambda entry: entry.get("date") or "", reverse=True)
+    count = max(1, -(-len(entries) // page_size))
+    urls = [url] + [f"{url}page/{number}/" for number in range(2, count + 1)]
+    for number, page_url in enumerate(urls):
+        chunk = entries[number * page_size : (number + 1) * page_size]
+        previous_url = urls[number - 1] if number > 0 else None
+        next_url = urls[number + 1] if number + 1 < count else None
+        yield page_url, chunk, previous_url, next_url
+
+
+def render_listing(entries, previous_url=None, next_url=None):
+    parts = ['<div><ul class="listing">']
+    for entry in entries:
+        parts.append(
+            f'<li><a href="{escape_attribute(entry["url"])}">'
+            f'{escape_text(entry["title"])}</a>'
+        )
+        if entry.get("date"):
+            date = escape_attribute(entry["date"])
+            parts.append(f' <time datetime="{date}">{date}</time>')
+        parts.append("</li>")
+    parts.append("</ul>")
+    if previous_url or next_url:
+        parts.append('<nav class="pagination">')
+        if previous_url:
+            parts.append(f'<a rel="prev" href="{previous_url}">Newer</a>')
+        if next_url:
+            parts.append(f'<a rel="next" href="{next_url}">Older</a>')
+        parts.append("</nav>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def render_tag_cloud(tags):
+    parts = ['<div><ul class="tags">']
+    for tag, (slug, count) in sorted(tags.items(), key=lambda item: item[0].lower()):
+        parts.append(
+            f'<li><a href="/tags/{slug}/">{escape_text(tag)}</a>'
+            f" ({count})</li>"
+        )
+    parts.append("</ul></div>")
+    return "".join(parts)
+
+
+class SiteIndex:
+    # Title, date, tags, section, URL and output of every page, kept in
+    # .build so that section indexes, tag pages and paginated listings can
+    # be generated without reading or rendering the pages again.
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = {}
+        self.listings = {}
+        self.listing_key = None
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        data = load_json(path, SiteIndexFormat)
+        if data is None:
+            return index
+        index.pages = data.get("pages", {})
+        index.listings = data.get("listings", {})
+        index.listing_key = data.get("listing_key")
+        return index
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "pages": self.pages,
+            "listings": self.listings,
+            "listing_key": self.listing_key,
+        }
+        save_json(self.path, SiteIndexFormat, data)
+
+    def has_page(self, source):
+        return normalize_path(source) in self.pages
+
+    def record_page(self, source, title, metadata, section, url, output):
+        entry = {
+            "title": title,
+            "date": str(metadata.get("date", "")),
+            "tags": list(metadata.get("tags", [])),
+            "section": section,
+            "url": url,
+            "output": normalize_path(output),
+        }
+        source = normalize_path(source)
+        if self.pages.get(source) != entry:
+            self.pages[source] = entry
+            self.changed = True
+
+    def remove_page(self, source):
+        if self.pages.pop(normalize_path(source), None) is not None:
+            self.changed = True
+
+    def prune_pages(self, sources):
+        keep = {normalize_path(source) for source in sources}
+        for source in [source for source in self.pages if source not in keep]:
+            self.remove_page(source)
+
+    def listings_for(self, page_size):
+        # (url, title, content) for every generated listing page.
+        # Tags that slugify alike are one tag, named as first spelled.
+        sections = {}
+        tags = {}
+        names = {}
+        for _, entry in sorted(self.pages.items()):
+            if entry["section"]:
+                sections.setdefault(entry["section"], []).append(entry)
+            for tag in entry["tags"]:
+                slug = slugify(tag)
+                names.setdefault(slug, tag)
+                tags.setdefault(slug, []).append(entry)
+        for section, entries in sorted(sections.items()):
+            title = section.replace("-", " ").replace("_", " ").title()
+            base = f"/sections/{slugify(section)}/"
+            for url, chunk, previous_url, next_url in listing_pages(
+                base, entries, page_size
+            ):
+                yield url, title, render_listing(chunk, previous_url, next_url)
+        if tags:
+            counts = {names[slug]: (slug, len(found)) for slug, found in tags.items()}
+            yield "/tags/", "Tags", render_tag_cloud(counts)
+        for slug, entries in sorted(tags.items()):
+            tag = names[slug]
+            base = f"/tags/{slug}/"
+            for url, chunk, previous_url, next_url in listing_pages(
+                base, entries, page_size
+            ):
+                content = render_listing(chunk, previous_url, next_url)
+                yield url, f"Tagged {tag}", content
+
+    def write_listings(
+        self, public_dir, render, render_key, write, page_size=ListingPageSize
+    ):
+        # Writes listing pages whose HTML changed and removes listings that
+        # are no longer produced. Does nothing when no entry changed and
+        # render_key (the template) and page size are as they were at the
+        # last run.
+        key = [render_key, page_size]
+        if not self.changed and key == self.listing_key:
+            if all(os.path.isfile(output) for output in self.listings):
+                return []
+        written = []
+        listings = {}
+        for url, title, content in self.listings_for(page_size):
+            relative_path = os.path.join(url.lstrip("/"), "index.html")
+            output = normalize_path(os.path.join(public_dir, relative_path))
+            values = {
+                "Title": escape_text(title),
+                "Content": content,
+                "Path": url,
+                "Section": "",
+            }
+            page = render(values)
+            digest = hash_bytes(page.encode())
+            listings[output] = digest
+            if self.listings.get(output) != digest or not os.path.isfile(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+                write(output, page)
+                written.append(output)
+        stale = [output for output in self.listings if output not in listings]
+        remove_outputs(stale)
+        self.listings = listings
+        self.listing_key = key
+        self.changed = False
+        return written + stale
@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from manifest import ReplaceSuffix, hash_file, replacing
+
+
+def is_unchanged(entry, stat, output):
+    # The quick check rsync uses: same size and mtime as when the file was
+    # last synced, and the output is still there with the same size.
+    if entry is None or entry.get("size") != stat.st_size:
+        return False
+    if entry.get("mtime") != stat.st_mtime_ns:
+        return False
+    try:
+        return os.stat(output).st_size == stat.st_size
+    except FileNotFoundError:
+        return False
+
+
+def sync_file(source, destination, entry, stat, link=False, checksum=False):
+    # Returns the source hash and whether the destination was rewritten.
+    if not checksum and is_unchanged(entry, stat, destination):
+        return entry["hash"], False
+    source_hash = hash_file(source)
+    if (
+        entry is not None
+        and entry["hash"] == source_hash
+        and os.path.isfile(destination)
+        and os.path.getsize(destination) == stat.st_size
+    ):
+        return source_hash, False
+    copy_file(source, destination, link)
+    return source_hash, True
+
+
+def copy_file(source, destination, link=False):
+    # Copies through a temporary sibling and renames it into place, so a
+    # server reading public/ during a build never sees a partial file.
+    directory = os.path.dirname(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if link:
+        tmp_path = destination + ReplaceSuffix
+        try:
+            os.link(source, tmp_path)
+            os.replace(tmp_path, destination)
+            return
+        except OSError:
+            # Different filesystem or no hardlink support: fall back to a copy.
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+    with open(source, "rb") as src, replacing(destination) as dst:
+        copy_contents(src, dst)
+        dst.flush()
+        shutil.copystat(source, dst.name)
+
+
+def copy_contents(src, dst):
+    # copy_file_range lets the kernel copy (or reflink, on filesystems that
+    # support it) without moving the data through user space.
+    if hasattr(os, "copy_file_range"):
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+    shutil.copyfileobj(src, dst)
@@ -0,0 +1,82 @@
+import os
+import re
+
+SlotPattern = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    # A template is compiled once into alternating literal and slot
+    # segments: literals[i] is followed by slots[i], and there is always one
+    # more literal than there are slots.
+    def __init__(self, source):
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in SlotPattern.finditer(source):
+            self.literals.append(source[position : match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.literals.append(source[position:])
+
+    def render(self, values):
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values.get(slot, ""))
+            parts.append(literal)
+        return "".join(parts)
+
+    def map_literals(self, function):
+        # A copy with function applied to every literal, leaving the slots
+        # and so the values rendered into them alone.
+        mapped = Template.__new__(Template)
+        mapped.literals = [function(literal) for literal in self.literals]
+        mapped.slots = self.slots
+        return mapped
+
+    def render_around(self, values, slot):
+        # Renders everything before and after the first occurrence of slot,
+        # so the caller can stream that slot's content in between.
+        if slot not in self.slots:
+            return self.render(values), ""
+        index = self.slots.index(slot)
+        head = Template.__new__(Template)
+        head.literals = self.literals[: index + 1]
+        head.slots = self.slots[:index]
+        tail = Template.__new__(Template)
+        tail.literals = self.literals[index + 1 :]
+        tail.slots = self.slots[index + 1 :]
+        return head.render(values), tail.render(values)
+
+
+# Compiled templates keyed by path, each stored with the mtime and size it
+# was compiled from so that an edited template is picked up on next use.
+template_cache = {}
+
+
+def load_template(path):
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = template_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(path, "r") as file:
+        template = Template(file.read())
+    template_cache[path] = (key, template)
+    return template
+
+
+def section_template_path(template_path, relative_path):
+    # Pages under content/<section>/ use templates/<section>.html, next to
+    # the default template, when that file exists.
+    section = section_of(relative_path)
+    if section:
+        directory = os.path.dirname(template_path)
+        candidate = os.path.join(directory, "templates", section + ".html")
+        if os.path.isfile(candidate):
+            return candidate
+    return template_path
+
+
+def section_of(relative_path):
+    parts = os.path.normpath(relative_path).split(os.sep)
+    return parts[0] if len(parts) > 1 else ""
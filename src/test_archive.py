@@ -0,0 +1,170 @@
+import gzip
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import archive
+from archive import Archive, ArchiveReader, archive_files, pack_site
+from compress import precompress_tree
+from search import SearchIndex
+from serving import create_archive_server
+
+
+class TestPackSite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.path = os.path.join(self.tmp.name, "site.pack")
+        os.makedirs(os.path.join(self.public, "post"))
+        self.write("index.html", b"<p>home</p>")
+        self.write("post/index.html", b"<p>post</p>")
+        self.write("a.css", b"body {}")
+        self.write("b.css", b"body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.public, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_lookup(self):
+        pack_site(self.public, self.path)
+        reader = ArchiveReader(self.path)
+        entry = reader.get("/post/index.html")
+        self.assertEqual(b"<p>post</p>", bytes(entry.body))
+        self.assertEqual("text/html", entry.content_type)
+        self.assertEqual(11, entry.size)
+        self.assertIsNone(reader.get("/missing.html"))
+
+    def test_identical_bodies_are_stored_once(self):
+        files, bodies = pack_site(self.public, self.path)
+        self.assertEqual((4, 3), (files, bodies))
+        reader = ArchiveReader(self.path)
+        self.assertEqual(reader.get("/a.css").etag, reader.get("/b.css").etag)
+
+    def test_packing_is_deterministic(self):
+        pack_site(self.public, self.path)
+        with open(self.path, "rb") as file:
+            first = file.read()
+        pack_site(self.public, self.path)
+        with open(self.path, "rb") as file:
+            self.assertEqual(first, file.read())
+
+    def test_current_variants_are_stored_with_their_file(self):
+        page = b"<p>compressible</p>" * 100
+        self.write("large.html", page)
+        precompress_tree(self.public)
+        stale = self.write("stale.html", page + b"!")
+        precompress_tree(self.public)
+        os.utime(stale, (1, 1))
+        pack_site(self.public, self.path)
+        reader = ArchiveReader(self.path)
+        urls = [url for url, _ in archive_files(self.public)]
+        self.assertNotIn("/large.html.gz", urls)
+        variant = reader.get("/large.html").variants["gzip"]
+        self.assertEqual(page, gzip.decompress(variant.body))
+        self.assertEqual({}, reader.get("/stale.html").variants)
+
+    def test_replaced_archive_is_mapped_again(self):
+        pack_site(self.public, self.path)
+        served = Archive(self.path)
+        old = served.current().get("/a.css")
+        self.write("a.css", b"body { margin: 0 }")
+        pack_site(self.public, self.path)
+        interval = archive.RevalidateInterval
+        archive.RevalidateInterval = 0
+        try:
+            entry = served.current().get("/a.css")
+        finally:
+            archive.RevalidateInterval = interval
+        self.assertEqual(b"body { margin: 0 }", bytes(entry.body))
+        self.assertEqual(b"body {}", bytes(old.body))
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            ArchiveReader(self.path)
+
+
+class TestArchiveServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(public, "post"))
+        with open(os.path.join(public, "index.css"), "wb") as file:
+            file.write(b"body {}")
+        with open(os.path.join(public, "post", "index.html"), "wb") as file:
+            file.write(b"<p>post</p>")
+        self.page = b"<p>compressible</p>" * 500
+        with open(os.path.join(public, "large.html"), "wb") as file:
+            file.write(self.page)
+        precompress_tree(public)
+        index = SearchIndex()
+        index.record_page("post.md", "/post/", "Post", "hello search")
+        index.write(public)
+        path = os.path.join(self.tmp.name, "site.pack")
+        pack_site(public, path)
+        self.server = create_archive_server(0, path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection(
+            "localhost", self.server.server_address[1]
+        )
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def get(self, path, method="GET", headers=None):
+        self.connection.request(method, path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_conditional_get(self):
+        response, body = self.get("/index.css")
+        self.assertEqual(200, response.status)
+        self.assertEqual(b"body {}", body)
+        self.assertEqual("text/css", response.getheader("Content-Type"))
+        etag = response.getheader("ETag")
+        response, body = self.get("/index.css", headers={"If-None-Match": etag})
+        self.assertEqual(304, response.status)
+        self.assertEqual(b"", body)
+
+    def test_directory_index_and_redirect(self):
+        response, _ = self.get("/post")
+        self.assertEqual(301, response.status)
+        self.assertEqual("/post/", response.getheader("Location"))
+        response, body = self.get("/post/")
+        self.assertEqual(b"<p>post</p>", body)
+
+    def test_precompressed_variant_is_negotiated(self):
+        response, body = self.get("/large.html", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual("gzip", response.getheader("Content-Encoding"))
+        self.assertEqual("Accept-Encoding", response.getheader("Vary"))
+        self.assertEqual(self.page, gzip.decompress(body))
+        response, body = self.get("/large.html")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(self.page, body)
+
+    def test_search_endpoint(self):
+        response, body = self.get("/search?q=hello")
+        results = json.loads(body)["results"]
+        self.assertEqual(["/post/"], [result["url"] for result in results])
+
+    def test_missing_file(self):
+        response, _ = self.get("/missing.css")
+        self.assertEqual(404, response.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
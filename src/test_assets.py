@@ -0,0 +1,179 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from assets import (
+    AssetMap,
+    configure_assets,
+    fingerprinted_name,
+    has_relative_references,
+    is_fingerprinted,
+)
+from main import copy_dir, fingerprint_static, generate_pages
+from manifest import BuildManifest, hash_bytes
+
+
+class TestAssetMap(unittest.TestCase):
+    def setUp(self):
+        self.assets = AssetMap(
+            {
+                "/index.css": "/index.0123456789.css",
+                "/images/a b.png": "/images/a b.abcdefabcd.png",
+            }
+        )
+
+    def test_fingerprinted_name(self):
+        name = fingerprinted_name("index.css", "3f9a1c2b4d5e")
+        self.assertEqual("index.3f9a1c2b4d.css", name)
+        self.assertTrue(is_fingerprinted("/index.3f9a1c2b4d.css"))
+        self.assertTrue(is_fingerprinted("/index.3f9a1c2b4d.css.gz"))
+        self.assertFalse(is_fingerprinted("/index.css"))
+        self.assertFalse(is_fingerprinted("/release.2024.css"))
+
+    def test_rewrite_html(self):
+        text = (
+            '<link href="/index.css?v=1" rel="stylesheet">'
+            '<img src="../images/a%20b.png" alt="/index.css">'
+            '<a href="/index.css#top">css</a><a href="https://x.org/index.css">x</a>'
+        )
+        expected = (
+            '<link href="/index.0123456789.css?v=1" rel="stylesheet">'
+            '<img src="/images/a b.abcdefabcd.png" alt="/index.css">'
+            '<a href="/index.0123456789.css#top">css</a>'
+            '<a href="https://x.org/index.css">x</a>'
+        )
+        self.assertEqual(expected, self.assets.rewrite_html(text, "/blog/"))
+
+    def test_rewrite_props(self):
+        props = {"href": "/index.css?v=1", "rel": "stylesheet"}
+        self.assertEqual(
+            {"href": "/index.0123456789.css?v=1", "rel": "stylesheet"},
+            self.assets.rewrite_props(props, "/blog/"),
+        )
+        self.assertEqual({"href": "/index.css?v=1", "rel": "stylesheet"}, props)
+        alt = {"src": "/missing.png", "alt": "/index.css"}
+        self.assertIs(alt, self.assets.rewrite_props(alt))
+
+    def test_relative_references(self):
+        self.assertTrue(has_relative_references('<link href="index.css">'))
+        self.assertFalse(
+            has_relative_references(
+                '<link href="/index.css"><a href="#top"></a><a href="https://x.org">'
+            )
+        )
+
+    def test_empty_map_leaves_html_alone(self):
+        text = '<link href="/index.css">'
+        self.assertIs(text, AssetMap().rewrite_html(text))
+
+
+class TestFingerprintStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("index.css", b"body {}")
+        self.write("images/a.png", b"png")
+        self.write("robots.txt", b"")
+        self.manifest = BuildManifest()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, data):
+        with open(os.path.join(self.static, relative_path), "wb") as file:
+            file.write(data)
+
+    def sync(self):
+        urls, names = fingerprint_static(self.static + "/**/*", self.manifest)
+        with redirect_stdout(StringIO()) as out:
+            copy_dir(
+                self.static + "/**/*",
+                self.public,
+                self.static,
+                self.public,
+                self.manifest,
+                names=names,
+            )
+        return urls, out.getvalue()
+
+    def test_assets_are_copied_under_hashed_names(self):
+        urls, _ = self.sync()
+        css = f"/index.{hash_bytes(b'body {}')[:10]}.css"
+        self.assertEqual({"/index.css", "/images/a.png"}, set(urls))
+        self.assertEqual(css, urls["/index.css"])
+        self.assertTrue(os.path.isfile(self.public + css))
+        self.assertTrue(os.path.isfile(os.path.join(self.public, "robots.txt")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+
+    def test_changed_asset_replaces_its_old_copy(self):
+        old, _ = self.sync()
+        self.write("index.css", b"body { margin: 0 }")
+        new, out = self.sync()
+        self.assertNotEqual(old["/index.css"], new["/index.css"])
+        self.assertEqual(old["/images/a.png"], new["/images/a.png"])
+        self.assertFalse(os.path.exists(self.public + old["/index.css"]))
+        self.assertTrue(os.path.isfile(self.public + new["/index.css"]))
+        self.assertEqual(1, out.count("removing stale"))
+
+    def test_pages_are_rewritten_and_rendered_again_for_a_new_map(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as file:
+            file.write('<link href="/index.css">{{ Content }}')
+        with open(os.path.join(content, "index.md"), "w") as file:
+            file.write("# Home\n\n![a](images/a.png)")
+
+        def build():
+            configure_assets(self.sync()[0])
+            try:
+                with redirect_stdout(StringIO()) as out:
+                    generate_pages(content, template, self.public, self.manifest)
+            finally:
+                configure_assets()
+            with open(os.path.join(self.public, "index.html")) as file:
+                return file.read(), out.getvalue()
+
+        page, _ = build()
+        self.assertIn(f'href="/index.{hash_bytes(b"body {}")[:10]}.css"', page)
+        self.assertIn(f'src="/images/a.{hash_bytes(b"png")[:10]}.png"', page)
+        self.assertEqual("", build()[1])
+        self.write("index.css", b"p {}")
+        page, out = build()
+        self.assertIn("writing", out)
+        self.assertIn(f'href="/index.{hash_bytes(b"p {}")[:10]}.css"', page)
+
+    def test_code_that_looks_like_references_is_left_alone(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as file:
+            file.write('<link href="/index.css">{{ Content }}')
+        with open(os.path.join(content, "index.md"), "w") as file:
+            file.write(
+                "# Home\n\n"
+                'Use `<link href="/index.css">` or write src="/images/a.png".\n\n'
+                '```\n<link href="/index.css">\n```'
+            )
+        configure_assets(self.sync()[0])
+        try:
+            with redirect_stdout(StringIO()):
+                generate_pages(content, template, self.public, self.manifest)
+        finally:
+            configure_assets()
+        with open(os.path.join(self.public, "index.html")) as file:
+            page = file.read()
+        css = f"/index.{hash_bytes(b'body {}')[:10]}.css"
+        self.assertTrue(page.startswith(f'<link href="{css}">'))
+        self.assertEqual(1, page.count(css))
+        self.assertEqual(2, page.count('&lt;link href="/index.css"&gt;'))
+        self.assertIn('write src="/images/a.png".', page)
+
+
+if __name__ == "__main__":
+    unittest.main()
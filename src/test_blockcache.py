@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import blockcache
+from blockcache import BlockCache, configure_block_cache
+from htmlnode import LeafNode
+from main import block_to_html_node, markdown_to_html_node
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "blocks.sqlite")
+        self.renders = []
+
+    def tearDown(self):
+        configure_block_cache(0)
+        self.tmp.cleanup()
+
+    def render(self, block):
+        self.renders.append(block)
+        return LeafNode("p", block)
+
+    def test_hit_returns_shared_node(self):
+        cache = BlockCache(8)
+        first = cache.get_or_render("same", self.render)
+        second = cache.get_or_render("same", self.render)
+        self.assertIs(first, second)
+        self.assertEqual(["same"], self.renders)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = BlockCache(2)
+        cache.get_or_render("a", self.render)
+        cache.get_or_render("b", self.render)
+        cache.get_or_render("a", self.render)
+        cache.get_or_render("c", self.render)
+        cache.get_or_render("a", self.render)
+        cache.get_or_render("b", self.render)
+        self.assertEqual(["a", "b", "c", "b"], self.renders)
+
+    def test_disk_tier_persists_between_builds(self):
+        cache = BlockCache(8, self.path)
+        cache.get_or_render("disk", self.render)
+        cache.close()
+        cache = BlockCache(8, self.path)
+        node = cache.get_or_render("disk", self.render)
+        cache.close()
+        self.assertEqual("<p>disk</p>", node.to_html())
+        self.assertEqual(["disk"], self.renders)
+
+    def test_renderer_version_change_discards_disk_entries(self):
+        cache = BlockCache(8, self.path)
+        cache.get_or_render("old", self.render)
+        cache.close()
+        version = blockcache.RendererVersion
+        blockcache.RendererVersion = version + 1
+        try:
+            cache = BlockCache(8, self.path)
+            cache.get_or_render("old", self.render)
+            cache.close()
+        finally:
+            blockcache.RendererVersion = version
+        self.assertEqual(["old", "old"], self.renders)
+
+    def test_markdown_to_html_node_uses_cache(self):
+        markdown = "# Title\n\nShared *text*\n\nShared *text*"
+        expected = markdown_to_html_node(markdown).to_html()
+        cache = configure_block_cache(16)
+        self.assertEqual(expected, markdown_to_html_node(markdown).to_html())
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+        node = markdown_to_html_node(markdown).children[1]
+        self.assertIs(cache.get_or_render("Shared *text*", block_to_html_node), node)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import accepted_encodings, precompress_tree
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.page = self.write("index.html", b"<p>hello</p>" * 200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_writes_gzip_sibling_with_source_mtime(self):
+        written = precompress_tree(self.root)
+        self.assertIn(self.page + ".gz", written)
+        with gzip.open(self.page + ".gz") as file:
+            self.assertEqual(b"<p>hello</p>" * 200, file.read())
+        self.assertEqual(
+            os.stat(self.page).st_mtime_ns, os.stat(self.page + ".gz").st_mtime_ns
+        )
+
+    def test_unchanged_files_are_skipped(self):
+        precompress_tree(self.root)
+        self.assertEqual([], precompress_tree(self.root))
+        self.write("index.html", b"<p>changed</p>" * 200)
+        os.utime(self.page, (1, 1))
+        self.assertIn(self.page + ".gz", precompress_tree(self.root))
+
+    def test_small_and_binary_files_are_left_alone(self):
+        self.write("tiny.css", b"p {}")
+        self.write("image.png", b"\x89PNG" * 1000)
+        precompress_tree(self.root)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "tiny.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "image.png.gz")))
+
+    def test_orphaned_variants_are_removed(self):
+        precompress_tree(self.root)
+        os.remove(self.page)
+        precompress_tree(self.root)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_static_archives_are_not_variants(self):
+        download = self.write("data.tar.gz", b"\x1f\x8b" * 1000)
+        precompress_tree(self.root)
+        self.assertTrue(os.path.exists(download))
+
+    def test_accepted_encodings(self):
+        header = "gzip;q=0.8, br , deflate;q=0, identity"
+        self.assertEqual({"gzip", "br", "identity"}, accepted_encodings(header))
+        self.assertEqual(set(), accepted_encodings(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
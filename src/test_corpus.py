@@ -0,0 +1,46 @@
+import os
+import random
+import tempfile
+import unittest
+
+from bench_pipeline import regressions
+from corpus import CorpusOptions, generate_markdown, write_site
+from main import BlockType, block_to_block_type, markdown_to_blocks, render_page
+
+
+class TestCorpus(unittest.TestCase):
+    def test_same_seed_gives_same_site(self):
+        options = CorpusOptions(pages=3, seed=7)
+        first = generate_markdown(random.Random(7), options)
+        second = generate_markdown(random.Random(7), options)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, generate_markdown(random.Random(8), options))
+
+    def test_block_mix_is_respected(self):
+        options = CorpusOptions(blocks_per_page=20, block_mix={"code": 1})
+        blocks = markdown_to_blocks(generate_markdown(random.Random(0), options))
+        types = {block_to_block_type(block) for block in blocks[1:]}
+        self.assertEqual({BlockType.Code}, types)
+
+    def test_site_layout_renders(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = write_site(root, CorpusOptions(pages=3, pages_per_section=2))
+            self.assertEqual(3, len(paths))
+            self.assertTrue(os.path.exists(os.path.join(root, "template.html")))
+            self.assertTrue(os.path.exists(os.path.join(root, "static", "index.css")))
+            with open(paths[-1]) as file:
+                page = render_page(file.read(), "{{ Title }}|{{ Content }}")
+            self.assertIn("section1", paths[-1])
+            self.assertIn("<div>", page)
+
+
+class TestRegressions(unittest.TestCase):
+    def test_only_stages_over_the_threshold_fail(self):
+        baseline = {"a": {"seconds": 1.0}, "b": {"seconds": 1.0}}
+        results = {"a": {"seconds": 1.1}, "b": {"seconds": 1.5}, "c": {"seconds": 9}}
+        slower = regressions(results, baseline, 0.25)
+        self.assertEqual(["b"], [name for name, _ in slower])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import io
+import unittest
+
+from frontmatter import (
+    page_title,
+    parse_front_matter,
+    read_front_matter,
+    split_front_matter,
+    title_from_url,
+)
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse_front_matter(self):
+        lines = [
+            "title: \"Hello: World\"",
+            "date: 2024-05-01",
+            "tags: [python, 'web']",
+            "# a comment",
+            "authors:",
+            "- Ada",
+            "- Grace",
+            "not a key",
+        ]
+        self.assertEqual(
+            {
+                "title": "Hello: World",
+                "date": "2024-05-01",
+                "tags": ["python", "web"],
+                "authors": ["Ada", "Grace"],
+            },
+            parse_front_matter(lines),
+        )
+
+    def test_tags_may_be_a_comma_separated_string(self):
+        self.assertEqual(
+            {"tags": ["a", "b"]}, parse_front_matter(["Tags: a, b,"])
+        )
+
+    def test_split_front_matter(self):
+        metadata, body = split_front_matter("---\ntitle: x\n---\n# Body\n")
+        self.assertEqual({"title": "x"}, metadata)
+        self.assertEqual("# Body\n", body)
+
+    def test_unclosed_or_missing_fence_is_body(self):
+        for markdown in ["---\ntitle: x\n# Body", "# Body\n---\n", "----\n---\n"]:
+            self.assertEqual(({}, markdown), split_front_matter(markdown))
+
+    def test_read_front_matter_leaves_file_at_body(self):
+        file = io.StringIO("---\ntags: a\n---\n\n# Title\n\ntext\n")
+        metadata, heading = read_front_matter(file)
+        self.assertEqual({"tags": ["a"]}, metadata)
+        self.assertEqual("# Title\n", heading)
+        self.assertEqual("\n# Title\n\ntext\n", file.read())
+
+    def test_read_front_matter_without_fence_rewinds(self):
+        file = io.StringIO("---\nnever closed\n")
+        self.assertEqual(({}, "---\n"), read_front_matter(file))
+        self.assertEqual("---\nnever closed\n", file.read())
+
+    def test_page_title_fallbacks(self):
+        self.assertEqual("Meta", page_title({"title": "Meta"}, "# Heading", "/a/"))
+        self.assertEqual("Heading", page_title({}, "# Heading  \n", "/a/"))
+        self.assertEqual("My Post", page_title({}, "Just text", "/blog/my-post/"))
+        self.assertEqual("Home", title_from_url("/"))
+        self.assertEqual("About Us", title_from_url("/about_us.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import pickle
+import sys
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, write_html
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -68,6 +70,66 @@ class TestHTMLNode(unittest.TestCase):
         actual = parent.to_html()
         self.assertEqual(expected, actual)
 
+    def test_parent_to_html_wide(self):
+        parent = ParentNode("ul", [LeafNode("li", str(i)) for i in range(5000)])
+        actual = parent.to_html()
+        self.assertTrue(actual.startswith("<ul><li>0</li><li>1</li>"))
+        self.assertTrue(actual.endswith("<li>4999</li></ul>"))
+
+    def test_parent_to_html_deep(self):
+        node = LeafNode("b", "core")
+        for _ in range(5000):
+            node = ParentNode("div", [node])
+        expected = "<div>" * 5000 + "<b>core</b>" + "</div>" * 5000
+        self.assertEqual(expected, node.to_html())
+
+    def test_parent_to_html_empty_children(self):
+        self.assertEqual("<p></p>", ParentNode("p", []).to_html())
+
+    def test_parent_requires_children(self):
+        with self.assertRaises(ValueError):
+            ParentNode("p", [ParentNode("b")]).to_html()
+
+    def test_write_html_streams_fragments(self):
+        parent = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, "text")])
+        parts = []
+        write_html(parent, parts.append)
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(parent.to_html(), "".join(parts))
+
+    def test_nodes_are_slotted_and_picklable(self):
+        link = LeafNode("a", "Boot", {"href": "https://boot.dev"})
+        parent = ParentNode("p", [link, LeafNode(None, "text", {})])
+        self.assertFalse(hasattr(link, "__dict__"))
+        self.assertIsNone(parent.children[1].props)
+        copy = pickle.loads(pickle.dumps(parent, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(parent.to_html(), copy.to_html())
+
+    def test_tags_are_interned(self):
+        tag = "".join(["h", "2"])
+        self.assertIs(sys.intern("h2"), LeafNode(tag, "x").tag)
+
+    def test_text_is_escaped_once_when_serialized(self):
+        leaf = LeafNode("b", "a < b && c > d \"q\"")
+        self.assertEqual('<b>a &lt; b &amp;&amp; c &gt; d "q"</b>', leaf.to_html())
+        self.assertEqual("a < b && c > d \"q\"", leaf.value)
+        self.assertEqual("x &amp;amp; y", LeafNode(None, "x &amp; y").to_html())
+
+    def test_attributes_are_escaped_and_cached(self):
+        props = {"href": '/q?a=1&b="2"', "title": "<x>"}
+        expected = ' href="/q?a=1&amp;b=&quot;2&quot;" title="&lt;x&gt;"'
+        self.assertEqual(expected, HTMLNode(props=props).props_to_html())
+        self.assertIs(
+            HTMLNode(props=props).props_to_html(),
+            HTMLNode(props=dict(props)).props_to_html(),
+        )
+        self.assertEqual(
+            '<a href="&quot;">&lt;</a>', LeafNode("a", "<", {"href": '"'}).to_html()
+        )
+
+    def test_repr_returns_a_string(self):
+        self.assertIn("Tag: p", repr(HTMLNode("p", "text")))
+
 
 if __name__ == "__main__":
     unittest.main()
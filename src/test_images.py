@@ -0,0 +1,211 @@
+import os
+import struct
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import images
+from assets import is_fingerprinted
+from images import ImageCache, ImageSet, derivative_name, image_size
+
+
+def png_header(width, height):
+    size = struct.pack(">II", width, height)
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + size
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_sizes_come_from_headers(self):
+        png = self.write("a.png", png_header(1344, 896))
+        self.assertEqual((1344, 896), image_size(png))
+        gif = b"GIF89a" + struct.pack("<HH", 20, 10) + b"\x00" * 16
+        self.assertEqual((20, 10), image_size(self.write("a.gif", gif)))
+        jpeg = (
+            b"\xff\xd8"
+            + b"\xff\xe0\x00\x04ab"
+            + b"\xff\xc0\x00\x11\x08"
+            + struct.pack(">HH", 600, 800)
+            + b"\x00" * 10
+        )
+        self.assertEqual((800, 600), image_size(self.write("a.jpg", jpeg)))
+
+
+class TestDerivativeName(unittest.TestCase):
+    def test_width_goes_before_a_fingerprint(self):
+        self.assertEqual("/a/r-480w.png", derivative_name("/a/r.png", 480))
+        self.assertEqual("v1.2-480w.png", derivative_name("v1.2.png", 480))
+        name = derivative_name("/a/r.72945f7ef8.png", 480)
+        self.assertEqual("/a/r-480w.72945f7ef8.png", name)
+        self.assertTrue(is_fingerprinted(name))
+
+
+class TestImageSet(unittest.TestCase):
+    def setUp(self):
+        self.images = ImageSet(
+            {
+                "/images/a.png": {
+                    "width": 1000,
+                    "height": 500,
+                    "srcset": [["/images/a-480w.png", 480], ["/images/a.png", 1000]],
+                },
+                "/images/b.gif": {"width": 20, "height": 10, "srcset": []},
+            }
+        )
+
+    def test_sizes_srcset_and_lazy_loading_are_added(self):
+        html = '<p><img src="../images/a.png" alt="a"></img></p>'
+        self.assertEqual(
+            '<p><img width="1000" height="500"'
+            ' srcset="/images/a-480w.png 480w, /images/a.png 1000w"'
+            ' sizes="(max-width: 1000px) 100vw, 1000px" loading="lazy"'
+            ' src="../images/a.png" alt="a"></img></p>',
+            self.images.rewrite_html(html, "/blog/"),
+        )
+        self.assertEqual(
+            '<img width="20" height="10" loading="lazy" src="/images/b.gif">',
+            self.images.rewrite_html('<img src="/images/b.gif">'),
+        )
+
+    def test_escaped_sources_are_matched(self):
+        image_set = ImageSet({"/r&d.gif": {"width": 2, "height": 1, "srcset": []}})
+        self.assertEqual(
+            '<img width="2" height="1" loading="lazy" src="/r&amp;d.gif">',
+            image_set.rewrite_html('<img src="/r&amp;d.gif">'),
+        )
+
+    def test_props_of_image_nodes_are_extended(self):
+        props = {"src": "/images/b.gif", "alt": "b"}
+        self.assertEqual(
+            {
+                "width": 20,
+                "height": 10,
+                "loading": "lazy",
+                "src": "/images/b.gif",
+                "alt": "b",
+            },
+            self.images.rewrite_props("img", props),
+        )
+        self.assertIs(props, self.images.rewrite_props("a", props))
+
+    def test_other_images_are_left_alone(self):
+        for html in [
+            '<img src="/images/c.png">',
+            '<img srcset="x 1w" src="/images/a.png">',
+            '<img alt="no source">',
+        ]:
+            self.assertEqual(html, self.images.rewrite_html(html))
+
+
+def fake_render(job):
+    source, cache_path, width, height, quality = job
+    with open(cache_path, "w") as file:
+        file.write(f"{os.path.basename(source)} {width}x{height}")
+    return cache_path
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.cache_dir = os.path.join(root, ".build", "images")
+        self.public = os.path.join(root, "public")
+        self.source = os.path.join(root, "a.png")
+        with open(self.source, "wb") as file:
+            file.write(png_header(1000, 500))
+        self.renders = []
+        self.patched = images.Image, images.render_derivative
+        images.Image = object()
+
+        def render(job):
+            self.renders.append(job[2])
+            return fake_render(job)
+
+        images.render_derivative = render
+
+    def tearDown(self):
+        images.Image, images.render_derivative = self.patched
+        self.tmp.cleanup()
+
+    def build(self, source_hash="a" * 64, widths=(480, 960, 2000)):
+        output = os.path.join(self.public, "images", "a.png")
+        cache = ImageCache(self.cache_dir, widths)
+        with redirect_stdout(StringIO()):
+            image_set, written = cache.build(
+                [(self.source, source_hash, "/images/a.png", output)], self.public
+            )
+        cache.save()
+        return image_set, written
+
+    def test_derivatives_are_rendered_once_and_published(self):
+        image_set, written = self.build()
+        self.assertEqual([480, 960], self.renders)
+        srcset = [
+            ["/images/a-480w.png", 480],
+            ["/images/a-960w.png", 960],
+            ["/images/a.png", 1000],
+        ]
+        self.assertEqual(srcset, image_set.images["/images/a.png"]["srcset"])
+        with open(os.path.join(self.public, "images", "a-480w.png")) as file:
+            self.assertEqual("a.png 480x240", file.read())
+        self.assertEqual(2, len(written))
+        os.remove(self.source)
+        image_set, written = self.build()
+        self.assertEqual([480, 960], self.renders)
+        self.assertEqual([], written)
+        self.assertEqual(500, image_set.images["/images/a.png"]["height"])
+
+    def test_new_source_or_widths_replace_derivatives(self):
+        self.build()
+        _, written = self.build(source_hash="b" * 64, widths=(480,))
+        self.assertEqual([480, 960, 480], self.renders)
+        stale = os.path.join(self.public, "images", "a-960w.png")
+        self.assertIn(stale, written)
+        self.assertFalse(os.path.exists(stale))
+
+    def test_published_derivatives_are_cleared(self):
+        self.build()
+        cache = ImageCache(self.cache_dir, ())
+        with redirect_stdout(StringIO()):
+            stale = cache.clear()
+        cache.save()
+        self.assertEqual(2, len(stale))
+        self.assertFalse(any(os.path.exists(output) for output in stale))
+        self.assertEqual({}, ImageCache(self.cache_dir, ()).outputs)
+
+    def test_without_pillow_only_sizes_are_known(self):
+        images.Image = None
+        image_set, written = self.build()
+        self.assertEqual([], self.renders)
+        self.assertEqual([], written)
+        self.assertEqual(
+            {"width": 1000, "height": 500, "srcset": []},
+            image_set.images["/images/a.png"],
+        )
+
+
+@unittest.skipIf(images.Image is None, "Pillow is not installed")
+class TestRenderDerivative(unittest.TestCase):
+    def test_resized_copy_is_written(self):
+        with tempfile.TemporaryDirectory() as root:
+            source = os.path.join(root, "a.png")
+            images.Image.new("RGB", (100, 50), "red").save(source)
+            target = os.path.join(root, "a-40w.png")
+            images.render_derivative((source, target, 40, 20, 82))
+            self.assertEqual((40, 20), image_size(target))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from htmlnode import LeafNode, ParentNode
+from links import LinkIndex, collect_references, output_paths, resolve_reference
+from main import generate_pages
+from manifest import BuildManifest
+
+
+class TestReferences(unittest.TestCase):
+    def test_collect_references_in_document_order(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("a", "one", {"href": "/one"})]),
+                LeafNode("img", "", {"src": "/two.png", "alt": "two"}),
+                LeafNode(None, "text"),
+            ],
+        )
+        self.assertEqual(["/one", "/two.png"], collect_references(node))
+
+    def test_resolve_reference(self):
+        cases = [
+            ("/blog/", "/about", "/about"),
+            ("/blog/", "post/", "/blog/post"),
+            ("/blog/post/", "../img/a%20b.png", "/blog/img/a b.png"),
+            ("/blog/", "/about?x=1#team", "/about"),
+            ("/blog/", "#top", None),
+            ("/blog/", "https://example.com/", None),
+            ("/blog/", "mailto:someone@example.com", None),
+            ("/blog/", "//cdn.example.com/x.js", None),
+        ]
+        for page_url, url, expected in cases:
+            self.assertEqual(expected, resolve_reference(page_url, url), url)
+
+    def test_output_paths_answer_for_directories_and_extensionless_pages(self):
+        manifest = BuildManifest()
+        manifest.pages = {
+            "content/index.md": {"output": "public/index.html"},
+            "content/blog/index.md": {"output": "public/blog/index.html"},
+            "content/about.md": {"output": "public/about.html"},
+        }
+        manifest.static = {"static/a.css": {"output": "public/a.css"}}
+        expected = {
+            "/",
+            "/index.html",
+            "/blog",
+            "/blog/index.html",
+            "/about",
+            "/about.html",
+            "/a.css",
+        }
+        self.assertEqual(expected, output_paths(manifest, "./public"))
+
+
+class TestLinkIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest_path = os.path.join(root, ".build", "manifest.json")
+        self.links_path = os.path.join(root, ".build", "links.json")
+        os.makedirs(os.path.join(self.content, "post"))
+        with open(self.template, "w") as file:
+            file.write("{{ Content }}")
+        self.write("index.md", "# Home\n\n[post](/post/) [gone](/gone)")
+        self.write("post/index.md", "# Post\n\n[home](../)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(os.path.join(self.content, relative_path), "w") as file:
+            file.write(text)
+
+    def build(self):
+        manifest = BuildManifest.load(self.manifest_path)
+        links = LinkIndex.load(self.links_path)
+        with redirect_stdout(StringIO()) as out:
+            generate_pages(
+                self.content, self.template, self.public, manifest, links=links
+            )
+        broken = links.check(manifest, self.public)
+        manifest.save()
+        links.save()
+        return broken, out.getvalue()
+
+    def test_broken_links_are_reported(self):
+        broken, _ = self.build()
+        self.assertEqual([(os.path.join(self.content, "index.md"), "/gone")], broken)
+
+    def test_new_target_fixes_link_without_rerendering_the_page(self):
+        self.build()
+        self.write("gone.md", "# Gone")
+        broken, out = self.build()
+        self.assertEqual([], broken)
+        self.assertEqual(1, out.count("writing"))
+
+    def test_only_pages_linking_to_a_changed_target_are_checked(self):
+        self.build()
+        links = LinkIndex.load(self.links_path)
+        home = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "post", "index.md")
+        self.assertEqual({home}, links.linked_from["/gone"])
+        self.assertEqual({post}, links.linked_from["/"])
+        links.pages[post]["broken"] = ["stale"]
+        manifest = BuildManifest.load(self.manifest_path)
+        manifest.pages[home + ".gone"] = {"output": os.path.join(self.public, "gone")}
+        broken = links.check(manifest, self.public)
+        self.assertEqual([(post, "stale")], broken)
+        links.remove_page(home)
+        self.assertNotIn("/gone", links.linked_from)
+
+    def test_removed_target_breaks_link(self):
+        self.build()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        broken, out = self.build()
+        self.assertEqual(["/gone", "/post/"], sorted(url for _, url in broken))
+        self.assertNotIn("writing", out)
+
+    def test_pages_missing_from_the_index_are_rendered_again(self):
+        self.build()
+        os.remove(self.links_path)
+        broken, out = self.build()
+        self.assertEqual(2, out.count("writing"))
+        self.assertEqual(["/gone"], [url for _, url in broken])
+
+
+if __name__ == "__main__":
+    unittest.main()
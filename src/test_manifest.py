@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+
+import main
+from manifest import BuildManifest, load_json, replacing, save_json
+from main import generate_pages
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest_path = os.path.join(root, ".build", "manifest.json")
+        os.makedirs(os.path.join(self.content, "post"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nHello")
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nBody")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, include=None, exclude=None):
+        manifest = BuildManifest.load(self.manifest_path)
+        generate_pages(
+            self.content,
+            self.template,
+            self.public,
+            manifest,
+            include=include,
+            exclude=exclude,
+        )
+        manifest.save()
+        return manifest
+
+    def output(self, *parts):
+        return os.path.join(self.public, *parts)
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        self.build()
+        home = self.output("index.html")
+        os.utime(home, (0, 0))
+        self.build()
+        self.assertEqual(0, os.stat(home).st_mtime)
+
+    def test_only_markdown_is_rendered(self):
+        self.write(os.path.join(self.content, "post", "notes.txt"), "not a page")
+        manifest = self.build()
+        self.assertEqual(2, len(manifest.pages))
+        self.assertFalse(os.path.exists(self.output("post", "notes.txt")))
+
+    def test_changed_page_is_rerendered(self):
+        self.build()
+        post = self.output("post", "index.html")
+        os.utime(post, (0, 0))
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nEdited")
+        self.build()
+        with open(post) as file:
+            self.assertIn("<p>Edited</p>", file.read())
+
+    def test_unchanged_sources_are_not_read(self):
+        self.build()
+        hashed = []
+        hash_file = main.hash_file
+
+        def counting_hash(path):
+            hashed.append(path)
+            return hash_file(path)
+
+        main.hash_file = counting_hash
+        try:
+            self.build()
+            source = os.path.join(self.content, "post", "index.md")
+            self.write(source, "# Post\n\nBODY")
+            os.utime(source, ns=(1, 1))
+            self.build()
+        finally:
+            main.hash_file = hash_file
+        self.assertEqual([self.template] * 2 + [source], hashed)
+        with open(self.output("post", "index.html")) as file:
+            self.assertIn("<p>BODY</p>", file.read())
+
+    def test_template_change_rerenders_everything(self):
+        self.build()
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        with open(self.output("index.html")) as file:
+            self.assertTrue(file.read().startswith("<h1>Home</h1>"))
+
+    def test_deleted_source_output_is_pruned(self):
+        self.build()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        manifest = self.build()
+        self.assertFalse(os.path.exists(self.output("post", "index.html")))
+        self.assertEqual(1, len(manifest.pages))
+
+    def test_filtered_build_keeps_pages_outside_the_filter(self):
+        self.build()
+        manifest = self.build(include=["post/*"])
+        self.assertTrue(os.path.exists(self.output("index.html")))
+        self.assertEqual(2, len(manifest.pages))
+        os.remove(os.path.join(self.content, "index.md"))
+        manifest = self.build(exclude=["index.md"])
+        self.assertFalse(os.path.exists(self.output("index.html")))
+        self.assertEqual(1, len(manifest.pages))
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(self.output("index.html"))
+        self.build()
+        self.assertTrue(os.path.exists(self.output("index.html")))
+
+    def test_json_round_trip_checks_the_format(self):
+        path = os.path.join(self.tmp.name, ".build", "index.json")
+        save_json(path, 2, {"pages": {"a.md": 1}})
+        self.assertEqual({"format": 2, "pages": {"a.md": 1}}, load_json(path, 2))
+        self.assertIsNone(load_json(path, 1))
+        self.assertFalse(os.path.exists(path + ".tmp"))
+        self.write(path, "[1")
+        self.assertIsNone(load_json(path, 2))
+
+    def test_interrupted_write_keeps_the_old_file(self):
+        path = os.path.join(self.tmp.name, "page.html")
+        self.write(path, "old")
+        with self.assertRaises(RuntimeError):
+            with replacing(path, "w") as file:
+                file.write("partial")
+                raise RuntimeError("interrupted")
+        with open(path) as file:
+            self.assertEqual("old", file.read())
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from main import read_source, write_output
+from pageio import PageIO, write_error
+
+
+class TestWriteOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_identical_output_keeps_its_mtime(self):
+        self.assertTrue(write_output(self.path, "<p>same</p>"))
+        os.utime(self.path, (1000, 1000))
+        self.assertFalse(write_output(self.path, "<p>same</p>"))
+        self.assertEqual(1000, os.stat(self.path).st_mtime)
+        self.assertTrue(write_output(self.path, "<p>diff</p>"))
+        self.assertEqual("<p>diff</p>", read_source(self.path))
+
+
+class TestPageIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def source(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_reads_ahead_and_writes_behind(self):
+        paths = [self.source(f"{i}.md", f"page {i}") for i in range(20)]
+        reads = []
+
+        def read(path):
+            reads.append(path)
+            return read_source(path)
+
+        with PageIO(read, write_output) as io:
+            order = []
+            futures = []
+            for path in io.read_ahead(paths, lambda path: path, depth=3):
+                order.append(path)
+                if len(order) == 1:
+                    # Reads for the rest of the window are already queued.
+                    self.assertEqual(4, len(io.reads))
+                output = os.path.join(self.root, "out", os.path.basename(path))
+                futures.append(io.write(output, io.read(path).upper()))
+        self.assertEqual(paths, order)
+        self.assertEqual(20, len(reads))
+        self.assertEqual([True] * 20, [future.result() for future in futures])
+        self.assertEqual("PAGE 7", read_source(os.path.join(self.root, "out", "7.md")))
+
+    def test_directories_are_created_once(self):
+        directory = os.path.join(self.root, "a", "b")
+        with PageIO(read_source, write_output) as io:
+            io.write(os.path.join(directory, "1.html"), "x").result()
+            os.rename(directory, directory + ".moved")
+            # A known directory is not stat'ed or created again.
+            error = write_error(io.write(os.path.join(directory, "2.html"), "x"))
+        self.assertEqual({directory}, io.directories)
+        self.assertIn("FileNotFoundError", error)
+
+    def test_large_files_are_not_prefetched(self):
+        path = self.source("big.md", "x" * 100)
+        with PageIO(read_source, write_output) as io:
+            io.prefetch(path, max_size=10)
+            self.assertIsNone(io.reads[path].result())
+            self.assertEqual("x" * 100, io.read(path))
+
+    def test_pending_writes_are_bounded(self):
+        release = threading.Event()
+        running = []
+
+        def slow_write(path, text):
+            running.append(path)
+            release.wait()
+
+        io = PageIO(read_source, slow_write, workers=1, max_pending=2)
+        io.write(os.path.join(self.root, "1"), "")
+        io.write(os.path.join(self.root, "2"), "")
+        blocked = threading.Thread(
+            target=io.write, args=(os.path.join(self.root, "3"), "")
+        )
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+        release.set()
+        blocked.join()
+        io.close()
+        self.assertEqual(3, len(running))
+
+    def test_write_errors_are_reported(self):
+        def failing_write(path, text):
+            raise OSError("disk full")
+
+        with PageIO(read_source, failing_write) as io:
+            future = io.write(os.path.join(self.root, "index.html"), "x")
+        self.assertEqual("OSError: disk full", write_error(future))
+        self.assertEqual("ValueError: bad", write_error(ValueError("bad")))
+        self.assertIsNone(write_error(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
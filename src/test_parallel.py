@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from main import generate_pages, shard_pages
+
+
+class TestParallelGeneration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.template = os.path.join(root, "template.html")
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        for i in range(12):
+            os.makedirs(os.path.join(self.content, f"page{i:02}"))
+            self.write(f"page{i:02}/index.md", f"# Page {i}\n\nText *{i}*")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(os.path.join(self.content, relative_path), "w") as file:
+            file.write(text)
+
+    def build(self, dest, jobs):
+        out = StringIO()
+        with redirect_stdout(out):
+            generate_pages(self.content, self.template, dest, jobs=jobs)
+        return out.getvalue()
+
+    def read_tree(self, root):
+        pages = {}
+        for directory, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(directory, name)
+                with open(path) as file:
+                    pages[os.path.relpath(path, root)] = file.read()
+        return pages
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.tmp.name, "serial")
+        parallel = os.path.join(self.tmp.name, "parallel")
+        self.build(serial, 1)
+        self.build(parallel, 3)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_parallel_console_output_is_deterministic(self):
+        first = self.build(os.path.join(self.tmp.name, "a"), 4)
+        second = self.build(os.path.join(self.tmp.name, "a"), 4)
+        self.assertEqual(first, second)
+
+    def test_parallel_errors_are_collected(self):
+        with open(os.path.join(self.content, "page03", "index.md"), "wb") as file:
+            file.write(b"# Not UTF-8 \xff")
+        out = StringIO()
+        with redirect_stdout(out), self.assertRaises(Exception) as ctx:
+            generate_pages(
+                self.content, self.template, os.path.join(self.tmp.name, "p"), jobs=3
+            )
+        self.assertIn("1 of 12 pages failed", str(ctx.exception))
+        self.assertIn("page03", out.getvalue())
+        self.assertEqual(11, out.getvalue().count("writing"))
+
+    def test_shard_pages_covers_every_page(self):
+        pages = list(range(103))
+        shards = shard_pages(pages, 4)
+        self.assertEqual(pages, [page for shard in shards for page in shard])
+
+
+if __name__ == "__main__":
+    unittest.main()
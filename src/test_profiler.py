@@ -0,0 +1,71 @@
+import types
+import unittest
+
+from profiler import BuildProfiler
+
+
+def render(source):
+    return parse(source).upper()
+
+
+def parse(source):
+    return source.strip()
+
+
+class TestBuildProfiler(unittest.TestCase):
+    def setUp(self):
+        self.module = types.SimpleNamespace(render=render, parse=parse)
+
+    def test_restore_puts_originals_back(self):
+        profiler = BuildProfiler()
+        profiler.instrument(self.module, ["render", "parse"])
+        self.assertIsNot(render, self.module.render)
+        profiler.restore()
+        self.assertIs(render, self.module.render)
+        self.assertIs(parse, self.module.parse)
+
+    def test_stages_and_pages_are_recorded(self):
+        profiler = BuildProfiler()
+        profiler.instrument(self.module, ["parse"])
+        profiler.instrument(self.module, ["render"], page=True)
+        # render looks parse up through its own globals, so call the wrapper
+        # for parse directly to count it as well.
+        self.assertEqual("A", self.module.render(" a "))
+        self.module.parse(" b ")
+        profiler.restore()
+        self.assertEqual(1, profiler.stages["render"].calls)
+        self.assertEqual(1, profiler.stages["parse"].calls)
+        self.assertEqual([" a "], [page[0] for page in profiler.pages])
+
+    def test_exceptions_are_still_timed(self):
+        profiler = BuildProfiler()
+        profiler.instrument(self.module, ["parse"])
+        with self.assertRaises(AttributeError):
+            self.module.parse(None)
+        profiler.restore()
+        self.assertEqual(1, profiler.stages["parse"].calls)
+
+    def test_json_holds_a_chrome_trace(self):
+        profiler = BuildProfiler()
+        profiler.instrument(self.module, ["render"], page=True)
+        self.module.render("x")
+        profiler.restore()
+        data = profiler.to_json()
+        [event] = data["traceEvents"]
+        self.assertEqual("X", event["ph"])
+        self.assertEqual({"source": "x"}, event["args"])
+        self.assertEqual(1, data["stages"]["render"]["calls"])
+
+    def test_report_lists_stages_and_slowest_pages(self):
+        profiler = BuildProfiler()
+        profiler.instrument(self.module, ["render"], page=True)
+        self.module.render("page.md")
+        profiler.restore()
+        report = profiler.report()
+        self.assertIn("render", report)
+        self.assertIn("slowest pages", report)
+        self.assertIn("page.md", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from scan import glob_root, scan_tree
+
+
+class TestScanTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for relative_path in (
+            "index.md",
+            "notes.txt",
+            ".draft.md",
+            "blog/b.md",
+            "blog/a.md",
+            "blog/img/cover.png",
+            "drafts/wip.md",
+            ".git/HEAD",
+        ):
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write("x")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, **kwargs):
+        return [
+            os.path.relpath(entry.path, self.root)
+            for entry in scan_tree(self.root, **kwargs)
+        ]
+
+    def test_files_are_found_in_name_order_without_dotfiles(self):
+        expected = [
+            "index.md",
+            "notes.txt",
+            "blog/a.md",
+            "blog/b.md",
+            "blog/img/cover.png",
+            "drafts/wip.md",
+        ]
+        self.assertEqual(expected, self.scan())
+
+    def test_suffix_filter(self):
+        expected = ["index.md", "blog/a.md", "blog/b.md", "drafts/wip.md"]
+        self.assertEqual(expected, self.scan(suffixes=(".md",)))
+
+    def test_include_and_exclude_patterns(self):
+        self.assertEqual(["blog/a.md", "blog/b.md"], self.scan(include=["blog/*.md"]))
+        self.assertEqual(
+            ["index.md", "notes.txt"], self.scan(exclude=["blog", "drafts/*"])
+        )
+
+    def test_hidden_files_on_request(self):
+        self.assertIn(".draft.md", self.scan(hidden=True))
+        self.assertIn(".git/HEAD", self.scan(hidden=True))
+
+    def test_results_stream(self):
+        scanner = scan_tree(self.root)
+        first = next(scanner)
+        self.assertEqual("index.md", first.name)
+        self.assertTrue(first.is_file())
+
+    def test_missing_root_yields_nothing(self):
+        self.assertEqual([], list(scan_tree(os.path.join(self.root, "missing"))))
+
+    def test_glob_root(self):
+        self.assertEqual("./static", glob_root("./static/**/*"))
+        self.assertEqual("./static", glob_root("./static"))
+
+
+if __name__ == "__main__":
+    unittest.main()
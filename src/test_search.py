@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from htmlnode import LeafNode, ParentNode
+from main import generate_pages
+from manifest import BuildManifest
+from search import (
+    SearchIndex,
+    SearchReader,
+    collect_text,
+    search_response,
+    shard_name,
+    shard_of,
+    tokenize,
+)
+
+
+class TestText(unittest.TestCase):
+    def test_collect_text_in_document_order(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode(None, "Fish & chips")]),
+                LeafNode("img", "", {"src": "/a.png", "alt": "a cat"}),
+                LeafNode("code", "x < y"),
+            ],
+        )
+        self.assertEqual("Fish & chips a cat x < y", collect_text(node))
+
+    def test_tokenize(self):
+        self.assertEqual(
+            ["don", "t", "panic", "42", "café"], tokenize("Don't PANIC: 42 Café!")
+        )
+        self.assertEqual([], tokenize("x" * 256))
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = self.tmp.name
+        self.directory = os.path.join(self.public, "search")
+        self.index = SearchIndex()
+        self.index.record_page("a.md", "/a/", "A", "the ring the ring of power")
+        self.index.record_page("b.md", "/b/", "B", "the hobbit and the ring")
+        self.index.record_page("c.md", "/c/", "C", "elves")
+        self.index.write(self.public)
+        self.reader = SearchReader(self.directory)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def urls(self, query):
+        return [result["url"] for result in self.reader.search(query)]
+
+    def test_results_are_ranked_by_bm25(self):
+        self.assertEqual(["/a/", "/b/"], self.urls("ring"))
+        self.assertEqual(["/b/", "/a/"], self.urls("hobbit ring"))
+        self.assertEqual(["/c/"], self.urls("Elves"))
+        self.assertEqual([], self.urls("dragon"))
+
+    def test_only_changed_shards_are_written(self):
+        written = self.index.write(self.public)
+        self.assertEqual([], written)
+        self.index.record_page("c.md", "/c/", "C", "elves dwarves")
+        written = self.index.write(self.public)
+        expected = {
+            os.path.join(self.directory, "docs.bin"),
+            os.path.join(self.directory, shard_name(shard_of("dwarves"))),
+        }
+        self.assertEqual(expected, set(written))
+        self.assertEqual(["/c/"], self.urls("dwarves"))
+
+    def test_removed_pages_free_their_id_and_shards(self):
+        self.index.remove_page("c.md")
+        written = self.index.write(self.public)
+        shard = os.path.join(self.directory, shard_name(shard_of("elves")))
+        self.assertIn(shard, written)
+        self.assertEqual([], self.urls("elves"))
+        self.index.record_page("d.md", "/d/", "D", "ents")
+        self.assertEqual(2, self.index.pages["d.md"]["id"])
+        self.index.write(self.public)
+        self.assertEqual(["/d/"], self.urls("ents"))
+
+    def test_index_survives_save_and_load(self):
+        path = os.path.join(self.tmp.name, "search.json")
+        self.index.path = path
+        self.index.save()
+        loaded = SearchIndex.load(path)
+        self.assertEqual(self.index.pages, loaded.pages)
+        self.assertEqual(self.index.shards, loaded.shards)
+
+    def test_freed_ids_survive_save_and_load(self):
+        path = os.path.join(self.tmp.name, "search.json")
+        self.index.path = path
+        self.index.remove_page("a.md")
+        self.index.write(self.public)
+        self.index.save()
+        loaded = SearchIndex.load(path)
+        loaded.record_page("d.md", "/d/", "D", "ents")
+        loaded.record_page("e.md", "/e/", "E", "ents")
+        self.assertEqual(0, loaded.pages["d.md"]["id"])
+        self.assertEqual(3, loaded.pages["e.md"]["id"])
+
+    def test_patched_shards_match_a_full_rebuild(self):
+        self.index.record_page("a.md", "/a/", "A", "the ring of power")
+        self.index.remove_page("b.md")
+        self.index.record_page("d.md", "/d/", "D", "the ring and the elves")
+        self.index.write(self.public)
+        rebuilt = os.path.join(self.tmp.name, "rebuilt")
+        full = SearchIndex()
+        full.pages = self.index.pages
+        full.shards = set(self.index.shards)
+        full.write(rebuilt)
+        for name in sorted(os.listdir(self.directory)):
+            with open(os.path.join(self.directory, name), "rb") as file:
+                patched = file.read()
+            with open(os.path.join(rebuilt, "search", name), "rb") as file:
+                self.assertEqual(file.read(), patched, name)
+        self.assertEqual(["/d/"], self.urls("and"))
+
+    def test_search_response(self):
+        body = json.loads(search_response(self.reader, "/search?q=ring&limit=1"))
+        self.assertEqual("ring", body["query"])
+        self.assertEqual(
+            [{"url": "/a/", "title": "A", "score": body["results"][0]["score"]}],
+            body["results"],
+        )
+        empty = json.loads(search_response(self.reader, "/search"))
+        self.assertEqual([], empty["results"])
+
+    def test_missing_index_returns_nothing(self):
+        reader = SearchReader(os.path.join(self.public, "none"))
+        self.assertEqual([], reader.search("x"))
+
+    def test_build_indexes_rendered_text(self):
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        with open(template, "w") as file:
+            file.write("{{ Content }}")
+        with open(os.path.join(content, "index.md"), "w") as file:
+            file.write("# Home\n\nSee **Mordor** and `Gondor`")
+        manifest = BuildManifest()
+        index = SearchIndex()
+        with redirect_stdout(StringIO()):
+            generate_pages(content, template, self.public, manifest, search=index)
+        index.write(self.public)
+        self.assertEqual(["/"], self.urls("mordor gondor"))
+        self.assertEqual("Home", self.reader.search("home")[0]["title"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import gzip
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import serving
+from compress import precompress_tree
+from search import SearchIndex
+from serving import FileCache, create_production_server
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_small_files_are_held_in_memory(self):
+        path = self.write("a.css", b"body {}")
+        cache = FileCache()
+        entry = cache.get(path)
+        self.assertEqual(b"body {}", entry.body)
+        self.assertEqual("text/css", entry.content_type)
+        self.assertIs(entry, cache.get(path))
+
+    def test_large_files_are_not_held_in_memory(self):
+        path = self.write("big.bin", b"x" * 100)
+        entry = FileCache(max_file_size=10).get(path)
+        self.assertIsNone(entry.body)
+        self.assertEqual(100, entry.size)
+
+    def test_changed_file_is_reloaded_after_revalidation(self):
+        path = self.write("a.css", b"one")
+        cache = FileCache()
+        first = cache.get(path)
+        self.write("a.css", b"three")
+        interval = serving.RevalidateInterval
+        serving.RevalidateInterval = 0
+        try:
+            second = cache.get(path)
+        finally:
+            serving.RevalidateInterval = interval
+        self.assertEqual(b"three", second.body)
+        self.assertNotEqual(first.etag, second.etag)
+
+    def test_directory_lookups_are_cached(self):
+        directory = os.path.join(self.tmp.name, "post")
+        os.makedirs(directory)
+        index = self.write(os.path.join("post", "index.html"), b"<p>post</p>")
+        cache = FileCache()
+        self.assertIsNone(cache.get(directory))
+        self.assertTrue(cache.is_directory(directory))
+        self.assertFalse(cache.is_directory(index))
+        entry = cache.get(index)
+        calls = []
+        stat = os.stat
+
+        def counting_stat(*args, **kwargs):
+            calls.append(args[0])
+            return stat(*args, **kwargs)
+
+        os.stat = counting_stat
+        try:
+            self.assertIsNone(cache.get(directory))
+            self.assertTrue(cache.is_directory(directory))
+            self.assertIs(entry, cache.get(index))
+        finally:
+            os.stat = stat
+        self.assertEqual([], calls)
+
+    def test_least_recently_used_bodies_are_evicted(self):
+        cache = FileCache(max_bytes=10)
+        a = self.write("a", b"12345")
+        b = self.write("b", b"12345")
+        c = self.write("c", b"12345")
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        self.assertEqual([a, c], list(cache.entries))
+        self.assertEqual(10, cache.size)
+
+
+class TestProductionServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        os.makedirs(os.path.join(root, "post"))
+        with open(os.path.join(root, "index.css"), "wb") as file:
+            file.write(b"body {}")
+        with open(os.path.join(root, "post", "index.html"), "wb") as file:
+            file.write(b"<p>post</p>")
+        self.page = b"<p>compressible</p>" * 500
+        with open(os.path.join(root, "large.html"), "wb") as file:
+            file.write(self.page)
+        self.large = os.urandom(serving.CacheMaxFileSize + 1)
+        with open(os.path.join(root, "large.png"), "wb") as file:
+            file.write(self.large)
+        self.server = create_production_server(0, root)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection(
+            "localhost", self.server.server_address[1]
+        )
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmp.cleanup()
+
+    def get(self, path, method="GET", headers=None):
+        self.connection.request(method, path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+    def test_keep_alive_and_conditional_get(self):
+        response, body = self.get("/index.css")
+        self.assertEqual(200, response.status)
+        self.assertEqual(b"body {}", body)
+        etag = response.getheader("ETag")
+        response, body = self.get("/index.css", headers={"If-None-Match": etag})
+        self.assertEqual(304, response.status)
+        self.assertEqual(b"", body)
+        since = {"If-Modified-Since": response.getheader("Last-Modified")}
+        response, _ = self.get("/index.css", headers=since)
+        self.assertEqual(304, response.status)
+
+    def test_head_sends_no_body(self):
+        response, body = self.get("/index.css", method="HEAD")
+        self.assertEqual("7", response.getheader("Content-Length"))
+        self.assertEqual(b"", body)
+
+    def test_directory_index_and_redirect(self):
+        response, _ = self.get("/post")
+        self.assertEqual(301, response.status)
+        self.assertEqual("/post/", response.getheader("Location"))
+        response, body = self.get("/post/")
+        self.assertEqual(b"<p>post</p>", body)
+
+    def test_large_file_is_sent_intact(self):
+        response, body = self.get("/large.png")
+        self.assertEqual(200, response.status)
+        self.assertEqual(self.large, body)
+
+    def test_precompressed_variant_is_negotiated(self):
+        precompress_tree(self.server.RequestHandlerClass.keywords["directory"])
+        gzip_only = {"Accept-Encoding": "gzip"}
+        response, body = self.get("/large.html", headers=gzip_only)
+        self.assertEqual("gzip", response.getheader("Content-Encoding"))
+        self.assertEqual("Accept-Encoding", response.getheader("Vary"))
+        self.assertEqual("text/html", response.getheader("Content-Type"))
+        self.assertEqual(self.page, gzip.decompress(body))
+        response, body = self.get("/large.html")
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(self.page, body)
+
+    def test_stale_variant_is_ignored(self):
+        root = self.server.RequestHandlerClass.keywords["directory"]
+        precompress_tree(root)
+        os.utime(os.path.join(root, "large.html"), (1, 1))
+        response, body = self.get("/large.html", headers={"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(self.page, body)
+
+    def test_search_endpoint(self):
+        root = self.server.RequestHandlerClass.keywords["directory"]
+        index = SearchIndex()
+        index.record_page("post.md", "/post/", "Post", "hello search")
+        index.write(root)
+        response, body = self.get("/search?q=Hello")
+        self.assertEqual("application/json", response.getheader("Content-Type"))
+        results = json.loads(body)["results"]
+        self.assertEqual(["/post/"], [result["url"] for result in results])
+
+    def test_fingerprinted_assets_are_immutable(self):
+        root = self.server.RequestHandlerClass.keywords["directory"]
+        with open(os.path.join(root, "index.0123456789.css"), "wb") as file:
+            file.write(b"body {}")
+        response, _ = self.get("/index.0123456789.css")
+        self.assertIn("immutable", response.getheader("Cache-Control"))
+        response, _ = self.get("/index.css")
+        self.assertIsNone(response.getheader("Cache-Control"))
+
+    def test_missing_file(self):
+        response, _ = self.get("/missing.css")
+        self.assertEqual(404, response.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from main import generate_pages, write_site_listings
+from manifest import BuildManifest
+from siteindex import SiteIndex, listing_pages
+
+
+class TestListingPages(unittest.TestCase):
+    def test_newest_first_and_paginated(self):
+        entries = [
+            {"title": "b", "date": "2024-01-01"},
+            {"title": "a", "date": ""},
+            {"title": "c", "date": "2024-03-01"},
+        ]
+        pages = list(listing_pages("/tags/x/", entries, 2))
+        self.assertEqual(["/tags/x/", "/tags/x/page/2/"], [page[0] for page in pages])
+        self.assertEqual(["c", "b"], [entry["title"] for entry in pages[0][1]])
+        self.assertEqual((None, "/tags/x/page/2/"), pages[0][2:])
+        self.assertEqual(("/tags/x/", None), pages[1][2:])
+
+    def test_empty_listing_has_one_page(self):
+        self.assertEqual([("/x/", [], None, None)], list(listing_pages("/x/", [], 5)))
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.manifest_path = os.path.join(root, ".build", "manifest.json")
+        self.site_path = os.path.join(root, ".build", "site.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        self.write("index.md", "# Home")
+        self.write("blog/one.md", "---\ndate: 2024-01-01\ntags: [Python]\n---\n# One")
+        self.write("blog/two.md", "---\ndate: 2024-02-01\ntags: python, Web\n---\ntext")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(os.path.join(self.content, relative_path), "w") as file:
+            file.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as file:
+            return file.read()
+
+    def build(self, page_size=1):
+        manifest = BuildManifest.load(self.manifest_path)
+        site = SiteIndex.load(self.site_path)
+        with redirect_stdout(StringIO()) as out:
+            generate_pages(
+                self.content, self.template, self.public, manifest, site=site
+            )
+            write_site_listings(site, self.template, self.public, page_size)
+        manifest.save()
+        site.save()
+        return site, out.getvalue()
+
+    def test_sections_and_tags_are_listed(self):
+        site, _ = self.build()
+        section = self.read("sections", "blog", "index.html")
+        self.assertIn('<title>Blog</title>', section)
+        self.assertIn('<a href="/blog/two.html">Two</a>', section)
+        self.assertIn('<a rel="next" href="/sections/blog/page/2/">', section)
+        older = self.read("sections", "blog", "page", "2", "index.html")
+        self.assertIn('<a href="/blog/one.html">One</a>', older)
+        tags = self.read("tags", "index.html")
+        self.assertIn('href="/tags/python/">Python</a> (2)', tags)
+        self.assertIn("Tagged Web", self.read("tags", "web", "index.html"))
+        self.assertEqual(6, len(site.listings))
+
+    def test_unchanged_build_writes_nothing(self):
+        self.build()
+        _, out = self.build()
+        self.assertEqual("", out)
+
+    def test_fresh_pages_are_indexed_from_their_header(self):
+        self.build()
+        os.remove(self.site_path)
+        site, out = self.build()
+        self.assertNotIn(os.path.join(self.public, "blog", "one.html"), out)
+        self.assertEqual(3, len(site.pages))
+        self.assertEqual(6, len(site.listings))
+
+    def test_stale_listings_are_removed(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "two.md"))
+        site, out = self.build()
+        stale = [
+            os.path.join(self.public, "tags", "web", "index.html"),
+            os.path.join(self.public, "sections", "blog", "page", "2", "index.html"),
+        ]
+        for output in stale:
+            self.assertFalse(os.path.exists(output))
+            self.assertIn(f"removing stale {output}", out)
+        self.assertEqual(3, len(site.listings))
+
+
+if __name__ == "__main__":
+    unittest.main()
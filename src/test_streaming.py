@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from main import iter_blocks, render_page, write_page_streaming
+
+Markdown = """# Streaming
+
+A paragraph with **bold** and a [link](/somewhere).
+
+* one
+* two
+
+> quoted
+
+```
+code
+```
+"""
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "page.md")
+        self.dest = os.path.join(self.tmp.name, "page.html")
+        with open(self.source, "w") as file:
+            file.write(Markdown)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streaming_matches_in_memory_render(self):
+        template = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+        write_page_streaming(self.source, template, self.dest)
+        with open(self.dest) as file:
+            self.assertEqual(render_page(Markdown, template), file.read())
+
+    def test_streaming_counts_terms_instead_of_keeping_text(self):
+        streamed = {}
+        write_page_streaming(self.source, "{{ Content }}", self.dest, None, streamed)
+        rendered = {}
+        render_page(Markdown, "{{ Content }}", None, rendered)
+        self.assertNotIn("text", streamed)
+        self.assertEqual(rendered["terms"], streamed["terms"])
+        self.assertEqual(rendered["length"], streamed["length"])
+        self.assertEqual(["/somewhere"], list(streamed["references"]))
+
+    def test_unchanged_streamed_output_is_left_alone(self):
+        write_page_streaming(self.source, "{{ Content }}", self.dest)
+        os.utime(self.dest, (0, 0))
+        write_page_streaming(self.source, "{{ Content }}", self.dest)
+        self.assertEqual(0, os.stat(self.dest).st_mtime)
+        write_page_streaming(self.source, "<main>{{ Content }}</main>", self.dest)
+        self.assertNotEqual(0, os.stat(self.dest).st_mtime)
+        self.assertEqual(["page.html", "page.md"], sorted(os.listdir(self.tmp.name)))
+
+    def test_iter_blocks_reads_lines_lazily(self):
+        consumed = []
+
+        def lines():
+            for line in ["first\n", "  \n", "second\n", "line\n"]:
+                consumed.append(line)
+                yield line
+
+        blocks = iter_blocks(lines())
+        self.assertEqual("first", next(blocks))
+        self.assertEqual(2, len(consumed))
+        self.assertEqual("second\nline", next(blocks))
+
+
+if __name__ == "__main__":
+    unittest.main()
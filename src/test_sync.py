@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from manifest import BuildManifest
+from main import copy_dir
+
+
+class TestStaticSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.manifest = BuildManifest()
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("static/index.css", "body {}")
+        self.write("static/images/logo.svg", "<svg/>")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(os.path.join(self.root, relative_path), "w") as file:
+            file.write(text)
+
+    def sync(self, link=False, checksum=False):
+        copy_dir(
+            self.static + "/**/*",
+            self.public,
+            "/static",
+            "/public",
+            self.manifest,
+            link,
+            checksum,
+        )
+
+    def output(self, relative_path):
+        return os.path.join(self.public, relative_path)
+
+    def test_copy_preserves_source_mtime(self):
+        os.utime(os.path.join(self.static, "index.css"), (1000, 1000))
+        self.sync()
+        self.assertEqual(1000, os.stat(self.output("index.css")).st_mtime)
+
+    def test_unchanged_files_are_not_rewritten(self):
+        self.sync()
+        inode = os.stat(self.output("index.css")).st_ino
+        self.sync()
+        self.assertEqual(inode, os.stat(self.output("index.css")).st_ino)
+
+    def test_touched_file_with_same_content_is_not_copied(self):
+        self.sync()
+        inode = os.stat(self.output("index.css")).st_ino
+        os.utime(os.path.join(self.static, "index.css"), (5000, 5000))
+        self.sync()
+        self.assertEqual(inode, os.stat(self.output("index.css")).st_ino)
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        self.write("static/index.css", "body { color: red }")
+        self.sync()
+        with open(self.output("index.css")) as file:
+            self.assertEqual("body { color: red }", file.read())
+
+    def test_checksum_detects_same_size_change_with_same_mtime(self):
+        self.sync()
+        source = os.path.join(self.static, "index.css")
+        stat = os.stat(source)
+        self.write("static/index.css", "body {!}")
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.sync(checksum=True)
+        with open(self.output("index.css")) as file:
+            self.assertEqual("body {!}", file.read())
+
+    def test_stale_files_are_removed_but_pages_are_kept(self):
+        self.sync()
+        self.write("public/index.html", "<p>page</p>")
+        os.remove(os.path.join(self.static, "images", "logo.svg"))
+        self.sync()
+        self.assertFalse(os.path.exists(self.output("images/logo.svg")))
+        self.assertTrue(os.path.exists(self.output("index.html")))
+
+    def test_link_mode_hardlinks(self):
+        self.sync(link=True)
+        source = os.stat(os.path.join(self.static, "index.css"))
+        output = os.stat(self.output("index.css"))
+        self.assertEqual(source.st_ino, output.st_ino)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from template import Template, load_template, section_template_path
+from main import generate_pages
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.tmp.name, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_compile_segments(self):
+        template = Template("<title>{{ Title }}</title>{{Content}}!")
+        self.assertEqual(["<title>", "</title>", "!"], template.literals)
+        self.assertEqual(["Title", "Content"], template.slots)
+
+    def test_render(self):
+        template = Template("{{ Title }} - {{ Title }}: {{ Content }}")
+        actual = template.render({"Title": "T", "Content": "<p>c</p>"})
+        self.assertEqual("T - T: <p>c</p>", actual)
+
+    def test_render_missing_value_is_empty(self):
+        self.assertEqual("[]", Template("[{{ Tags }}]").render({}))
+
+    def test_render_does_not_expand_values(self):
+        template = Template("{{ Content }}{{ Title }}")
+        actual = template.render({"Title": "T", "Content": "{{ Title }}"})
+        self.assertEqual("{{ Title }}T", actual)
+
+    def test_render_around(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}<i>{{ Title }}</i>")
+        head, tail = template.render_around({"Title": "T"}, "Content")
+        self.assertEqual("<h1>T</h1>", head)
+        self.assertEqual("<i>T</i>", tail)
+
+    def test_load_template_is_cached_until_modified(self):
+        path = self.write("template.html", "one {{ Title }}")
+        first = load_template(path)
+        self.assertIs(first, load_template(path))
+        self.write("template.html", "two {{ Title }} changed")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual("two T changed", load_template(path).render({"Title": "T"}))
+
+    def test_section_template_path(self):
+        default = self.write("template.html", "{{ Content }}")
+        blog = self.write("templates/blog.html", "<blog>{{ Content }}</blog>")
+        self.assertEqual(blog, section_template_path(default, "blog/post.md"))
+        self.assertEqual(default, section_template_path(default, "docs/intro.md"))
+        self.assertEqual(default, section_template_path(default, "blog.md"))
+
+    def test_generate_pages_uses_section_template(self):
+        template = self.write("template.html", "{{ Path }}|{{ Content }}")
+        self.write("templates/blog.html", "<blog>{{ Section }}</blog>")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/index.md", "# Post")
+        public = os.path.join(self.tmp.name, "public")
+        with redirect_stdout(StringIO()):
+            generate_pages(os.path.join(self.tmp.name, "content"), template, public)
+        with open(os.path.join(public, "index.html")) as file:
+            self.assertEqual("/|<div><h1>Home</h1></div>", file.read())
+        with open(os.path.join(public, "blog", "index.html")) as file:
+            self.assertEqual("<blog>blog</blog>", file.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,10 @@ from main import (
     split_nodes_link,
     text_to_textnodes,
     markdown_to_blocks,
+    block_to_block_type,
+    classify_block,
+    markdown_to_html_node,
+    BlockType,
 )
 
 
@@ -131,6 +135,49 @@ class TestTextNode(unittest.TestCase):
         actual = text_to_textnodes(text)
         self.assertEqual(expected, actual)
 
+    def test_text_to_textnodes_code_is_verbatim(self):
+        text = "Use `a * b ** c` or *this*"
+        expected = [
+            TextNode("Use ", TextType.text_type_text),
+            TextNode("a * b ** c", TextType.text_type_code),
+            TextNode(" or ", TextType.text_type_text),
+            TextNode("this", TextType.text_type_italic),
+        ]
+        self.assertEqual(expected, text_to_textnodes(text))
+
+    def test_text_to_textnodes_unmatched_delimiter(self):
+        text = "2 * 3 and [not a link"
+        expected = [TextNode(text, TextType.text_type_text)]
+        self.assertEqual(expected, text_to_textnodes(text))
+
+    def test_text_to_textnodes_nested_brackets(self):
+        text = "[a [b]](c) and [x ![i](u)](l)"
+        expected = [
+            TextNode("a [b]", TextType.text_type_link, "c"),
+            TextNode(" and [x ", TextType.text_type_text),
+            TextNode("i", TextType.text_type_image, "u"),
+            TextNode("](l)", TextType.text_type_text),
+        ]
+        self.assertEqual(expected, text_to_textnodes(text))
+
+    def test_text_to_textnodes_many_links(self):
+        text = " and ".join(f"[link {i}](/page/{i})" for i in range(5000))
+        actual = text_to_textnodes(text)
+        self.assertEqual(9999, len(actual))
+        self.assertEqual(
+            TextNode("link 4999", TextType.text_type_link, "/page/4999"), actual[-1]
+        )
+
+    def test_split_nodes_delimiter_unmatched(self):
+        node = TextNode("This is **broken", TextType.text_type_text)
+        with self.assertRaises(ValueError):
+            split_nodes_delimiter([node], "**", TextType.text_type_bold)
+
+    def test_split_nodes_link_many(self):
+        text = "".join(f"x[l](/{i})" for i in range(3000))
+        actual = split_nodes_link([TextNode(text, TextType.text_type_text)])
+        self.assertEqual(6000, len(actual))
+
     def test_markdown_to_blocks(self):
         text = """This is **bolded** paragraph
 
@@ -143,6 +190,44 @@ This is the same paragraph on a new line
         actual = markdown_to_blocks(text)
         self.assertEqual(expected, actual)
 
+    def test_block_to_block_type(self):
+        cases = [
+            ("### Heading", BlockType.Heading),
+            ("####### Too deep", BlockType.Paragraph),
+            ("```\ncode\n```", BlockType.Code),
+            ("``````", BlockType.Paragraph),
+            ("> one\n> two", BlockType.Quote),
+            ("> one\ntwo", BlockType.Paragraph),
+            ("* one\n- two", BlockType.UnorderedList),
+            ("*bold start* text", BlockType.Paragraph),
+            ("1. one\n2. two", BlockType.OrderedList),
+            ("1984 was a year", BlockType.Paragraph),
+        ]
+        for block, expected in cases:
+            self.assertEqual(expected, block_to_block_type(block), block)
+
+    def test_classify_block_returns_lines(self):
+        block_type, lines = classify_block("* one\n* two")
+        self.assertEqual(BlockType.UnorderedList, block_type)
+        self.assertEqual(["* one", "* two"], lines)
+
+    def test_fenced_code_keeps_blank_lines(self):
+        text = "intro\n\n```\nfirst\n\n\nsecond\n```\nafter"
+        expected = ["intro", "```\nfirst\n\n\nsecond\n```", "after"]
+        self.assertEqual(expected, markdown_to_blocks(text))
+
+    def test_unclosed_fence_splits_like_text(self):
+        text = "```\none\n\ntwo"
+        self.assertEqual(["```\none", "two"], markdown_to_blocks(text))
+
+    def test_code_is_escaped_and_not_parsed(self):
+        text = "```\nif a < b && *c*:\n\n    print(`x`)\n```"
+        expected = (
+            "<div><pre><code>if a &lt; b &amp;&amp; *c*:\n\n    print(`x`)"
+            "</code></pre></div>"
+        )
+        self.assertEqual(expected, markdown_to_html_node(text).to_html())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from manifest import BuildManifest
+from main import copy_dir, generate_pages
+from watch import InotifyWatcher, PollingWatcher, SiteRebuilder
+
+
+class TestWatchers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        os.makedirs(self.content)
+        self.page = os.path.join(self.content, "index.md")
+        with open(self.page, "w") as file:
+            file.write("# Home")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check_watcher(self, watcher):
+        try:
+            self.assertEqual(set(), watcher.wait(0))
+            with open(self.page, "a") as file:
+                file.write("\n\nmore text")
+            self.assertIn(os.path.normpath(self.page), watcher.wait(2))
+            os.makedirs(os.path.join(self.content, "new"))
+            new_page = os.path.join(self.content, "new", "index.md")
+            with open(new_page, "w") as file:
+                file.write("# New")
+            self.assertIn(os.path.normpath(new_page), watcher.wait(2))
+            os.remove(self.page)
+            self.assertIn(os.path.normpath(self.page), watcher.wait(2))
+        finally:
+            watcher.close()
+
+    def test_polling_watcher(self):
+        self.check_watcher(PollingWatcher([self.content]))
+
+    def test_inotify_watcher(self):
+        try:
+            watcher = InotifyWatcher([self.content])
+        except (OSError, AttributeError, TypeError):
+            self.skipTest("inotify is not available")
+        self.check_watcher(watcher)
+
+
+class TestSiteRebuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.path = lambda *parts: os.path.join(self.root, *parts)
+        os.makedirs(self.path("content", "blog"))
+        os.makedirs(self.path("static"))
+        self.write("template.html", "{{ Title }}|{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/index.md", "# Blog")
+        self.write("static/index.css", "body {}")
+        self.manifest = BuildManifest()
+        with redirect_stdout(StringIO()):
+            copy_dir(
+                self.path("static") + "/**/*",
+                self.path("public"),
+                "/static",
+                "/public",
+                self.manifest,
+            )
+            generate_pages(
+                self.path("content"),
+                self.path("template.html"),
+                self.path("public"),
+                self.manifest,
+            )
+        self.rebuilder = SiteRebuilder(
+            self.manifest,
+            content_dir=self.path("content"),
+            template_path=self.path("template.html"),
+            static_dir=self.path("static"),
+            public_dir=self.path("public"),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, relative_path, text):
+        with open(self.path(relative_path), "w") as file:
+            file.write(text)
+
+    def read(self, relative_path):
+        with open(self.path(relative_path)) as file:
+            return file.read()
+
+    def rebuild(self, *relative_paths):
+        with redirect_stdout(StringIO()):
+            written = self.rebuilder.rebuild([self.path(p) for p in relative_paths])
+        return sorted(os.path.relpath(p, self.root) for p in written)
+
+    def test_page_change_rebuilds_only_that_page(self):
+        self.write("content/blog/index.md", "# Blog\n\nNew post")
+        written = self.rebuild("content/blog/index.md")
+        self.assertEqual(["public/blog/index.html"], written)
+        self.assertIn("<p>New post</p>", self.read("public/blog/index.html"))
+
+    def test_template_change_rebuilds_dependent_pages(self):
+        self.write("template.html", "<main>{{ Content }}</main>")
+        written = self.rebuild("template.html")
+        self.assertEqual(["public/blog/index.html", "public/index.html"], written)
+        self.assertTrue(self.read("public/index.html").startswith("<main>"))
+
+    def test_new_section_template_rebuilds_section(self):
+        os.makedirs(self.path("templates"))
+        self.write("templates/blog.html", "<blog>{{ Content }}</blog>")
+        written = self.rebuild("templates/blog.html")
+        self.assertEqual(["public/blog/index.html"], written)
+
+    def test_deleted_page_output_is_removed(self):
+        os.remove(self.path("content", "blog", "index.md"))
+        self.rebuild("content/blog/index.md")
+        self.assertFalse(os.path.exists(self.path("public", "blog", "index.html")))
+
+    def test_static_change_is_synced(self):
+        self.write("static/index.css", "body { margin: 0 }")
+        self.assertEqual(["public/index.css"], self.rebuild("static/index.css"))
+        self.assertEqual("body { margin: 0 }", self.read("public/index.css"))
+
+    def test_broken_page_does_not_stop_rebuild(self):
+        with open(self.path("content", "blog", "index.md"), "wb") as file:
+            file.write(b"# Not UTF-8 \xff")
+        self.write("static/index.css", "p {}")
+        written = self.rebuild("content/blog/index.md", "static/index.css")
+        self.assertEqual(["public/index.css"], written)
+
+    def test_scratch_files_are_ignored(self):
+        self.write("content/.index.md.swp", "binary")
+        self.assertEqual([], self.rebuild("content/.index.md.swp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
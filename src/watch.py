@@ -0,0 +1,334 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from main import (
+    ContentDir,
+    PageSuffixes,
+    PublicDir,
+    TemplatePath,
+    hash_page_template,
+    plan_page,
+    report_broken_links,
+    write_page,
+    write_search_index,
+    write_site_listings,
+)
+from manifest import hash_file, normalize_path, remove_outputs
+from sync import sync_file
+from template import load_template, section_of
+
+PollInterval = 0.25
+DebounceInterval = 0.01
+ManifestSaveInterval = 5.0
+
+InCloseWrite = 0x00000008
+InMovedFrom = 0x00000040
+InMovedTo = 0x00000080
+InCreate = 0x00000100
+InDelete = 0x00000200
+InIsDir = 0x40000000
+InotifyMask = InCloseWrite | InMovedFrom | InMovedTo | InCreate | InDelete
+InotifyEvent = struct.Struct("iIII")
+
+
+def is_scratch_file(path):
+    # Editor swap and backup files should never trigger a rebuild.
+    name = os.path.basename(path)
+    return name.startswith(".") or name.endswith("~")
+
+
+def scan_files(directory):
+    files = {}
+    stack = [directory]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                files[normalize_path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class PollingWatcher:
+    def __init__(self, directories, files=()):
+        self.directories = directories
+        self.files = files
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for directory in self.directories:
+            snapshot.update(scan_files(directory))
+        for path in self.files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[normalize_path(path)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(PollInterval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    # Thin ctypes binding over Linux inotify: one watch per directory, and
+    # single files are watched through their parent directory.
+    def __init__(self, directories, files=()):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.files = {normalize_path(path) for path in files}
+        for directory in directories:
+            self.add_tree(directory)
+        for path in self.files:
+            self.add_watch(os.path.dirname(path) or ".")
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), InotifyMask)
+        if wd >= 0:
+            self.watches[wd] = normalize_path(directory)
+
+    def add_tree(self, directory):
+        added = []
+        for root, dirs, files in os.walk(directory):
+            self.add_watch(root)
+            added.extend(os.path.join(root, name) for name in files)
+        return added
+
+    def read_events(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = InotifyEvent.unpack_from(data, offset)
+                offset += InotifyEvent.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = normalize_path(os.path.join(directory, name))
+                if mask & InIsDir:
+                    if mask & (InCreate | InMovedTo):
+                        changed.update(map(normalize_path, self.add_tree(path)))
+                    continue
+                changed.add(path)
+
+    def wait(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = self.read_events()
+        # Saves usually arrive as a burst of events; collect the whole burst
+        # before rebuilding.
+        while select.select([self.fd], [], [], DebounceInterval)[0]:
+            changed |= self.read_events()
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(directories, files=()):
+    try:
+        return InotifyWatcher(directories, files)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(directories, files)
+
+
+class SiteRebuilder:
+    # Maps changed source paths to the outputs that depend on them and
+    # regenerates only those, keeping the build manifest up to date.
+    def __init__(
+        self,
+        manifest,
+        content_dir=ContentDir,
+        template_path=TemplatePath,
+        static_dir="./static",
+        public_dir=PublicDir,
+        links=None,
+        site=None,
+        search=None,
+    ):
+        self.manifest = manifest
+        self.links = links
+        self.site = site
+        self.search = search
+        self.content_dir = normalize_path(content_dir)
+        self.template_path = normalize_path(template_path)
+        self.template_dir = normalize_path(
+            os.path.join(os.path.dirname(template_path), "templates")
+        )
+        self.static_dir = normalize_path(static_dir)
+        self.public_dir = public_dir
+        self.last_save = time.monotonic()
+
+    def watched_directories(self):
+        return [self.content_dir, self.static_dir, self.template_dir]
+
+    def watched_files(self):
+        return [self.template_path]
+
+    def rebuild(self, changed):
+        changed = {normalize_path(path) for path in changed}
+        changed = {path for path in changed if not is_scratch_file(path)}
+        templates = {
+            path
+            for path in changed
+            if path == self.template_path or is_under(path, self.template_dir)
+        }
+        pages = {
+            path
+            for path in changed
+            if is_under(path, self.content_dir) and path.endswith(PageSuffixes)
+        }
+        statics = {path for path in changed if is_under(path, self.static_dir)}
+        if templates:
+            pages |= self.pages_using(templates)
+
+        written = []
+        for sources, rebuild, remove in (
+            (pages, self.rebuild_page, self.remove_page),
+            (statics, self.rebuild_static, self.manifest.remove_static),
+        ):
+            for source in sorted(sources):
+                if not os.path.isfile(source):
+                    outputs = remove(source)
+                    remove_outputs(outputs)
+                    written.extend(outputs)
+                    continue
+                # A half-saved page must not stop the watcher; the next save
+                # triggers another rebuild.
+                try:
+                    written.append(rebuild(source))
+                except Exception as e:
+                    print(f"error rebuilding {source}: {type(e).__name__}: {e}")
+        if self.site is not None and written:
+            written.extend(
+                write_site_listings(self.site, self.template_path, self.public_dir)
+            )
+        if self.search is not None and written:
+            written.extend(write_search_index(self.search, self.public_dir))
+        if self.links is not None and written:
+            extra_outputs = self.site.listings if self.site is not None else ()
+            report_broken_links(
+                self.links.check(self.manifest, self.public_dir, extra_outputs)
+            )
+        if time.monotonic() - self.last_save >= ManifestSaveInterval:
+            self.save()
+        return written
+
+    def pages_using(self, templates):
+        pages = set()
+        for source, entry in self.manifest.pages.items():
+            # A section template that was just added or deleted changes which
+            # template the section's pages resolve to, not just its contents.
+            section = section_of(os.path.relpath(source, self.content_dir))
+            section_template = os.path.join(self.template_dir, section + ".html")
+            if entry.get("template") in templates or section_template in templates:
+                pages.add(source)
+        return pages
+
+    def rebuild_page(self, source):
+        destination_file, page_template, values = plan_page(
+            source, self.content_dir, self.template_path, self.public_dir
+        )
+        print(f"writing {destination_file}")
+        # Stat and hash before rendering, so an edit made meanwhile is seen
+        # as a change by the next build.
+        stat = os.stat(source)
+        source_hash = hash_file(source)
+        details = {}
+        template = load_template(page_template)
+        write_page(source, template, destination_file, values, None, details)
+        if self.links is not None:
+            self.links.record_page(source, values["Path"], details["references"])
+        if self.site is not None:
+            self.site.record_page(
+                source,
+                details["title"],
+                details["metadata"],
+                values["Section"],
+                values["Path"],
+                destination_file,
+            )
+        if self.search is not None:
+            self.search.record_terms(
+                source,
+                values["Path"],
+                details["title"],
+                details["terms"],
+                details["length"],
+            )
+        self.manifest.record_page(
+            source,
+            source_hash,
+            hash_page_template(page_template),
+            destination_file,
+            page_template,
+            stat,
+        )
+        return destination_file
+
+    def remove_page(self, source):
+        if self.links is not None:
+            self.links.remove_page(source)
+        if self.site is not None:
+            self.site.remove_page(source)
+        if self.search is not None:
+            self.search.remove_page(source)
+        return self.manifest.remove_page(source)
+
+    def rebuild_static(self, source):
+        relative_path = os.path.relpath(source, self.static_dir)
+        destination_file = os.path.join(self.public_dir, relative_path)
+        stat = os.stat(source)
+        entry = self.manifest.static_entry(source, destination_file)
+        source_hash, _ = sync_file(source, destination_file, entry, stat)
+        self.manifest.record_static(source, source_hash, destination_file, stat)
+        return destination_file
+
+    def save(self):
+        self.manifest.save()
+        if self.links is not None:
+            self.links.save()
+        if self.site is not None:
+            self.site.save()
+        if self.search is not None:
+            self.search.save()
+        self.last_save = time.monotonic()
+
+
+def is_under(path, directory):
+    return path.startswith(directory + os.sep)